@@ -2,8 +2,12 @@ from flask import Blueprint, request, jsonify
 from ml.predictor import CropPredictor
 from ml.fertilizer_recommender import FertilizerRecommender
 from ml.preprocess import DataPreprocessor
+from ml.yield_predictor import YieldPredictor
+from ml.model_registry import registry
 from services.weather_service import WeatherService
 from services.prediction_storage_service import PredictionStorageService
+from services.recommendation_cache import RecommendationCache
+from backend.utils.metrics import metrics, timed
 
 predict_bp = Blueprint('predict', __name__)
 
@@ -11,8 +15,167 @@ predict_bp = Blueprint('predict', __name__)
 predictor = CropPredictor()
 fertilizer_recommender = FertilizerRecommender()
 preprocessor = DataPreprocessor()
+yield_predictor = YieldPredictor()
 weather_service = WeatherService()
 storage_service = PredictionStorageService()
+response_cache = RecommendationCache()
+
+# Service counters exported as gauges on /metrics
+metrics.register_collector('mitti_response_cache', 'Recommendation response cache', response_cache.cache_stats)
+metrics.register_collector('mitti_prediction_storage', 'Prediction write-behind buffer', storage_service.get_write_stats)
+metrics.register_collector('mitti_weather_cache', 'Weather cache', weather_service.cache_stats)
+
+# Default estimates for Yield inputs if not provided (Simplification for single-click)
+# In a real app, we might ask user or use historical averages for the region
+DIST_AVG_FERT = 120.0  # kg/ha
+DIST_AVG_PEST = 0.5    # kg/ha
+
+# Upper bound on samples accepted by /recommend/batch in one request
+MAX_BATCH_SIZE = 1000
+
+
+def _fill_missing_inputs(data, weather_cache=None):
+    """
+    Auto-fill weather and moisture fields missing from a request sample (in place).
+    weather_cache lets a batch reuse one weather lookup per location.
+    """
+    if 'humidity' not in data or 'rainfall' not in data or 'temperature' not in data:
+        location = data.get('location', 'Hyderabad')
+        if weather_cache is not None and location in weather_cache:
+            weather = weather_cache[location]
+        else:
+            with timed('weather_lookup'):
+                weather = weather_service.get_current_weather(location)
+            if weather_cache is not None:
+                weather_cache[location] = weather
+
+        # Only fill missing fields
+        if 'temperature' not in data: data['temperature'] = weather['temperature']
+        if 'humidity' not in data: data['humidity'] = weather['humidity']
+        if 'rainfall' not in data: data['rainfall'] = weather['rainfall']
+
+    # Default moisture if not provided (assume moderate moisture)
+    if 'moisture' not in data:
+        data['moisture'] = 45.0  # Default moderate moisture
+
+    return data
+
+
+def _current_season():
+    """
+    Auto-determine cropping season from the current month.
+    """
+    from datetime import datetime
+
+    month = datetime.now().month
+    if 6 <= month <= 9:
+        return 'Kharif'
+    elif month >= 10 or month <= 2:
+        return 'Rabi'
+    return 'Zaid'
+
+
+def _fertilizer_inputs(data, crop):
+    """
+    Fertilizer model inputs for one sample (recommend() keyword arguments,
+    also the per-sample dict for recommend_batch()).
+    """
+    return {
+        'temperature': float(data.get('temperature', 25)),
+        'humidity': float(data.get('humidity', 60)),
+        'moisture': float(data.get('moisture', 45)),
+        'soil_type': data.get('soil_type', 'Loamy'),
+        'crop_type': crop,  # Use predicted crop as contextual feature
+        'nitrogen': float(data.get('N', 0)),
+        'potassium': float(data.get('K', 0)),
+        'phosphorous': float(data.get('P', 0))
+    }
+
+
+def _yield_inputs(data, crop, season):
+    """
+    Yield model inputs for one sample (predict() keyword arguments,
+    also the per-sample dict for predict_batch()).
+    """
+    return {
+        'state': data.get('state', 'Telangana'),
+        'district': data.get('district', 'Warangal'),
+        'crop': crop,
+        'season': season,
+        'rainfall': float(data.get('rainfall', 100)),
+        'fertilizer': float(data.get('fertilizer_usage', DIST_AVG_FERT)),
+        'pesticide': float(data.get('pesticide_usage', DIST_AVG_PEST)),
+        'soil_type': data.get('soil_type', 'Loamy')
+    }
+
+
+def _store_predictions(data, top_crop, fertilizer_result, season, predicted_yield_val):
+    """
+    Queues the crop, fertilizer and yield records for one sample
+    (written as bulk inserts in the background).
+    """
+    storage_service.store_crop_prediction(
+        sensor_data={
+            'N': data.get('N', 0),
+            'P': data.get('P', 0),
+            'K': data.get('K', 0),
+            'temperature': data.get('temperature', 0),
+            'humidity': data.get('humidity', 0),
+            'moisture': data.get('moisture', 0),
+            'ph': data.get('ph', 7.0),
+            'rainfall': data.get('rainfall', 0),
+            'soil_type': data.get('soil_type', None)
+        },
+        predicted_crop=top_crop['crop'],
+        confidence=top_crop['confidence'],
+        device_id=data.get('device_id', 'web_client'),
+        location=data.get('location', None),
+        translated_crop=top_crop.get('translated_crop')
+    )
+    storage_service.store_fertilizer_prediction(
+        input_data={
+            'n': data.get('N', 0),
+            'p': data.get('P', 0),
+            'k': data.get('K', 0),
+            'temp': data.get('temperature', 25),
+            'humidity': data.get('humidity', 60),
+            'moisture': data.get('moisture', 45),
+            'soil_type': data.get('soil_type', 'Loamy'),
+            'crop': top_crop['crop']
+        },
+        recommendation=fertilizer_result['fertilizer'],
+        confidence=fertilizer_result['confidence'],
+        reasoning=fertilizer_result['reasoning'],
+        translated_fertilizer=fertilizer_result.get('translated_fertilizer')
+    )
+    storage_service.store_yield_prediction(
+        predicted_yield=predicted_yield_val,
+        **_yield_inputs(data, top_crop['crop'], season)
+    )
+
+
+def _recommendation(data, crop_predictions, fertilizer_result, predicted_yield_val, season):
+    """
+    Response body for one sample.
+    """
+    return {
+        'status': 'success',
+        'crops': crop_predictions,
+        'fertilizer_recommendation': {
+            'fertilizer': fertilizer_result['fertilizer'],
+            'confidence': fertilizer_result['confidence'],
+            'reasoning': fertilizer_result['reasoning'],
+            'translated_fertilizer': fertilizer_result.get('translated_fertilizer')
+        },
+        'yield_prediction': {
+            'predicted_yield': predicted_yield_val,
+            'unit': 'tons/ha',
+            'season': season
+        },
+        'used_params': data,
+        'data_stored': True  # Indicates prediction was stored in database
+    }
+
 
 @predict_bp.route('/recommend', methods=['POST'])
 def recommend():
@@ -33,162 +196,200 @@ def recommend():
         if not data:
             return jsonify({'error': 'No input data provided'}), 400
 
-        # Auto-fill weather data if missing
-        if 'humidity' not in data or 'rainfall' not in data or 'temperature' not in data:
-            location = data.get('location', 'Hyderabad')
-            weather = weather_service.get_current_weather(location)
-            
-            # Only fill missing fields
-            if 'temperature' not in data: data['temperature'] = weather['temperature']
-            if 'humidity' not in data: data['humidity'] = weather['humidity']
-            if 'rainfall' not in data: data['rainfall'] = weather['rainfall']
+        # Auto-fill weather data and moisture if missing
+        _fill_missing_inputs(data)
 
-        # Default moisture if not provided (assume moderate moisture)
-        if 'moisture' not in data:
-            data['moisture'] = 45.0  # Default moderate moisture
+        # Auto-determine season
+        season = _current_season()
+
+        # Identical inputs under the same models reuse the earlier result
+        lang = data.get('lang', 'en')
+        cache_key = response_cache.make_key(data, season, registry.version(), lang=('en', lang))
+        cached = response_cache.get(cache_key)
+
+        if cached is not None:
+            crop_predictions, fertilizer_result, predicted_yield_val = cached
+        else:
+            # ========================================
+            # STEP 1: CROP PREDICTION
+            # ========================================
+            # Preprocess features for crop model
+            # Expects: N, P, K, temperature, humidity, ph, rainfall
+            try:
+                with timed('preprocess'):
+                    features = preprocessor.preprocess(data)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            # Get crop predictions
+            with timed('crop_inference'):
+                crop_predictions = predictor.predict(features, top_n=3)
+
+            if not crop_predictions or len(crop_predictions) == 0:
+                return jsonify({'error': 'Crop prediction failed'}), 500
+
+            # ========================================
+            # STEP 2: FERTILIZER PREDICTION
+            # ========================================
+            # Use ML-based fertilizer recommendation with predicted crop as contextual feature
+            with timed('fertilizer_inference'):
+                fertilizer_result = fertilizer_recommender.recommend(
+                    lang=lang,
+                    **_fertilizer_inputs(data, crop_predictions[0]['crop'])
+                )
+
+            # ========================================
+            # STEP 3: YIELD PREDICTION (Integrated)
+            # ========================================
+            with timed('yield_inference'):
+                predicted_yield_val = yield_predictor.predict(
+                    **_yield_inputs(data, crop_predictions[0]['crop'], season)
+                )
+
+            response_cache.put(cache_key, (crop_predictions, fertilizer_result, predicted_yield_val))
 
-        # ========================================
-        # STEP 1: CROP PREDICTION
-        # ========================================
-        # Preprocess features for crop model
-        # Expects: N, P, K, temperature, humidity, ph, rainfall
-        try:
-            features = preprocessor.preprocess(data)
-        except ValueError as e:
-            return jsonify({'error': str(e)}), 400
-
-        # Get crop predictions
-        crop_predictions = predictor.predict(features, top_n=3)
-        
-        if not crop_predictions or len(crop_predictions) == 0:
-            return jsonify({'error': 'Crop prediction failed'}), 500
-        
-        # Get top predicted crop
         top_crop = crop_predictions[0]
-        predicted_crop_name = top_crop['crop']
-        crop_confidence = top_crop['confidence']
-        crop_reasoning = top_crop.get('reasoning', [])
 
         # ========================================
-        # STEP 2: STORE PREDICTION DATA
+        # STEP 4: STORE PREDICTION DATA
         # ========================================
-        # Store the prediction in real_world_dataset table
-        sensor_data = {
-            'N': data.get('N', 0),
-            'P': data.get('P', 0),
-            'K': data.get('K', 0),
-            'temperature': data.get('temperature', 0),
-            'humidity': data.get('humidity', 0),
-            'moisture': data.get('moisture', 0),
-            'ph': data.get('ph', 7.0),
-            'rainfall': data.get('rainfall', 0),
-            'soil_type': data.get('soil_type', None)
-        }
-        
-        device_id = data.get('device_id', 'web_client')
-        location = data.get('location', None)
-        
-        # Store Crop Prediction
-        storage_service.store_crop_prediction(
-            sensor_data=sensor_data,
-            predicted_crop=predicted_crop_name,
-            confidence=crop_confidence,
-            device_id=device_id,
-            location=location,
-            translated_crop=top_crop.get('translated_crop')
-        )
+        # Crop, fertilizer and yield records (queued, written in bulk in the background)
+        with timed('prediction_store'):
+            _store_predictions(data, top_crop, fertilizer_result, season, predicted_yield_val)
 
         # ========================================
-        # STEP 3: FERTILIZER PREDICTION
+        # STEP 5: RETURN COMPLETE RESPONSE
         # ========================================
-        # Use ML-based fertilizer recommendation with predicted crop as contextual feature
-        fertilizer_result = fertilizer_recommender.recommend(
-            temperature=float(data.get('temperature', 25)),
-            humidity=float(data.get('humidity', 60)),
-            moisture=float(data.get('moisture', 45)),
-            soil_type=data.get('soil_type', 'Loamy'),
-            crop_type=predicted_crop_name,  # Use predicted crop as contextual feature
-            nitrogen=float(data.get('N', 0)),
-            potassium=float(data.get('K', 0)),
-            phosphorous=float(data.get('P', 0)),
-            lang=data.get('lang', 'en')
-        )
-        
-        # Store Fertilizer Prediction
-        storage_service.store_fertilizer_prediction(
-            input_data={
-                'n': data.get('N', 0),
-                'p': data.get('P', 0),
-                'k': data.get('K', 0),
-                'temp': data.get('temperature', 25),
-                'humidity': data.get('humidity', 60),
-                'moisture': data.get('moisture', 45),
-                'soil_type': data.get('soil_type', 'Loamy'),
-                'crop': predicted_crop_name
-            },
-            recommendation=fertilizer_result['fertilizer'],
-            confidence=fertilizer_result['confidence'],
-            reasoning=fertilizer_result['reasoning'],
-            translated_fertilizer=fertilizer_result.get('translated_fertilizer')
-        )
+        return jsonify(_recommendation(data, crop_predictions, fertilizer_result, predicted_yield_val, season))
 
-        # ========================================
-        # STEP 4: YIELD PREDICTION (Integrated)
-        # ========================================
-        from ml.yield_predictor import YieldPredictor
-        from datetime import datetime
-        
-        yield_predictor = YieldPredictor()
-        
-        # Auto-determine season
-        month = datetime.now().month
-        if 6 <= month <= 9:
-            season = 'Kharif'
-        elif 10 <= month <= 2:
-            season = 'Rabi'
+    except Exception as e:
+        print(f"Prediction API Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': 'Internal Server Error', 'details': str(e)}), 500
+
+
+@predict_bp.route('/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """
+    Batch version of /recommend for whole field surveys.
+    Each stage (crop -> fertilizer -> yield) builds one feature matrix and
+    makes a single vectorized model call for all samples.
+    
+    Input JSON: { samples: [ {same fields as /recommend}, ... ], lang? }
+                (a bare JSON list of samples is also accepted)
+    Output: { status, count, results: [ per-sample result in input order ] }
+    """
+    try:
+        payload = request.json
+        if isinstance(payload, list):
+            samples, lang = payload, 'en'
+        elif isinstance(payload, dict):
+            samples, lang = payload.get('samples'), payload.get('lang', 'en')
         else:
-            season = 'Zaid'
-            
-        # Default estimtates for Yield inputs if not provided (Simplification for single-click)
-        # In a real app, we might ask user or use historical averages for the region
-        dist_avg_fert = 120.0 # kg/ha
-        dist_avg_pest = 0.5   # kg/ha
-        
-        predicted_yield_val = yield_predictor.predict(
-            state=data.get('state', 'Telangana'), 
-            district=data.get('district', 'Warangal'),
-            crop=predicted_crop_name,
-            season=season,
-            rainfall=float(data.get('rainfall', 100)),
-            fertilizer=float(data.get('fertilizer_usage', dist_avg_fert)),
-            pesticide=float(data.get('pesticide_usage', dist_avg_pest)),
-            soil_type=data.get('soil_type', 'Loamy')
-        )
+            samples, lang = None, 'en'
+
+        if not samples or not isinstance(samples, list):
+            return jsonify({'error': 'No samples provided'}), 400
+        if len(samples) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch too large (max {MAX_BATCH_SIZE} samples)'}), 400
+
+        # Fill missing inputs, one weather lookup per distinct location
+        weather_cache = {}
+        for i, sample in enumerate(samples):
+            if not isinstance(sample, dict):
+                return jsonify({'error': f'Sample {i} is not an object'}), 400
+            _fill_missing_inputs(sample, weather_cache)
+
+        # Samples seen before (same inputs and models) skip the model calls
+        season = _current_season()
+        model_version = registry.version()
+        cache_keys = [response_cache.make_key(sample, season, model_version, lang=(lang, lang)) for sample in samples]
+        outputs = [response_cache.get(key) for key in cache_keys]
+        todo = [i for i, output in enumerate(outputs) if output is None]
+
+        if todo:
+            # ========================================
+            # STEP 1: CROP PREDICTION (one model call)
+            # ========================================
+            try:
+                with timed('batch_preprocess'):
+                    features = preprocessor.preprocess_many([samples[i] for i in todo])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            with timed('batch_crop_inference'):
+                crop_batch = predictor.predict_batch(features, top_n=3, lang=lang)
+
+            # ========================================
+            # STEP 2: FERTILIZER PREDICTION (one model call)
+            # ========================================
+            # Samples without a crop prediction (e.g. all-zero sensor rows) skip later stages
+            predicted = [(i, crops) for i, crops in zip(todo, crop_batch) if crops]
+
+            fertilizer_inputs = [_fertilizer_inputs(samples[i], crops[0]['crop']) for i, crops in predicted]
+            with timed('batch_fertilizer_inference'):
+                fertilizer_batch = fertilizer_recommender.recommend_batch(fertilizer_inputs, lang=lang)
+
+            # ========================================
+            # STEP 3: YIELD PREDICTION (one model call)
+            # ========================================
+            yield_inputs = [_yield_inputs(samples[i], crops[0]['crop'], season) for i, crops in predicted]
+            with timed('batch_yield_inference'):
+                yield_batch = yield_predictor.predict_batch(yield_inputs)
+
+            for (i, crops), fertilizer_result, predicted_yield_val in zip(predicted, fertilizer_batch, yield_batch):
+                outputs[i] = (crops, fertilizer_result, predicted_yield_val)
+                response_cache.put(cache_keys[i], outputs[i])
 
         # ========================================
-        # STEP 5: RETURN COMPLETE RESPONSE
+        # STEP 4: STORE + ASSEMBLE PER-SAMPLE RESULTS
         # ========================================
+        results = [
+            {'status': 'error', 'error': 'Crop prediction failed', 'used_params': sample}
+            for sample in samples
+        ]
+        with timed('batch_prediction_store'):
+            for i, output in enumerate(outputs):
+                if output is None:
+                    continue
+                crops, fertilizer_result, predicted_yield_val = output
+                # Stores are queued and written as bulk inserts in the background
+                _store_predictions(samples[i], crops[0], fertilizer_result, season, predicted_yield_val)
+                results[i] = _recommendation(samples[i], crops, fertilizer_result, predicted_yield_val, season)
+
         return jsonify({
             'status': 'success',
-            'crops': crop_predictions,
-            'fertilizer_recommendation': {
-                'fertilizer': fertilizer_result['fertilizer'],
-                'confidence': fertilizer_result['confidence'],
-                'reasoning': fertilizer_result['reasoning'],
-                'translated_fertilizer': fertilizer_result.get('translated_fertilizer')
-            },
-            'yield_prediction': {
-                'predicted_yield': predicted_yield_val,
-                'unit': 'tons/ha',
-                'season': season
-            },
-            'used_params': data,
-            'data_stored': True  # Indicates prediction was stored in database
+            'count': len(results),
+            'results': results
         })
 
     except Exception as e:
-        print(f"Prediction API Error: {e}")
+        print(f"Batch Prediction API Error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': 'Internal Server Error', 'details': str(e)}), 500
 
+
+@predict_bp.route('/models', methods=['GET'])
+def model_status():
+    """
+    Reports load time and memory for every model artifact held by the registry.
+    """
+    return jsonify(registry.report())
+
+
+@predict_bp.route('/cache', methods=['GET'])
+def cache_status():
+    """
+    Reports the recommendation response cache (size, hits, misses, hit rate).
+    """
+    return jsonify({'model_version': registry.version(), **response_cache.cache_stats()})
+
+
+@predict_bp.route('/storage', methods=['GET'])
+def storage_status():
+    """
+    Reports the prediction write-behind queue (depth, flush latency, drops).
+    """
+    return jsonify(storage_service.get_write_stats())
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import Blueprint, request, jsonify
+from api.predict import (
+    predictor, fertilizer_recommender, preprocessor, yield_predictor, weather_service, response_cache, registry,
+    _fill_missing_inputs, _current_season, _fertilizer_inputs, _yield_inputs,
+    _store_predictions, _recommendation
+)
+from backend.utils.metrics import timed
+
+predict_async_bp = Blueprint('predict_async', __name__)
+
+# Threads for model calls (NumPy releases the GIL in the heavy parts) and for blocking I/O
+ASYNC_CPU_WORKERS = int(os.getenv("ASYNC_CPU_WORKERS", str(os.cpu_count() or 2)))
+ASYNC_IO_WORKERS = int(os.getenv("ASYNC_IO_WORKERS", "8"))
+ASYNC_REQUEST_TIMEOUT = float(os.getenv("ASYNC_REQUEST_TIMEOUT", "30"))  # Seconds a request may wait on the pipeline
+
+# Inputs the crop model needs from the client (weather fields can be looked up)
+REQUIRED_INPUTS = ('N', 'P', 'K', 'ph')
+
+
+class _Runtime:
+    """
+    One event loop (on a daemon thread) and two executors per process, shared by
+    all requests. Created lazily, and again after a fork, since threads do not survive it.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.cpu_pool = None
+        self.io_pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._pid == os.getpid():
+            return self
+        with self._lock:
+            if self._pid != os.getpid():
+                self.cpu_pool = ThreadPoolExecutor(ASYNC_CPU_WORKERS, thread_name_prefix='predict-cpu')
+                self.io_pool = ThreadPoolExecutor(ASYNC_IO_WORKERS, thread_name_prefix='predict-io')
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name='predict-async-loop', daemon=True).start()
+                self._pid = os.getpid()
+        return self
+
+
+runtime = _Runtime()
+
+
+def _timed_call(stage, fn, *args, **kwargs):
+    # Runs on an executor thread; the timing covers the call itself, not the queueing
+    with timed(stage):
+        return fn(*args, **kwargs)
+
+
+def _validate_static_inputs(data):
+    """
+    Checks the fields that do not depend on the weather lookup.
+    Returns an error message or None.
+    """
+    for key in REQUIRED_INPUTS:
+        if key not in data:
+            continue  # Preprocessing reports missing features
+        try:
+            float(data[key])
+        except (TypeError, ValueError):
+            return f"Invalid value for {key}: {data[key]!r}"
+    return None
+
+
+def _log_store_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Background prediction store failed: {future.exception()}")
+
+
+def _store_in_background(rt, *args):
+    # Fire-and-forget; failures are logged, never surfaced to the client
+    future = rt.loop.run_in_executor(rt.io_pool, _timed_call, 'prediction_store', _store_predictions, *args)
+    future.add_done_callback(_log_store_failure)
+
+
+async def _recommend(rt, data):
+    """
+    The /recommend pipeline with the waiting overlapped:
+    - the weather lookup runs while the static inputs are validated;
+    - repeated inputs are answered from the response cache;
+    - model calls run on the CPU pool, fertilizer and yield concurrently
+      (both only need the predicted crop);
+    - the storage writes are scheduled after the response is built and not awaited.
+    Returns (body, status).
+    """
+    loop = asyncio.get_running_loop()
+
+    weather = None
+    if 'humidity' not in data or 'rainfall' not in data or 'temperature' not in data:
+        weather = loop.run_in_executor(
+            rt.io_pool, _timed_call, 'weather_lookup',
+            weather_service.get_current_weather, data.get('location', 'Hyderabad')
+        )
+
+    error = _validate_static_inputs(data)
+    if error:
+        if weather is not None:
+            weather.cancel()
+        return {'error': error}, 400
+
+    if weather is not None:
+        # Same filling rules as the sync route, with the lookup already done
+        _fill_missing_inputs(data, {data.get('location', 'Hyderabad'): await weather})
+    else:
+        _fill_missing_inputs(data)
+
+    season = _current_season()
+    lang = data.get('lang', 'en')
+    cache_key = response_cache.make_key(data, season, registry.version(), lang=('en', lang))
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        crop_predictions, fertilizer_result, predicted_yield_val = cached
+        top_crop = crop_predictions[0]
+    else:
+        try:
+            features = preprocessor.preprocess(data)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        crop_predictions = await loop.run_in_executor(
+            rt.cpu_pool, _timed_call, 'crop_inference', predictor.predict, features, 3
+        )
+        if not crop_predictions:
+            return {'error': 'Crop prediction failed'}, 500
+
+        top_crop = crop_predictions[0]
+        fertilizer_result, predicted_yield_val = await asyncio.gather(
+            loop.run_in_executor(
+                rt.cpu_pool, lambda: _timed_call(
+                    'fertilizer_inference', fertilizer_recommender.recommend,
+                    lang=lang, **_fertilizer_inputs(data, top_crop['crop'])
+                )
+            ),
+            loop.run_in_executor(
+                rt.cpu_pool, lambda: _timed_call(
+                    'yield_inference', yield_predictor.predict, **_yield_inputs(data, top_crop['crop'], season)
+                )
+            ),
+        )
+        response_cache.put(cache_key, (crop_predictions, fertilizer_result, predicted_yield_val))
+
+    body = _recommendation(data, crop_predictions, fertilizer_result, predicted_yield_val, season)
+    _store_in_background(rt, dict(data), top_crop, fertilizer_result, season, predicted_yield_val)
+    return body, 200
+
+
+@predict_async_bp.route('/recommend/async', methods=['POST'])
+def recommend_async():
+    """
+    Same input and output as /recommend, served by the shared event loop.
+    The request thread still waits for the pipeline; only the validation
+    overlaps the weather lookup, and fertilizer and yield inference run
+    concurrently (everything else needs the weather fields or the crop).
+    """
+    try:
+        data = request.json
+        if not data:
+            return jsonify({'error': 'No input data provided'}), 400
+
+        rt = runtime.get()
+        with timed('async_pipeline'):
+            future = asyncio.run_coroutine_threadsafe(_recommend(rt, data), rt.loop)
+            body, status = future.result(ASYNC_REQUEST_TIMEOUT)
+        return jsonify(body), status
+
+    except FutureTimeout:
+        future.cancel()
+        return jsonify({'error': 'Prediction timed out'}), 504
+    except Exception as e:
+        print(f"Async Prediction API Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': 'Internal Server Error', 'details': str(e)}), 500
@@ -1,13 +1,15 @@
 from flask import Blueprint, jsonify, request, send_file
 from datetime import datetime
 from services.aggregation_service import AggregationService
-import subprocess
-import json
-import os
-import tempfile
+from services.pdf_service import PdfService
+from backend.utils.metrics import metrics, timed
+import io
 
 report_bp = Blueprint('report', __name__)
 agg_service = AggregationService()
+pdf_service = PdfService()
+
+metrics.register_collector('mitti_pdf_cache', 'PDF report cache', pdf_service.cache_stats)
 
 @report_bp.route('/summary', methods=['GET'])
 def get_summary_report():
@@ -15,14 +17,23 @@ def get_summary_report():
     Returns a unified soil health report based on aggregated data.
     """
     try:
-        # Fetch 30-day aggregation
-        stats = agg_service.get_30_day_average()
-        
+        device_id = request.args.get('device_id', 'pi_01')
+        days = max(min(request.args.get('days', 30, type=int), 366), 1)
+
+        # Window aggregation (served from the per-device rollups)
+        with timed('report_window_average'):
+            stats = agg_service.get_window_average(device_id, days=days)
+        with timed('report_window_stats'):
+            window_stats = agg_service.get_window_stats(device_id, days=days)
+
         report = {
             'report_id': f"RPT-{int(datetime.now().timestamp())}",
             'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'period': 'Last 30 Days',
+            'period': f'Last {days} Days',
+            'device_id': device_id,
             'soil_health_summary': stats,
+            # Per-metric count/mean/stddev/min/max; None in mock mode
+            'statistics': window_stats,
             'overall_status': 'Good' # Logic to determine status could be added
         }
         
@@ -40,45 +51,24 @@ def download_pdf():
         data = request.json
         if not data:
             return jsonify({'error': 'No data provided'}), 400
-        
-        # Call Node.js PDF service
-        # Create temporary file for data
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(data, f)
-            temp_file = f.name
-        
+
+        # Rendered in memory by a persistent Node renderer (or served from the cache)
         try:
-            # Call Node.js script to generate PDF
-            result = subprocess.run(
-                ['node', 'generate_pdf.js', temp_file],
-                cwd=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services'),
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode != 0:
-                print(f"PDF generation error: {result.stderr}")
-                return jsonify({'error': 'PDF generation failed', 'details': result.stderr}), 500
-            
-            # Get the PDF file path from stdout
-            pdf_path = result.stdout.strip()
-            
-            if os.path.exists(pdf_path):
-                return send_file(
-                    pdf_path,
-                    mimetype='application/pdf',
-                    as_attachment=True,
-                    download_name=f'mitti-mitra-report-{datetime.now().strftime("%Y%m%d")}.pdf'
-                )
-            else:
-                return jsonify({'error': 'PDF file not found'}), 500
-                
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_file):
-                os.unlink(temp_file)
-            
+            pdf_bytes, digest, cache_hit = pdf_service.render_report(data)
+        except RuntimeError as e:
+            print(f"PDF generation error: {e}")
+            return jsonify({'error': 'PDF generation failed', 'details': str(e)}), 500
+
+        response = send_file(
+            io.BytesIO(pdf_bytes),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f'mitti-mitra-report-{datetime.now().strftime("%Y%m%d")}.pdf'
+        )
+        response.set_etag(digest)
+        response.headers['X-Report-Cache'] = 'hit' if cache_hit else 'miss'
+        return response
+
     except Exception as e:
         print(f"PDF download error: {e}")
         import traceback
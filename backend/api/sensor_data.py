@@ -1,48 +1,180 @@
+import json
+import zlib
 from flask import Blueprint, request, jsonify
 from config.supabase_client import supabase
+from utils.helpers import validate_sensor_batch
+from utils.sensor_wire import CONTENT_TYPE as READINGS_TYPE, BatchTooLarge, decode_readings
+from backend.utils.db_errors import is_permanent_error
+from backend.utils.metrics import DB_ERRORS, MOCK_RESPONSES, timed
 from datetime import datetime
 
 sensor_bp = Blueprint('sensor', __name__)
 
+# Upper bounds for one ingestion request (a Pi flushing its backlog)
+MAX_INGEST_BATCH = 5000
+MAX_INGEST_BYTES = 16 * 1024 * 1024  # Decompressed body size
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def _read_payload():
+    """
+    Parses the request body into a list of readings.
+    Accepts a single JSON object, a JSON array, {"readings": [...]},
+    NDJSON (one reading per line) or the Pi's compact binary batch format
+    (utils/sensor_wire.py); the body may be gzip-compressed.
+    NDJSON lines are parsed one by one: a line that is not valid JSON becomes
+    None in readings and its error is reported in line_errors.
+    Returns (readings, is_batch, line_errors {index: message}).
+    """
+    body = request.get_data(cache=False)
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = inflater.decompress(body, MAX_INGEST_BYTES)
+        if inflater.unconsumed_tail:
+            raise ValueError('Decompressed payload too large')
+
+    if request.mimetype == READINGS_TYPE:
+        return decode_readings(body, max_rows=MAX_INGEST_BATCH), True, {}
+
+    if request.mimetype in NDJSON_TYPES:
+        readings, line_errors = [], {}
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                readings.append(json.loads(line))
+            except ValueError as e:
+                line_errors[len(readings)] = f"Invalid JSON: {e}"
+                readings.append(None)
+        return readings, True, line_errors
+
+    if not body:
+        return [], False, {}
+    data = json.loads(body)
+    if isinstance(data, list):
+        return data, True, {}
+    if isinstance(data, dict) and isinstance(data.get('readings'), list):
+        return data['readings'], True, {}
+    return [data], False, {}
+
+
+def _to_record(data):
+    # Map input to DB schema
+    return {
+        'device_id': data.get('device_id') or 'pi_01',
+        'temperature': data.get('temperature'),
+        'humidity': data.get('humidity'),
+        'ph': data.get('ph'),
+        'nitrogen': data.get('nitrogen'),
+        'phosphorus': data.get('phosphorus'),
+        'potassium': data.get('potassium'),
+        'rainfall': data.get('rainfall', 0.0),
+        'timestamp': data.get('timestamp') or datetime.now().isoformat()
+    }
+
+
+def _insert_readings(indices, records, stored, rejected):
+    """
+    Bulk-inserts records (one per index in indices). If the database rejects
+    the chunk, it is split in halves until the rejected records are isolated;
+    their indices go to rejected with the database's message, the others to stored.
+    Transient errors (database unreachable) are raised to the caller.
+    """
+    try:
+        with timed('sensor_insert'):
+            supabase.table('sensor_readings').insert(records).execute()
+        stored.extend(indices)
+        return
+    except Exception as e:
+        print(f"Supabase Insert Error: {e}")
+        DB_ERRORS.inc('sensor_insert')
+        if not is_permanent_error(e):
+            raise
+        if len(records) == 1:
+            rejected[indices[0]] = getattr(e, 'message', None) or str(e)
+            return
+
+    middle = len(records) // 2
+    _insert_readings(indices[:middle], records[:middle], stored, rejected)
+    _insert_readings(indices[middle:], records[middle:], stored, rejected)
+
+
 @sensor_bp.route('/data', methods=['POST'])
 def receive_data():
     """
     Ingest data from Raspberry Pi.
+    Takes one reading or a batch (JSON array / gzip'd NDJSON / binary); a batch is
+    validated in one pass and stored with a single bulk insert. Rows that are
+    unparsable or would not fit the table's NUMERIC columns are rejected on
+    their own, so they cannot fail the insert of the rest; so are rows the
+    database rejects (bad data: 422 for a single reading). If the database is
+    unreachable the response is 503 and the unstored rows are marked db_error.
     """
-    data = request.json
-    if not data:
+    try:
+        with timed('sensor_parse'):
+            readings, is_batch, line_errors = _read_payload()
+    except BatchTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except (ValueError, OSError, zlib.error) as e:
+        return jsonify({'error': 'Invalid payload', 'message': str(e)}), 400
+
+    if not readings:
         return jsonify({'error': 'No data received'}), 400
-        
-    # Validates output
-    print(f"Received Sensor Data: {data}")
+    if len(readings) > MAX_INGEST_BATCH:
+        return jsonify({'error': f'Batch too large (max {MAX_INGEST_BATCH} readings)'}), 413
 
-    if supabase:
+    with timed('sensor_validate'):
+        validation = validate_sensor_batch(readings)
+    for i, message in line_errors.items():
+        validation[i] = (False, message)
+    accepted = [i for i, (ok, _) in enumerate(validation) if ok]
+
+    if not is_batch:
+        print(f"Received Sensor Data: {readings[0]}")
+        if not accepted:
+            return jsonify({'error': validation[0][1]}), 400
+    else:
+        print(f"Received Sensor Batch: {len(accepted)}/{len(readings)} valid readings")
+
+    stored_status = 'stored' if supabase else 'mock_stored'
+    stored, rejected, db_error = accepted, {}, None
+    if not supabase:
+        MOCK_RESPONSES.inc('sensor_mock_stored')
+    elif accepted:
+        # One bulk write for the whole batch; a row the database rejects is
+        # isolated by bisection so the rest of the batch is still stored
+        stored = []
         try:
-            # Map input to DB schema
-            record = {
-                'device_id': data.get('device_id', 'pi_01'),
-                'temperature': data.get('temperature'),
-                'humidity': data.get('humidity'),
-                'ph': data.get('ph'),
-                'nitrogen': data.get('nitrogen'),
-                'phosphorus': data.get('phosphorus'),
-                'potassium': data.get('potassium'),
-                'rainfall': data.get('rainfall', 0.0),
-                'timestamp': data.get('timestamp', datetime.now().isoformat())
-            }
-            
-            # Fire and forget / await
-            supabase.table('sensor_readings').insert(record).execute()
-            return jsonify({'status': 'stored'}), 201
-            
+            _insert_readings(accepted, [_to_record(readings[i]) for i in accepted], stored, rejected)
         except Exception as e:
-            print(f"Supabase Insert Error: {e}")
-            # Do not fail the Pi request if DB is down, just log
-            # The Pi has local backup logic
-            return jsonify({'error': 'db_error', 'message': str(e)}), 500
-    else:
-        # Mock mode
-        return jsonify({'status': 'mock_stored'}), 200
+            # Do not fail silently: the Pi keeps rows that were not stored
+            # and retries them from its local backup
+            db_error = str(e)
+    for i, message in rejected.items():
+        validation[i] = (False, message)
+
+    if not is_batch:
+        if db_error:
+            return jsonify({'error': 'db_error', 'message': db_error}), 503
+        if rejected:
+            return jsonify({'error': 'rejected', 'message': rejected[0]}), 422
+        return jsonify({'status': stored_status}), 201 if supabase else 200
+
+    stored = set(stored)
+    results = []
+    for i, (ok, message) in enumerate(validation):
+        if not ok:
+            results.append({'index': i, 'status': 'rejected', 'error': message})
+        else:
+            results.append({'index': i, 'status': stored_status if i in stored else 'db_error'})
+    return jsonify({
+        'status': 'db_error' if db_error else 'ok',
+        'received': len(readings),
+        'accepted': len(stored),
+        'rejected': len(readings) - len(accepted) + len(rejected),
+        'results': results
+    }), 503 if db_error else 200
 
 @sensor_bp.route('/latest', methods=['GET'])
 def get_latest():
@@ -51,18 +183,21 @@ def get_latest():
     """
     if supabase:
         try:
-            response = supabase.table('sensor_readings')\
-                .select('*')\
-                .order('timestamp', desc=True)\
-                .limit(1)\
-                .execute()
+            with timed('sensor_latest_query'):
+                response = supabase.table('sensor_readings')\
+                    .select('*')\
+                    .order('timestamp', desc=True)\
+                    .limit(1)\
+                    .execute()
             
             if response.data:
                 return jsonify(response.data[0])
         except Exception as e:
             print(f"Fetch Error: {e}")
+            DB_ERRORS.inc('sensor_latest')
             
     # Mock Fallback
+    MOCK_RESPONSES.inc('sensor_latest')
     return jsonify({
         'temperature': 26.5,
         'humidity': 55.0,
@@ -1,8 +1,9 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, g, request, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
 import sys
+import time
 
 # Ensure backend directory is in path
 # Ensure backend directory and project root are in path
@@ -20,16 +21,46 @@ def create_app():
     # We use deferred imports inside create_app to avoid circular dependencies if any
     try:
         from api.predict import predict_bp
+        from api.predict_async import predict_async_bp
         from api.sensor_data import sensor_bp
         from api.report import report_bp
 
         app.register_blueprint(predict_bp, url_prefix='/api/predict')
+        app.register_blueprint(predict_async_bp, url_prefix='/api/predict')
         app.register_blueprint(sensor_bp, url_prefix='/api/sensor') # '/api/sensor' matches pi config
         app.register_blueprint(report_bp, url_prefix='/api/report')
     except ImportError as e:
         print(f"Warning: Could not import some API blueprints: {e}")
         print("Note: This is expected during initial generation phase.")
 
+    # Warm up the model registry so the first request does not pay for unpickling
+    try:
+        from ml.model_registry import registry
+        registry.warm_up()
+    except Exception as e:
+        print(f"Warning: Model warm-up failed: {e}")
+
+    # Request latency for /metrics; per-stage timings are recorded inside the blueprints
+    from backend.utils.metrics import metrics, REQUEST_SECONDS
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                request.endpoint or 'unmatched', request.method, response.status_code
+            )
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
     @app.route('/')
     def health_check():
         return jsonify({
@@ -42,5 +73,6 @@ def create_app():
 
 if __name__ == '__main__':
     app = create_app()
+    # Development server only; production runs wsgi:app under gunicorn (see gunicorn.conf.py)
     port = int(os.environ.get("PORT", 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get("FLASK_DEBUG", "1") == "1")
@@ -0,0 +1,335 @@
+"""
+Offline benchmark for the recommend pipeline and each model stage.
+
+Runs without a server, network or database: Supabase is replaced by an
+in-memory stub and weather by the deterministic stub backend. Inputs are
+seeded, so runs are comparable across commits.
+
+Usage:
+    python benchmark.py                                  # all stages, sizes 1, 32, 1024
+    python benchmark.py --output bench.json              # write results
+    python benchmark.py --baseline bench_baseline.json   # compare (exit 1 on regression)
+    python benchmark.py --stages crop fertilizer --sizes 1 32 --min-time 0.5
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Stub weather backend (no network) before any service is imported
+os.environ.setdefault("WEATHER_BACKEND", "stub")
+os.environ.setdefault("WEATHER_STUB_LATENCY", "0")
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.dirname(current_dir))
+
+DEFAULT_SIZES = [1, 32, 1024]
+STAGES = ['preprocess', 'weather', 'crop', 'fertilizer', 'yield', 'recommend', 'recommend_cached']
+SEED = 42
+
+STATES = ['Telangana', 'Punjab', 'Assam', 'Karnataka', 'Maharashtra']
+CITIES = ['Warangal', 'Hyderabad', 'Ludhiana', 'Guwahati', 'Mysuru', 'Pune', 'Nagpur', 'Karimnagar']
+SOILS = ['Loamy', 'Sandy', 'Clayey', 'Black', 'Red']
+
+
+class _StubResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class _StubQuery:
+    """
+    Accepts any supabase-py query chain and returns no rows.
+    """
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+
+    def insert(self, records):
+        self.client.inserted += len(records) if isinstance(records, list) else 1
+        return self
+
+    def __getattr__(self, name):
+        # select/eq/gte/order/limit/... are all no-ops
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return _StubResponse([])
+
+
+class StubSupabase:
+    """
+    In-memory stand-in for the Supabase client; counts inserted rows.
+    """
+
+    def __init__(self):
+        self.inserted = 0
+
+    def table(self, name):
+        return _StubQuery(self, name)
+
+    def rpc(self, name, params):
+        return _StubQuery(self, name)
+
+
+def _install_stub_supabase():
+    # Modules bind `supabase` at import, so the stub must be in place first
+    import config.supabase_client as supabase_client
+    supabase_client.supabase = StubSupabase()
+    return supabase_client.supabase
+
+
+def make_samples(n, seed=SEED):
+    """
+    Seeded recommend payloads covering the ranges seen in the field.
+    """
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n):
+        samples.append({
+            'N': rng.randint(0, 140),
+            'P': rng.randint(5, 145),
+            'K': rng.randint(5, 205),
+            'temperature': round(rng.uniform(10, 40), 1),
+            'humidity': round(rng.uniform(20, 95), 1),
+            'ph': round(rng.uniform(4, 9), 2),
+            'rainfall': rng.randint(20, 300),
+            'moisture': rng.randint(20, 70),
+            'soil_type': rng.choice(SOILS),
+            'state': rng.choice(STATES),
+            'district': 'Warangal',
+            'location': rng.choice(CITIES),
+        })
+    return samples
+
+
+def measure(fn, size, min_time=1.0, min_iterations=5, max_iterations=10000, warmup=2):
+    """
+    Calls fn() repeatedly and returns latency percentiles (ms per call) and
+    throughput (samples per second, `size` samples per call).
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < max_iterations:
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= min_iterations and time.perf_counter() - start >= min_time:
+            break
+
+    timings = np.array(timings) * 1000.0
+    total_seconds = timings.sum() / 1000.0
+    return {
+        'iterations': len(timings),
+        'throughput_per_s': round(size * len(timings) / total_seconds, 2) if total_seconds else None,
+        'mean_ms': round(float(timings.mean()), 4),
+        'p50_ms': round(float(np.percentile(timings, 50)), 4),
+        'p95_ms': round(float(np.percentile(timings, 95)), 4),
+        'p99_ms': round(float(np.percentile(timings, 99)), 4),
+    }
+
+
+def build_stages():
+    """
+    Returns {stage: factory(samples) -> zero-arg callable for one batch}.
+    """
+    from app import create_app
+    from ml.predictor import CropPredictor
+    from ml.fertilizer_recommender import FertilizerRecommender
+    from ml.yield_predictor import YieldPredictor
+    from ml.preprocess import DataPreprocessor
+    from services.weather_service import WeatherService
+    from services.recommendation_cache import RESPONSE_CACHE_MAX_ENTRIES
+
+    app = create_app()
+    client = app.test_client()
+    preprocessor = DataPreprocessor()
+    crop_predictor = CropPredictor()
+    fertilizer_recommender = FertilizerRecommender()
+    yield_predictor = YieldPredictor()
+    weather_service = WeatherService()
+
+    def preprocess(samples):
+        if len(samples) == 1:
+            return lambda: preprocessor.preprocess(samples[0])
+        return lambda: preprocessor.preprocess_many(samples)
+
+    def weather(samples):
+        cities = [s['location'] for s in samples]
+        return lambda: [weather_service.get_current_weather(city) for city in cities]
+
+    def crop(samples):
+        features = preprocessor.preprocess_many(samples)
+        if len(samples) == 1:
+            return lambda: crop_predictor.predict(features[0], top_n=3)
+        return lambda: crop_predictor.predict_batch(features, top_n=3)
+
+    def fertilizer(samples):
+        rows = [{
+            'temperature': s['temperature'],
+            'humidity': s['humidity'],
+            'moisture': s['moisture'],
+            'soil_type': s['soil_type'],
+            'crop_type': 'rice',
+            'nitrogen': s['N'],
+            'potassium': s['K'],
+            'phosphorous': s['P'],
+        } for s in samples]
+        if len(rows) == 1:
+            r = rows[0]
+            return lambda: fertilizer_recommender.recommend(
+                r['temperature'], r['humidity'], r['moisture'], r['soil_type'], r['crop_type'],
+                r['nitrogen'], r['potassium'], r['phosphorous']
+            )
+        return lambda: fertilizer_recommender.recommend_batch(rows)
+
+    def yield_(samples):
+        rows = [{
+            'state': s['state'],
+            'district': s['district'],
+            'crop': 'Rice',
+            'season': 'Kharif',
+            'rainfall': s['rainfall'] * 12,
+            'fertilizer': 120.0,
+            'pesticide': 0.5,
+            'soil_type': s['soil_type'],
+        } for s in samples]
+        if len(rows) == 1:
+            r = rows[0]
+            return lambda: yield_predictor.predict(
+                r['state'], r['district'], r['crop'], r['season'],
+                r['rainfall'], r['fertilizer'], r['pesticide'], r['soil_type']
+            )
+        return lambda: yield_predictor.predict_batch(rows)
+
+    def recommend(samples, cached=False):
+        from api.predict import MAX_BATCH_SIZE, response_cache
+
+        # The samples repeat every iteration, so with the response cache on this
+        # would only time cache hits. 'recommend' runs the full pipeline;
+        # 'recommend_cached' times the hits separately (the warmup fills the cache).
+        response_cache.clear()
+        response_cache.max_entries = RESPONSE_CACHE_MAX_ENTRIES if cached else 0
+
+        def post(path, payload):
+            response = client.post(path, json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+        if len(samples) == 1:
+            # The route fills inputs in place; send a fresh copy each time
+            return lambda: post('/api/predict/recommend', dict(samples[0]))
+
+        def post_batches():
+            # Larger sizes go out as consecutive max-size requests, as a client would send them
+            for start in range(0, len(samples), MAX_BATCH_SIZE):
+                chunk = samples[start:start + MAX_BATCH_SIZE]
+                post('/api/predict/recommend/batch', {'samples': [dict(s) for s in chunk]})
+        return post_batches
+
+    return {
+        'preprocess': preprocess,
+        'weather': weather,
+        'crop': crop,
+        'fertilizer': fertilizer,
+        'yield': yield_,
+        'recommend': recommend,
+        'recommend_cached': lambda samples: recommend(samples, cached=True),
+    }
+
+
+def run(stages=STAGES, sizes=DEFAULT_SIZES, min_time=1.0):
+    random.seed(SEED)
+    np.random.seed(SEED)
+    stub = _install_stub_supabase()
+    factories = build_stages()
+
+    results = {}
+    for stage in stages:
+        results[stage] = {}
+        for size in sizes:
+            # The services log per-sample warnings with print(); keep them out of the report
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                fn = factories[stage](make_samples(size))
+                stats = measure(fn, size, min_time=min_time)
+            results[stage][str(size)] = stats
+            print(f"{stage:>16} x{size:<5} p50 {stats['p50_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms  "
+                  f"p99 {stats['p99_ms']:>10.3f} ms  {stats['throughput_per_s']:>12.1f} samples/s")
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': SEED,
+            'min_time': min_time,
+            'stub_rows_inserted': stub.inserted,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.2):
+    """
+    Compares p50 latency and throughput against a baseline run.
+    Returns a list of regressions beyond `tolerance` (0.2 = 20%).
+    """
+    regressions = []
+    for stage, by_size in current['results'].items():
+        for size, stats in by_size.items():
+            base = baseline.get('results', {}).get(stage, {}).get(size)
+            if not base:
+                continue
+            p50_ratio = stats['p50_ms'] / base['p50_ms'] if base['p50_ms'] else 1.0
+            tput_ratio = stats['throughput_per_s'] / base['throughput_per_s'] if base['throughput_per_s'] else 1.0
+            flag = p50_ratio > 1 + tolerance or tput_ratio < 1 - tolerance
+            print(f"{stage:>16} x{size:<5} p50 x{p50_ratio:.2f}  throughput x{tput_ratio:.2f}"
+                  f"{'  REGRESSION' if flag else ''}")
+            if flag:
+                regressions.append({'stage': stage, 'size': size, 'p50_ratio': round(p50_ratio, 3),
+                                    'throughput_ratio': round(tput_ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Mitti Mitra backend")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--min-time', type=float, default=1.0, help="Seconds to sample each stage/size")
+    parser.add_argument('--output', help="Write results as JSON")
+    parser.add_argument('--baseline', help="Baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args.stages, args.sizes, args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
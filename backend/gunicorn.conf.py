@@ -0,0 +1,78 @@
+"""
+Gunicorn settings for serving the Flask API in production:
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+The master imports wsgi.py (loading every model) before forking, so workers
+share the model memory copy-on-write instead of each holding its own copy.
+Workers are recycled after WEB_MAX_REQUESTS requests and stopped gracefully.
+"""
+import gc
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+
+# One BLAS/OpenMP thread per worker: the workers already fill the cores, and
+# per-worker thread pools would oversubscribe them. Must be set before numpy loads.
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Workers write their metrics to per-process files here and /metrics sums them
+# (utils/metrics.py). Must be set before the app loads.
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"mitti_metrics_{os.getenv('PORT', '5000')}"))
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# A couple of threads per worker overlap weather/Supabase I/O with inference
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "2"))
+
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))                  # Seconds before a stuck worker is killed
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))  # Seconds to finish in-flight requests on restart
+keepalive = 5
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "5000"))       # Recycle workers to bound memory growth
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "500"))  # So workers do not restart together
+
+accesslog = "-"
+errorlog = "-"
+
+# Collections in the master would touch (and so un-share) every object header;
+# keep the collector off until the app is loaded and frozen.
+gc.disable()
+
+
+def on_starting(server):
+    # Metrics of a previous server run would otherwise be added to this one's
+    if os.environ.get("METRICS_DIR"):
+        for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "metrics_*.json")):
+            os.remove(path)
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far (models included) to the permanent generation,
+    # so the workers' collections never write to the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+    metrics = sys.modules.get('backend.utils.metrics')
+    if metrics is not None:
+        metrics.metrics.start_sync()
+
+
+def worker_exit(server, worker):
+    # Write out queued predictions and stop PDF renderers before the worker goes away
+    predict = sys.modules.get('api.predict')
+    if predict is not None:
+        predict.storage_service.flush()
+    report = sys.modules.get('api.report')
+    if report is not None:
+        report.pdf_service.close()
+    # Keep this worker's counts once it is gone (recycled after max_requests)
+    metrics = sys.modules.get('backend.utils.metrics')
+    if metrics is not None:
+        metrics.metrics.stop_sync()
@@ -0,0 +1,173 @@
+"""
+Typed, columnar binary cache for the training CSVs.
+
+`read_csv_cached(path)` returns the same table as `pd.read_csv(path)`
+(writable columns, text as plain strings with NaN for missing values), but
+after the first parse it is served from a cache directory next to the CSV
+(`<name>.csv.cols/`): one .npy file per column, with text columns
+dictionary-encoded (int codes + a category list). The cache records the
+CSV's size and mtime and is rebuilt whenever the CSV changes (e.g. after
+appending real-world rows), so loading takes milliseconds.
+
+`read_csv_cached(path, shared=True)` skips the conversions and is faster
+still, but is not a drop-in: numeric columns are read-only memory maps
+(shared between concurrent experiments; assigning into them raises) and text
+columns are pandas categoricals (`.cat`, not plain strings).
+In both modes text values are stored as str, so a text column holding other
+Python types (which read_csv only produces for mixed columns) comes back as str.
+
+Convert every dataset up front with:
+    python column_cache.py            # all CSVs in data/
+    python column_cache.py a.csv ...  # specific files
+"""
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+CACHE_SUFFIX = '.cols'
+META_FILE = 'meta.json'
+
+# MITTI_COLUMN_CACHE=0 always parses the CSV (e.g. when the data dir is read-only)
+ENABLED = os.getenv("MITTI_COLUMN_CACHE", "1") != "0"
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+
+
+def cache_dir(csv_path):
+    return csv_path + CACHE_SUFFIX
+
+
+def _source_signature(csv_path):
+    st = os.stat(csv_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(csv_path):
+    """
+    True if the cache exists and was built from the CSV as it is now.
+    """
+    meta = _read_meta(cache_dir(csv_path))
+    return (
+        meta is not None
+        and meta.get('format') == FORMAT_VERSION
+        and meta.get('source') == _source_signature(csv_path)
+    )
+
+
+def build_cache(csv_path, df=None):
+    """
+    Parses the CSV (unless `df` is given) and writes its columnar cache.
+    The cache is written to a temporary directory and swapped in, so readers
+    never see a half-written cache. Returns the parsed DataFrame.
+    """
+    signature = _source_signature(csv_path)
+    if df is None:
+        df = pd.read_csv(csv_path)
+
+    target = cache_dir(csv_path)
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        filename = f"c{i}.npy"
+        if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            np.save(os.path.join(tmp, filename), series.to_numpy())
+            columns.append({'name': name, 'kind': 'numeric', 'file': filename})
+        else:
+            # Dictionary encoding: small int codes (-1 = missing) + sorted category list
+            categorical = pd.Categorical(series)
+            np.save(os.path.join(tmp, filename), categorical.codes)
+            columns.append({
+                'name': name,
+                'kind': 'category',
+                'file': filename,
+                'categories': [str(c) for c in categorical.categories],
+            })
+
+    with open(os.path.join(tmp, META_FILE), 'w') as f:
+        json.dump({'format': FORMAT_VERSION, 'source': signature, 'rows': len(df), 'columns': columns}, f)
+
+    # Swap in; open memory maps of an old cache stay valid until closed
+    old = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.replace(target, old)
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        # Another process swapped in its (identical) cache first
+        shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+    return df
+
+
+def load_cache(csv_path, shared=False):
+    """
+    Loads a cache as a DataFrame.
+    shared=False: writable in-memory columns, text as plain strings (as read_csv returns them).
+    shared=True: read-only memory-mapped numeric columns and categorical text columns.
+    """
+    directory = cache_dir(csv_path)
+    meta = _read_meta(directory)
+    data = {}
+    for column in meta['columns']:
+        values = np.load(os.path.join(directory, column['file']), mmap_mode='r' if shared else None)
+        if column['kind'] == 'category':
+            if shared:
+                values = pd.Categorical.from_codes(values, categories=pd.Index(column['categories']))
+            else:
+                # Code -1 (missing) picks the trailing NaN
+                lookup = np.array(column['categories'] + [np.nan], dtype=object)
+                values = lookup[values]
+        data[column['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def read_csv_cached(csv_path, shared=False):
+    """
+    Drop-in for pd.read_csv(csv_path) that goes through the columnar cache.
+    With shared=True columns are read-only memory maps and text columns are
+    categoricals (see the module docstring).
+    """
+    if not ENABLED:
+        return pd.read_csv(csv_path)
+    if is_fresh(csv_path):
+        try:
+            return load_cache(csv_path, shared)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Column cache for {os.path.basename(csv_path)} unreadable, rebuilding: {e}")
+
+    df = pd.read_csv(csv_path)
+    try:
+        build_cache(csv_path, df)
+    except OSError as e:
+        print(f"Could not write column cache for {os.path.basename(csv_path)}: {e}")
+        return df
+    return load_cache(csv_path, shared) if shared else df
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or sorted(
+        os.path.join(DATA_DIR, name) for name in os.listdir(DATA_DIR) if name.endswith('.csv')
+    )
+    for path in paths:
+        if is_fresh(path):
+            print(f"Up to date: {os.path.basename(path)}")
+            continue
+        frame = build_cache(path)
+        print(f"Cached {os.path.basename(path)}: {frame.shape[0]} rows, {frame.shape[1]} columns")
@@ -2,6 +2,12 @@ import pandas as pd
 import os
 import sys
 
+try:
+    from .column_cache import read_csv_cached
+except ImportError:
+    from column_cache import read_csv_cached
+
+
 class CropYieldHandler:
     def __init__(self):
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -22,7 +28,8 @@ class CropYieldHandler:
                 raise FileNotFoundError(f"Dataset not found at {self.data_path}")
 
         try:
-            df = pd.read_csv(self.data_path)
+            # Served from the columnar cache once the CSV has been parsed
+            df = read_csv_cached(self.data_path)
             
             # Normalize columns
             df.columns = [c.strip() for c in df.columns]
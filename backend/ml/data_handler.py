@@ -2,6 +2,12 @@ import pandas as pd
 import os
 import sys
 
+try:
+    from .column_cache import read_csv_cached
+except ImportError:
+    from column_cache import read_csv_cached
+
+
 class DataHandler:
     def __init__(self):
         # Determine the root directory (assuming this script is in backend/ml/)
@@ -19,7 +25,8 @@ class DataHandler:
             raise FileNotFoundError(f"Dataset not found at {self.data_path}")
 
         try:
-            df = pd.read_csv(self.data_path)
+            # Served from the columnar cache once the CSV has been parsed
+            df = read_csv_cached(self.data_path)
             
             # Map columns to standard names if necessary
             # Expected by model: N, P, K, temperature, humidity, ph, rainfall, label
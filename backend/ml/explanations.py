@@ -0,0 +1,101 @@
+"""
+Reasoning rules for crop and fertilizer recommendations, as vectorized
+threshold tables over whole batches.
+
+Each function returns an int16 matrix of message codes (one row per
+recommendation, 0 = no message, columns in display order). The codes index the
+pre-translated templates in backend/utils/translator.py and are turned into
+text only when the response is built (render_messages).
+"""
+import numpy as np
+
+from backend.utils.translator import MESSAGE_CODES
+
+# Crop model feature columns: [N, P, K, Temp, Hum, pH, Rain]
+TEMP, PH, RAIN = 3, 5, 6
+
+# (crops the rule applies to, message) -- the first two are mutually exclusive
+CROP_HIGH_RAINFALL = (['rice', 'jute', 'sugarcoffee', 'coconut'], MESSAGE_CODES['crop_high_rainfall'])
+CROP_LOW_RAINFALL = (['chickpea', 'mothbeans', 'lentil', 'gram'], MESSAGE_CODES['crop_low_rainfall'])
+CROP_NOT_WARM = ['wheat', 'pea']
+
+# Fertilizer: crop group -> message, checked in order
+FERTILIZER_CROP_RULES = [
+    (['rice', 'paddy'], MESSAGE_CODES['fert_crop_high_n']),
+    (['wheat', 'maize'], MESSAGE_CODES['fert_crop_balanced']),
+    (['cotton'], MESSAGE_CODES['fert_crop_high_k']),
+    (['pulses', 'legumes'], MESSAGE_CODES['fert_crop_high_p']),
+]
+
+# Fertilizer: (value column, low threshold, low message, high threshold, high message)
+FERTILIZER_LEVEL_RULES = [
+    ('nitrogen', 30, MESSAGE_CODES['fert_low_n'], 50, MESSAGE_CODES['fert_ok_n']),
+    ('phosphorous', 20, MESSAGE_CODES['fert_low_p'], 40, MESSAGE_CODES['fert_ok_p']),
+    ('potassium', 30, MESSAGE_CODES['fert_low_k'], 50, MESSAGE_CODES['fert_ok_k']),
+    ('moisture', 35, MESSAGE_CODES['fert_low_moisture'], 60, MESSAGE_CODES['fert_high_moisture']),
+]
+
+FERTILIZER_SOIL_RULES = [
+    ('sandy', MESSAGE_CODES['fert_sandy']),
+    ('clayey', MESSAGE_CODES['fert_clayey']),
+]
+
+
+def _lower(values):
+    # Lower-cased string array; None/empty become ''
+    return np.array([str(v).lower() if v else '' for v in values], dtype=str)
+
+
+def crop_reason_codes(features, crops):
+    """
+    :param features: (n, 7) raw feature matrix, one row per recommendation
+    :param crops: n crop names
+    :return: (n, 3) int16 message codes
+    """
+    features = np.asarray(features, dtype=np.float64).reshape(-1, 7)
+    crops = _lower(crops)
+    codes = np.zeros((len(features), 3), dtype=np.int16)
+
+    rain = features[:, RAIN]
+    high = (rain > 150) & np.isin(crops, CROP_HIGH_RAINFALL[0])
+    low = ~high & (rain < 50) & np.isin(crops, CROP_LOW_RAINFALL[0])
+    codes[high, 0] = CROP_HIGH_RAINFALL[1]
+    codes[low, 0] = CROP_LOW_RAINFALL[1]
+
+    codes[(features[:, TEMP] > 30) & ~np.isin(crops, CROP_NOT_WARM), 1] = MESSAGE_CODES['crop_warm']
+
+    ph = features[:, PH]
+    codes[(ph >= 5.5) & (ph <= 7.0), 2] = MESSAGE_CODES['crop_ph_optimal']
+
+    codes[~codes.any(axis=1), 0] = MESSAGE_CODES['crop_default']
+    return codes
+
+
+def fertilizer_reason_codes(samples):
+    """
+    :param samples: list of dicts with crop_type, nitrogen, phosphorous,
+                    potassium, moisture and soil_type
+    :return: (n, 6) int16 message codes
+    """
+    n = len(samples)
+    codes = np.zeros((n, 2 + len(FERTILIZER_LEVEL_RULES)), dtype=np.int16)
+
+    crops = _lower([s.get('crop_type') for s in samples])
+    unmatched = crops != ''
+    for names, code in FERTILIZER_CROP_RULES:
+        hit = unmatched & np.isin(crops, names)
+        codes[hit, 0] = code
+        unmatched &= ~hit
+    codes[unmatched, 0] = MESSAGE_CODES['fert_crop_other']
+
+    for col, (key, low, low_code, high, high_code) in enumerate(FERTILIZER_LEVEL_RULES, start=1):
+        values = np.fromiter((s[key] for s in samples), dtype=np.float64, count=n)
+        codes[values < low, col] = low_code
+        codes[values > high, col] = high_code
+
+    soils = _lower([s.get('soil_type') for s in samples])
+    for soil, code in FERTILIZER_SOIL_RULES:
+        codes[soils == soil, -1] = code
+
+    codes[~codes.any(axis=1), 0] = MESSAGE_CODES['fert_default']
+    return codes
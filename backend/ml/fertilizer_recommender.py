@@ -1,7 +1,15 @@
-import os
-import pickle
 import numpy as np
 
+from backend.utils.translator import translate_text, render_messages, MESSAGE_CODES
+from backend.utils.metrics import MODEL_FALLBACKS
+
+try:
+    from .model_registry import artifact
+    from .explanations import fertilizer_reason_codes
+except ImportError:
+    from model_registry import artifact
+    from explanations import fertilizer_reason_codes
+
 class FertilizerRecommender:
     """
     ML-based fertilizer recommendation system.
@@ -11,36 +19,29 @@ class FertilizerRecommender:
     - Soil type
     - Predicted crop type (from crop prediction model)
     """
+
+    # Map crop prediction to fertilizer dataset crop names
+    CROP_MAPPING = {
+        'rice': 'Paddy',
+        'maize': 'Maize',
+        'wheat': 'Wheat',
+        'cotton': 'Cotton',
+        'sugarcane': 'Sugarcane',
+        'barley': 'Barley',
+        'millet': 'Millets',
+        'pulses': 'Pulses',
+        'tobacco': 'Tobacco',
+        'groundnut': 'Ground Nuts',
+        'oilseeds': 'Oil seeds'
+    }
     
-    def __init__(self):
-        """
-        Initialize the recommender by loading the trained model and encoders.
-        """
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.model_dir = os.path.join(os.path.dirname(current_dir), 'models')
-        
-        # Load model and encoders
-        self.model = self._load_model('fertilizer_model.pkl')
-        self.scaler = self._load_model('fertilizer_scaler.pkl')
-        self.soil_encoder = self._load_model('soil_encoder.pkl')
-        self.crop_encoder = self._load_model('crop_encoder.pkl')
-        self.fertilizer_encoder = self._load_model('fertilizer_label_encoder.pkl')
-        self.metadata = self._load_model('fertilizer_metadata.pkl')
-        
-    def _load_model(self, filename):
-        """Load a pickled model or encoder."""
-        path = os.path.join(self.model_dir, filename)
-        if os.path.exists(path):
-            try:
-                with open(path, 'rb') as f:
-                    return pickle.load(f)
-            except Exception as e:
-                print(f"Error loading {filename}: {e}")
-                return None
-        return None
-    
-    # Import translator
-    from backend.utils.translator import translate_text
+    # Model and encoders are loaded once per process through the model registry
+    model = artifact('fertilizer_model.pkl')
+    scaler = artifact('fertilizer_scaler.pkl')
+    soil_encoder = artifact('soil_encoder.pkl')
+    crop_encoder = artifact('crop_encoder.pkl')
+    fertilizer_encoder = artifact('fertilizer_label_encoder.pkl')
+    metadata = artifact('fertilizer_metadata.pkl')
 
     def recommend(self, temperature, humidity, moisture, soil_type, crop_type, nitrogen, potassium, phosphorous, lang='en'):
         """
@@ -64,6 +65,7 @@ class FertilizerRecommender:
         """
         if not self.model or not self.scaler:
             # Fallback to rule-based if model not loaded
+            MODEL_FALLBACKS.inc('fertilizer', 'model_missing')
             return self._rule_based_fallback(nitrogen, phosphorous, potassium, lang)
         
         try:
@@ -79,22 +81,7 @@ class FertilizerRecommender:
             
             # Handle crop type encoding
             # Map crop prediction to fertilizer dataset crop names
-            crop_mapping = {
-                'rice': 'Paddy',
-                'maize': 'Maize',
-                'wheat': 'Wheat',
-                'cotton': 'Cotton',
-                'sugarcane': 'Sugarcane',
-                'barley': 'Barley',
-                'millet': 'Millets',
-                'pulses': 'Pulses',
-                'tobacco': 'Tobacco',
-                'groundnut': 'Ground Nuts',
-                'oilseeds': 'Oil seeds'
-            }
-            
-            # Try to map the crop
-            mapped_crop = crop_mapping.get(crop_type.lower() if crop_type else '', 'Wheat')
+            mapped_crop = self.CROP_MAPPING.get(crop_type.lower() if crop_type else '', 'Wheat')
             
             if mapped_crop in self.crop_encoder.classes_:
                 crop_encoded = self.crop_encoder.transform([mapped_crop])[0]
@@ -125,109 +112,145 @@ class FertilizerRecommender:
             fertilizer_name = self.fertilizer_encoder.inverse_transform([prediction])[0]
             confidence = probabilities[prediction]
             
-            # Generate reasoning
-            reasoning = self._generate_reasoning(
-                fertilizer_name, crop_type, nitrogen, phosphorous, potassium,
-                temperature, humidity, moisture, soil_type
-            )
-            
-            # Translate
-            from backend.utils.translator import translate_text
-            
+            # Generate reasoning (pre-translated templates)
+            reasoning = self._generate_reasoning([{
+                'crop_type': crop_type,
+                'nitrogen': nitrogen,
+                'phosphorous': phosphorous,
+                'potassium': potassium,
+                'moisture': moisture,
+                'soil_type': soil_type
+            }], lang)[0]
+
             trans_fertilizer = translate_text(fertilizer_name, lang)
-            trans_reasoning = [translate_text(r, lang) for r in reasoning] # Need robust translation for sentences
-            
+
             return {
                 'fertilizer': fertilizer_name,
                 'translated_fertilizer': trans_fertilizer,
                 'confidence': round(float(confidence), 2),
-                'reasoning': trans_reasoning
+                'reasoning': reasoning
             }
             
         except Exception as e:
             print(f"Fertilizer prediction error: {e}")
+            MODEL_FALLBACKS.inc('fertilizer', 'error')
             return self._rule_based_fallback(nitrogen, phosphorous, potassium, lang)
     
-    def _generate_reasoning(self, fertilizer, crop, n, p, k, temp, humidity, moisture, soil_type):
+    def recommend_batch(self, samples, lang='en'):
+        """
+        Predict fertilizer recommendations for many samples with a single model call.
+        
+        Args:
+            samples: List of dicts with the same keys as recommend() arguments
+                (temperature, humidity, moisture, soil_type, crop_type,
+                nitrogen, potassium, phosphorous)
+            lang: Language code for translated output
+            
+        Returns:
+            List of recommendation dicts (same shape as recommend()), in input order
+        """
+        if not samples:
+            return []
+
+        if not self.model or not self.scaler:
+            MODEL_FALLBACKS.inc('fertilizer', 'model_missing', amount=len(samples))
+            return [
+                self._rule_based_fallback(s['nitrogen'], s['phosphorous'], s['potassium'], lang)
+                for s in samples
+            ]
+
+        try:
+            # Encoders are fitted on sorted classes, so class -> index is transform()
+            soil_index = {c: i for i, c in enumerate(self.soil_encoder.classes_)}
+            crop_index = {c: i for i, c in enumerate(self.crop_encoder.classes_)}
+            default_crop = crop_index['Wheat']
+
+            features = np.empty((len(samples), 8), dtype=float)
+            for row, s in enumerate(samples):
+                crop_type = s.get('crop_type')
+                mapped_crop = self.CROP_MAPPING.get(crop_type.lower() if crop_type else '', 'Wheat')
+                features[row] = (
+                    s['temperature'],
+                    s['humidity'],
+                    s['moisture'],
+                    soil_index.get(s.get('soil_type'), 0),
+                    crop_index.get(mapped_crop, default_crop),
+                    s['nitrogen'],
+                    s['potassium'],
+                    s['phosphorous']
+                )
+
+            # One scaler transform and one predict_proba for the whole batch
+            features_scaled = self.scaler.transform(features)
+            probabilities = self.model.predict_proba(features_scaled)
+            best = probabilities.argmax(axis=1)
+            predictions = self.model.classes_[best]
+            confidences = probabilities[np.arange(len(samples)), best]
+            fertilizer_names = self.fertilizer_encoder.inverse_transform(predictions)
+
+            # Reasoning codes for the whole batch in one pass
+            reasoning = self._generate_reasoning(samples, lang)
+
+            results = []
+            for fertilizer_name, confidence, row_reasoning in zip(fertilizer_names, confidences, reasoning):
+                results.append({
+                    'fertilizer': fertilizer_name,
+                    'translated_fertilizer': translate_text(fertilizer_name, lang),
+                    'confidence': round(float(confidence), 2),
+                    'reasoning': row_reasoning
+                })
+            return results
+
+        except Exception as e:
+            print(f"Batch fertilizer prediction error: {e}")
+            MODEL_FALLBACKS.inc('fertilizer', 'error', amount=len(samples))
+            return [
+                self._rule_based_fallback(s['nitrogen'], s['phosphorous'], s['potassium'], lang)
+                for s in samples
+            ]
+
+    def _generate_reasoning(self, samples, lang='en'):
         """
-        Generate human-readable reasoning for the fertilizer recommendation.
+        Generate human-readable reasoning for each sample's fertilizer recommendation.
+        Rules are evaluated for the whole batch (ml/explanations.py); only the
+        resulting message codes are rendered to text.
         """
+        codes = fertilizer_reason_codes(samples)
         reasoning = []
-        
-        # Crop-specific reasoning
-        if crop:
-            crop_lower = crop.lower()
-            if crop_lower in ['rice', 'paddy']:
-                reasoning.append(f"{crop} requires high nitrogen for vegetative growth and tillering")
-            elif crop_lower in ['wheat', 'maize']:
-                reasoning.append(f"{crop} benefits from balanced NPK nutrition for grain development")
-            elif crop_lower == 'cotton':
-                reasoning.append(f"{crop} requires adequate potassium for fiber quality and disease resistance")
-            elif crop_lower in ['pulses', 'legumes']:
-                reasoning.append(f"{crop} requires phosphorus for root development and nitrogen fixation")
-            else:
-                reasoning.append(f"Fertilizer optimized for {crop} nutrient requirements")
-        
-        # Nutrient deficiency analysis
-        if n < 30:
-            reasoning.append(f"Low nitrogen level ({n} mg/kg) detected - nitrogen-rich fertilizer recommended")
-        elif n > 50:
-            reasoning.append(f"Adequate nitrogen level ({n} mg/kg) - balanced fertilizer recommended")
-        
-        if p < 20:
-            reasoning.append(f"Low phosphorus level ({p} mg/kg) - phosphorus supplementation needed")
-        elif p > 40:
-            reasoning.append(f"Sufficient phosphorus level ({p} mg/kg)")
-        
-        if k < 30:
-            reasoning.append(f"Low potassium level ({k} mg/kg) - potassium supplementation recommended")
-        elif k > 50:
-            reasoning.append(f"Adequate potassium level ({k} mg/kg)")
-        
-        # Environmental factors
-        if moisture < 35:
-            reasoning.append("Low soil moisture - consider water-soluble fertilizers for better uptake")
-        elif moisture > 60:
-            reasoning.append("High soil moisture - slow-release fertilizers recommended")
-        
-        # Soil type consideration
-        if soil_type:
-            if soil_type.lower() == 'sandy':
-                reasoning.append("Sandy soil - frequent, smaller fertilizer applications recommended")
-            elif soil_type.lower() == 'clayey':
-                reasoning.append("Clayey soil - ensure good drainage for optimal nutrient uptake")
-        
-        # If no specific reasoning generated, add general statement
-        if not reasoning:
-            reasoning.append("Fertilizer recommendation based on soil nutrient analysis and crop requirements")
-        
+        for s, row_codes in zip(samples, codes):
+            crop = s.get('crop_type')
+            reasoning.append(render_messages(
+                row_codes, lang,
+                crop=translate_text(crop, lang) if crop else crop,
+                n=s['nitrogen'], p=s['phosphorous'], k=s['potassium']
+            ))
         return reasoning
     
-    def _rule_based_fallback(self, n, p, k):
+    def _rule_based_fallback(self, n, p, k, lang='en'):
         """
         Fallback to simple rule-based recommendation if ML model fails.
         """
-        recommendations = []
+        codes = []
         fertilizer = "Balanced NPK"
         
         if n < 50:
-            recommendations.append(f"Low Nitrogen ({n} mg/kg). Consider Urea or Ammonium Sulfate")
+            codes.append(MESSAGE_CODES['fallback_low_n'])
             fertilizer = "Urea"
         
         if p < 20:
-            recommendations.append(f"Low Phosphorus ({p} mg/kg). Consider DAP or SSP")
+            codes.append(MESSAGE_CODES['fallback_low_p'])
             if fertilizer == "Balanced NPK":
                 fertilizer = "DAP"
         
         if k < 50:
-            recommendations.append(f"Low Potassium ({k} mg/kg). Consider MOP")
-        
-        if not recommendations:
-            recommendations.append("Soil nutrient levels appear balanced")
+            codes.append(MESSAGE_CODES['fallback_low_k'])
         
+        if not codes:
+            codes.append(MESSAGE_CODES['fallback_balanced'])
+
         return {
             'fertilizer': fertilizer,
+            'translated_fertilizer': translate_text(fertilizer, lang),
             'confidence': 0.75,
-            'reasoning': recommendations
+            'reasoning': render_messages(codes, lang, n=n, p=p, k=k)
         }
-
@@ -0,0 +1,235 @@
+import os
+import pickle
+import threading
+import time
+import zlib
+
+import numpy as np
+from datetime import datetime
+
+try:
+    from .tree_engine import load_compiled
+except ImportError:
+    from tree_engine import load_compiled
+
+# All serving artifacts live in backend/models
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+# Artifacts loaded by warm_up() (crop, fertilizer and yield pipelines)
+DEFAULT_ARTIFACTS = [
+    'crop_recommendation_model.pkl',
+    'label_encoder.pkl',
+    'scaler.pkl',
+    'fertilizer_model.pkl',
+    'fertilizer_scaler.pkl',
+    'soil_encoder.pkl',
+    'crop_encoder.pkl',
+    'fertilizer_label_encoder.pkl',
+    'fertilizer_metadata.pkl',
+    'yield_model.pkl',
+    'yield_scaler.pkl',
+    'yield_encoders.pkl',
+]
+
+# Seconds between on-disk modification checks for an artifact
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+def _rss_bytes():
+    """
+    Resident set size of this process (Linux only, None elsewhere).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _array_nbytes(obj, seen=None):
+    """
+    Total nbytes of the NumPy arrays reachable from obj (through containers,
+    instance attributes and pickled state, e.g. sklearn's Cython trees).
+    Each array is counted once.
+    """
+    if seen is None:
+        seen = {}  # id -> object; holding the object keeps temporary states from reusing an id
+    if id(obj) in seen or obj is None or isinstance(obj, (str, bytes, int, float, bool, type)):
+        return 0
+    seen[id(obj)] = obj
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return obj.nbytes + sum(_array_nbytes(item, seen) for item in obj.ravel())
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(_array_nbytes(value, seen) for value in obj.values())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sum(_array_nbytes(item, seen) for item in obj)
+    state = getattr(obj, '__dict__', None)
+    if not state:
+        # Extension types (e.g. sklearn's Tree) expose their arrays through pickling
+        try:
+            reduced = obj.__reduce__()
+            state = reduced[2] if isinstance(reduced, tuple) and len(reduced) > 2 else None
+        except Exception:
+            return 0
+    return _array_nbytes(state, seen)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of unpickled models, encoders and scalers.
+    Each artifact is loaded from disk once and reloaded only when its
+    .pkl file changes (mtime/size), so request handlers never unpickle.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, check_interval=RELOAD_CHECK_INTERVAL):
+        self.model_dir = model_dir
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _path(self, filename):
+        return filename if os.path.isabs(filename) else os.path.join(self.model_dir, filename)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def get(self, filename):
+        """
+        Returns the cached artifact, loading or hot-reloading it if needed.
+        Returns None if the file is missing or fails to unpickle.
+        """
+        path = self._path(filename)
+        entry = self._entries.get(path)
+        now = time.monotonic()
+
+        if entry is not None and now - entry['checked_at'] < self.check_interval:
+            return entry['obj']
+
+        with self._lock:
+            entry = self._entries.get(path)
+            signature = self._signature(path)
+            if entry is None or entry['signature'] != signature:
+                if entry is not None:
+                    print(f"Model file changed on disk, reloading {os.path.basename(path)}")
+                entry = self._load(path, signature)
+                self._entries[path] = entry
+            entry['checked_at'] = now
+            return entry['obj']
+
+    def get_serving(self, filename):
+        """
+        Prefers the compiled .npz export of a .pkl artifact (see tree_engine.py),
+        so serving does not need sklearn; falls back to the pickle.
+        """
+        root, ext = os.path.splitext(filename)
+        if ext == '.pkl':
+            compiled = self.get(root + '.npz')
+            if compiled is not None:
+                return compiled
+        return self.get(filename)
+
+    def reload(self, filename):
+        """
+        Forces an artifact (and its compiled export) to be re-read from disk.
+        """
+        path = self._path(filename)
+        with self._lock:
+            self._entries.pop(path, None)
+            self._entries.pop(os.path.splitext(path)[0] + '.npz', None)
+        return self.get_serving(filename)
+
+    def _load(self, path, signature):
+        entry = {
+            'obj': None,
+            'signature': signature,
+            'loaded_at': None,
+            'load_seconds': None,
+            'array_bytes': None,
+            'rss_delta_bytes': None,
+            'file_bytes': signature[1] if signature else None,
+            'error': None,
+        }
+        if signature is None:
+            return entry
+
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            if path.endswith('.npz'):
+                entry['obj'] = load_compiled(path)
+            else:
+                with open(path, 'rb') as f:
+                    entry['obj'] = pickle.load(f)
+            # Array payload of the artifact itself; the RSS delta is the process-level
+            # cost (allocator overhead, plus any module imported for the first time)
+            entry['array_bytes'] = _array_nbytes(entry['obj'])
+            rss_after = _rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                entry['rss_delta_bytes'] = max(rss_after - rss_before, 0)
+        except Exception as e:
+            print(f"Error loading {os.path.basename(path)}: {e}")
+            entry['error'] = str(e)
+
+        entry['load_seconds'] = round(time.perf_counter() - start, 4)
+        entry['loaded_at'] = datetime.now().isoformat()
+        return entry
+
+    def warm_up(self, filenames=None):
+        """
+        Loads artifacts up front (called from create_app) so the first request is not slow.
+        """
+        for filename in filenames or DEFAULT_ARTIFACTS:
+            self.get_serving(filename)
+        return self.report()
+
+    def version(self):
+        """
+        Short token that changes whenever a loaded artifact is reloaded from a
+        changed file (e.g. after retraining); used to key result caches.
+        """
+        # A cache hit skips the models, so run their (throttled) on-disk checks here
+        for path in list(self._entries):
+            self.get(path)
+        signatures = sorted(
+            (os.path.basename(path), entry['signature'])
+            for path, entry in list(self._entries.items())
+            if entry['obj'] is not None
+        )
+        return format(zlib.crc32(repr(signatures).encode('utf-8')), '08x')
+
+    def report(self):
+        """
+        Load time and memory per artifact, keyed by file name.
+        array_bytes is the artifact's NumPy payload; rss_delta_bytes is the process
+        growth during the load, which also includes modules imported by the unpickling.
+        """
+        return {
+            os.path.basename(path): {
+                'loaded': entry['obj'] is not None,
+                'loaded_at': entry['loaded_at'],
+                'load_seconds': entry['load_seconds'],
+                'array_bytes': entry['array_bytes'],
+                'rss_delta_bytes': entry['rss_delta_bytes'],
+                'file_bytes': entry['file_bytes'],
+                'error': entry['error'],
+            }
+            for path, entry in list(self._entries.items())
+        }
+
+
+def artifact(filename):
+    """
+    Class attribute that always resolves to the registry's current copy of an artifact.
+    """
+    return property(lambda self: registry.get_serving(filename))
+
+
+# Create a global instance
+registry = ModelRegistry()
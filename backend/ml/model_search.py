@@ -0,0 +1,313 @@
+"""
+Parallel, cross-validated model selection for the training scripts.
+
+Each training script describes its candidate model families (the hand-tuned
+estimator plus a search space around it) and calls `search_models()`:
+
+- every candidate is scored with k-fold cross-validation on the training split;
+- candidates are evaluated in a process pool across all cores;
+- successive halving: all candidates start on a small slice of each training
+  fold, and only the best 1/SEARCH_ETA move on to eta times more data, until
+  the survivors are scored on the full folds;
+- early stopping: a sampled candidate is dropped mid-CV once its running mean
+  falls SEARCH_PRUNE_MARGIN below the previous round's best (boosting families
+  also stop adding trees via their own n_iter_no_change);
+- fold splits are cached in models/search/ keyed on the data, so re-runs and
+  the other rounds reuse them;
+- every evaluation is written to a leaderboard (models/search/<task>_leaderboard.json/.csv).
+
+The hand-tuned configuration is candidate 0 of its family. It is never
+stopped early or halved away, so it is always scored in the final round on
+the full folds, and the search can only match or beat the previous fixed
+models on CV score.
+"""
+import csv
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import KFold, ParameterSampler, StratifiedKFold
+
+# Search tuning (overridable via environment)
+SEARCH_JOBS = int(os.getenv("SEARCH_JOBS", str(os.cpu_count() or 1)))  # Worker processes
+SEARCH_FOLDS = int(os.getenv("SEARCH_FOLDS", "5"))
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "8"))  # Sampled per family, besides the hand-tuned one
+SEARCH_ETA = int(os.getenv("SEARCH_ETA", "3"))                # Halving rate between rounds
+SEARCH_PRUNE_MARGIN = float(os.getenv("SEARCH_PRUNE_MARGIN", "0.05"))
+SEARCH_SEED = 42
+
+SEARCH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'search')
+
+
+class Family:
+    """
+    One candidate model family: a configured estimator and a space of
+    parameter overrides (param -> list of values or scipy distribution).
+    """
+
+    def __init__(self, name, estimator, space):
+        self.name = name
+        self.estimator = estimator
+        self.space = space
+
+    def candidates(self, n, seed=SEARCH_SEED):
+        """
+        The hand-tuned parameters ({}) followed by n sampled overrides.
+        """
+        sampled = list(ParameterSampler(self.space, n_iter=n, random_state=seed)) if self.space and n > 0 else []
+        return [{}] + [params for params in sampled if params]
+
+
+def _stratified_order(indices, y, rng):
+    """
+    Shuffles training indices so that every prefix keeps the class proportions;
+    halving rounds train on prefixes of this order.
+    """
+    keys = np.empty(len(indices))
+    labels = y[indices]
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        keys[members] = (rng.permutation(len(members)) + rng.random()) / len(members)
+    return indices[np.argsort(keys, kind='stable')]
+
+
+def make_folds(task, y, n_folds=SEARCH_FOLDS, stratified=True, seed=SEARCH_SEED):
+    """
+    Returns [(train_indices, test_indices), ...], loading them from the fold
+    cache when the same labels were split before.
+    """
+    y = np.asarray(y)
+    if stratified:
+        # Every class needs at least one sample per fold
+        n_folds = max(2, min(n_folds, int(np.unique(y, return_counts=True)[1].min())))
+
+    digest = hashlib.sha1(y.tobytes())
+    digest.update(f"{y.dtype}|{n_folds}|{stratified}|{seed}".encode())
+    path = os.path.join(SEARCH_DIR, f"{task}_folds_{digest.hexdigest()[:12]}.npz")
+
+    try:
+        with np.load(path) as cached:
+            return [(cached[f"train_{i}"], cached[f"test_{i}"]) for i in range(n_folds)]
+    except (OSError, KeyError, ValueError):
+        pass
+
+    rng = np.random.default_rng(seed)
+    splitter = (StratifiedKFold if stratified else KFold)(n_splits=n_folds, shuffle=True, random_state=seed)
+    folds = []
+    for train, test in splitter.split(np.zeros(len(y)), y if stratified else None):
+        train = _stratified_order(train, y, rng) if stratified else rng.permutation(train)
+        folds.append((train, test))
+
+    try:
+        os.makedirs(SEARCH_DIR, exist_ok=True)
+        arrays = {}
+        for i, (train, test) in enumerate(folds):
+            arrays[f"train_{i}"] = train
+            arrays[f"test_{i}"] = test
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not write fold cache: {e}")
+    return folds
+
+
+# Worker side: the data is sent once per process, tasks only carry parameters
+
+_worker_state = {}
+
+
+def _set_state(X, y, folds, scoring):
+    _worker_state.update(X=X, y=y, folds=folds, scorer=get_scorer(scoring))
+
+
+def _init_worker(X, y, folds, scoring):
+    # Candidates run one per core; keep estimators and BLAS single-threaded
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = '1'
+    _set_state(X, y, folds, scoring)
+
+
+def _evaluate(task):
+    """
+    Cross-validates one candidate on the first `resource` samples of each
+    training fold. Stops early (pruned=True) once the running mean score is
+    below `stop_below`.
+    """
+    X, y, folds, scorer = (_worker_state[k] for k in ('X', 'y', 'folds', 'scorer'))
+    estimator = clone(task['estimator']).set_params(**task['params'])
+    if 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=1)
+
+    scores = []
+    start = time.perf_counter()
+    error = None
+    for train, test in folds:
+        train = train[:task['resource']]
+        try:
+            estimator.fit(X[train], y[train])
+            scores.append(float(scorer(estimator, X[test], y[test])))
+        except Exception as e:
+            error = str(e)
+            break
+        if task['stop_below'] is not None and len(scores) < len(folds) and np.mean(scores) < task['stop_below']:
+            break
+
+    return {
+        'family': task['family'],
+        'candidate': task['candidate'],
+        'params': task['params'],
+        'round': task['round'],
+        'resource': task['resource'],
+        'folds': len(scores),
+        'mean_score': round(float(np.mean(scores)), 4) if scores else None,
+        'std_score': round(float(np.std(scores)), 4) if scores else None,
+        'pruned': error is None and len(scores) < len(folds),
+        'fit_seconds': round(time.perf_counter() - start, 3),
+        'error': error,
+    }
+
+
+def _run(pool, tasks):
+    if pool is None:
+        return [_evaluate(task) for task in tasks]
+    return list(pool.map(_evaluate, tasks))
+
+
+def _format_params(params):
+    return ', '.join(f"{k}={v}" for k, v in sorted(params.items())) or 'hand-tuned'
+
+
+def _write_leaderboard(task, rows):
+    try:
+        os.makedirs(SEARCH_DIR, exist_ok=True)
+        with open(os.path.join(SEARCH_DIR, f"{task}_leaderboard.json"), 'w') as f:
+            json.dump(rows, f, indent=2, default=str)
+        with open(os.path.join(SEARCH_DIR, f"{task}_leaderboard.csv"), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['rank', 'family', 'params', 'round', 'resource', 'folds',
+                             'mean_score', 'std_score', 'pruned', 'fit_seconds', 'error'])
+            for rank, row in enumerate(rows, 1):
+                writer.writerow([rank, row['family'], _format_params(row['params']), row['round'], row['resource'],
+                                 row['folds'], row['mean_score'], row['std_score'], row['pruned'],
+                                 row['fit_seconds'], row['error']])
+    except OSError as e:
+        print(f"Could not write leaderboard: {e}")
+
+
+def search_models(task, families, X, y, scoring='accuracy', stratified=True,
+                  n_candidates=SEARCH_CANDIDATES, n_folds=SEARCH_FOLDS, n_jobs=SEARCH_JOBS, eta=SEARCH_ETA):
+    """
+    Runs the halving CV search over all families and refits the best candidate
+    of each family on all of X.
+    :param task: name used for the fold cache and leaderboard files
+    :param scoring: sklearn scorer name (higher is better)
+    :return: dict with best_name, best_model, best_score, models (family -> fitted
+             estimator), scores (family -> CV score) and leaderboard (rows, best first)
+    """
+    X_fit = np.asarray(X)
+    y_fit = np.asarray(y)
+    folds = make_folds(task, y_fit, n_folds, stratified)
+    fold_size = min(len(train) for train, _ in folds)
+
+    candidates = [
+        (family, i, params)
+        for family in families
+        for i, params in enumerate(family.candidates(n_candidates))
+    ]
+    rounds = max(1, math.ceil(math.log(len(candidates), eta))) if len(candidates) > 1 else 1
+    # Smallest slice still needs a few samples of every class
+    min_resource = len(np.unique(y_fit)) * 3 if stratified else 30
+    resource = max(min(min_resource, fold_size), fold_size // eta ** (rounds - 1))
+
+    print(f"\nModel search '{task}': {len(candidates)} candidates, {len(folds)}-fold CV, "
+          f"up to {rounds} round(s), {n_jobs} worker(s)")
+
+    leaderboard = []
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(
+        max_workers=n_jobs, initializer=_init_worker, initargs=(X_fit, y_fit, folds, scoring)
+    ) if n_jobs > 1 else None
+    if pool is None:
+        _set_state(X_fit, y_fit, folds, scoring)
+
+    try:
+        stop_below = None
+        for round_no in range(rounds):
+            last = round_no == rounds - 1 or resource >= fold_size
+            if last:
+                resource = fold_size
+            tasks = [
+                {
+                    'family': family.name,
+                    'estimator': family.estimator,
+                    'candidate': i,
+                    'params': params,
+                    'round': round_no,
+                    'resource': resource,
+                    # The hand-tuned candidate always finishes, as the baseline to beat
+                    'stop_below': stop_below if i else None,
+                }
+                for family, i, params in candidates
+            ]
+            results = _run(pool, tasks)
+            leaderboard.extend(results)
+
+            finished = [r for r in results if r['mean_score'] is not None and not r['pruned'] and not r['error']]
+            if not finished:
+                break
+            finished.sort(key=lambda r: r['mean_score'], reverse=True)
+            print(f"  Round {round_no + 1}: {len(tasks)} candidates on {resource} samples/fold, "
+                  f"best {finished[0]['mean_score']:.4f} ({finished[0]['family']}), "
+                  f"{sum(r['pruned'] for r in results)} stopped early")
+            if last:
+                break
+
+            keep = {(r['family'], r['candidate']) for r in finished[:max(1, len(candidates) // eta)]}
+            keep |= {(family.name, 0) for family in families}
+            candidates = [c for c in candidates if (c[0].name, c[1]) in keep]
+            stop_below = finished[0]['mean_score'] - SEARCH_PRUNE_MARGIN
+            resource = min(fold_size, resource * eta)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Rank: furthest round first, then score
+    leaderboard.sort(key=lambda r: (r['round'], r['mean_score'] if r['mean_score'] is not None else -math.inf),
+                     reverse=True)
+    _write_leaderboard(task, leaderboard)
+
+    # Best candidate per family (among those that reached the furthest round for that family)
+    by_family = {}
+    for row in leaderboard:
+        if row['mean_score'] is not None and not row['pruned'] and not row['error'] and row['family'] not in by_family:
+            by_family[row['family']] = row
+
+    models, scores = {}, {}
+    estimators = {family.name: family.estimator for family in families}
+    for name, row in by_family.items():
+        model = clone(estimators[name]).set_params(**row['params'])
+        model.fit(X, y)
+        models[name] = model
+        scores[name] = row['mean_score']
+        print(f"  {name:20s}: CV {row['mean_score']:.4f} ± {row['std_score']:.4f} "
+              f"(round {row['round'] + 1}, {_format_params(row['params'])})")
+
+    # by_family follows the leaderboard order, so its first family holds the overall best
+    best_name = next(iter(by_family), None)
+    print(f"Search finished in {time.perf_counter() - start:.1f}s; leaderboard in {SEARCH_DIR}")
+
+    return {
+        'best_name': best_name,
+        'best_model': models.get(best_name),
+        'best_score': scores.get(best_name),
+        'models': models,
+        'scores': scores,
+        'leaderboard': leaderboard,
+    }
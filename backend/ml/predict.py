@@ -69,4 +69,9 @@ def main():
         print(json.dumps([f"Error: {str(e)}"]))
 
 if __name__ == "__main__":
-    main()
+    if '--serve' in sys.argv:
+        # Long-running worker mode (see worker.py)
+        from worker import serve
+        serve()
+    else:
+        main()
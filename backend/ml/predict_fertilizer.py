@@ -37,4 +37,9 @@ def main():
         print(json.dumps({"error": str(e)}))
 
 if __name__ == "__main__":
-    main()
+    if '--serve' in sys.argv:
+        # Long-running worker mode (see worker.py)
+        from worker import serve
+        serve()
+    else:
+        main()
@@ -1,43 +1,32 @@
-import os
-import pickle
 import numpy as np
 import random
 
+from backend.utils.translator import translate_text, render_messages, MESSAGE_CODES
+from backend.utils.metrics import MODEL_FALLBACKS
+
+try:
+    from .model_registry import artifact
+    from .explanations import crop_reason_codes
+except ImportError:
+    from model_registry import artifact
+    from explanations import crop_reason_codes
+
 class CropPredictor:
+    # Loaded once per process through the model registry
+    agri_model = artifact('crop_recommendation_model.pkl')
+    label_encoder = artifact('label_encoder.pkl')
+
     def __init__(self):
         """
-        Initializes the predictor by loading models.
+        Initializes the predictor. Models are served from the shared model registry.
         """
-        # Resolve path relative to this file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.model_dir = os.path.join(os.path.dirname(current_dir), 'models')
-        
-        self.agri_model = self._load_model('crop_recommendation_model.pkl')
-        self.label_encoder = self._load_model('label_encoder.pkl')
-        # Scaler is loaded via DataPreprocessor in a real app, but here we might need manual handling if not using the class
-        # However, for this structure let's assume raw features come in and we rely on DataPreprocessor used in the pipeline
-        # However, for this structure let's assume raw features come in and we rely on DataPreprocessor used in the pipeline
-        # Actually, best to instantiate DataPreprocessor here to handle scaling consistency
+        # Scaling is handled by DataPreprocessor for consistency with training
         try:
             from .preprocess import DataPreprocessor
         except ImportError:
             from preprocess import DataPreprocessor
         
         self.preprocessor = DataPreprocessor()
-        
-    def _load_model(self, filename):
-        path = os.path.join(self.model_dir, filename)
-        if os.path.exists(path):
-            try:
-                with open(path, 'rb') as f:
-                    return pickle.load(f)
-            except Exception as e:
-                print(f"Error loading model {filename}: {e}")
-                return None
-        return None
-
-    # Import translator
-    from backend.utils.translator import translate_text
 
     def predict(self, features, top_n=3, lang='en'):
         """
@@ -50,18 +39,15 @@ class CropPredictor:
         if self.agri_model and self.label_encoder:
             try:
                 # 1. Preprocess (Scale)
-                features_array = np.array(features).reshape(1, -1)
+                features_array = np.array(features, dtype=np.float64).reshape(1, -1)
                 
                 # SAFETY CHECK: If inputs are all zeros (Sensor Failure), do not predict.
                 if np.sum(features_array) == 0:
                     print("Warning: All sensor inputs are zero. Skipping prediction.")
                     return []
                 
-                # Apply scaling using the loaded scaler inside preprocessor
-                if self.preprocessor.scaler:
-                    features_scaled = self.preprocessor.scaler.transform(features_array)
-                else:
-                    features_scaled = features_array
+                # Apply scaling in place (features_array is our own copy)
+                features_scaled = self.preprocessor.scale(features_array, out=features_array)
 
                 # 2. Predict Probabilities
                 probs = self.agri_model.predict_proba(features_scaled)[0]
@@ -71,87 +57,129 @@ class CropPredictor:
                 
                 results = []
                 classes = self.label_encoder.classes_
-                from backend.utils.translator import translate_text 
 
                 for idx in top_indices:
                     crop_name = classes[idx]
-                    raw_confidence = probs[idx]
-                    
-                    # SCALE CONFIDENCE: Clamp between 0.60 and 0.85 to be realistic
-                    # Linear mapping: 0.0 -> 0.60, 1.0 -> 0.85 (APPROXIMATION for UX)
-                    # If raw is very high >0.9, cap at 0.88. If low, keep low but floor at 0.5.
-                    if raw_confidence > 0.95:
-                         confidence = 0.88
-                    elif raw_confidence < 0.5:
-                         confidence = max(0.40, raw_confidence)
-                    else:
-                         confidence = 0.60 + (raw_confidence * 0.25)
-                         if confidence > 0.90: confidence = 0.89
+                    confidence = self._scale_confidence(probs[idx])
 
                     # Filter out very low confidence predictions
                     if confidence > 0.01: 
                         local_name = translate_text(crop_name, lang)
-                        reasoning = self._generate_reasoning(crop_name, features, lang)
                         results.append({
                             'crop': crop_name, # Keep English key for code usage
                             'translated_crop': local_name, # Display name
                             'confidence': round(float(confidence), 2),
-                            'reasoning': reasoning
                         })
-                
+
+                # Reasoning for all returned crops in one pass, rendered at the end
+                raw = np.asarray(features, dtype=np.float64).reshape(1, -1)
+                codes = crop_reason_codes(np.repeat(raw, len(results), axis=0), [r['crop'] for r in results])
+                for result, row_codes in zip(results, codes):
+                    result['reasoning'] = render_messages(row_codes, lang)
+
                 return results
 
             except Exception as e:
                 print(f"Prediction Error: {e}")
                 # Fallback only on error
+                MODEL_FALLBACKS.inc('crop', 'error')
                 return self._mock_predict(top_n, features, lang)
             
         # Fallback if no model loaded
+        MODEL_FALLBACKS.inc('crop', 'model_missing')
         return self._mock_predict(top_n, features, lang)
 
+    def predict_batch(self, features_matrix, top_n=3, lang='en'):
+        """
+        Predicts top N crops for many samples with a single model call.
+        :param features_matrix: 2D array-like of raw features, one row per sample [N, P, K, Temp, Hum, pH, Rain]
+        :param top_n: Number of recommendations to return per sample
+        :param lang: Language code ('en', 'hi', 'te', etc)
+        :return: List (in input order) of per-sample result lists, same shape as predict()
+        """
+        features_matrix = np.asarray(features_matrix, dtype=float).reshape(-1, 7)
+        if len(features_matrix) == 0:
+            return []
+
+        if not (self.agri_model and self.label_encoder):
+            MODEL_FALLBACKS.inc('crop', 'model_missing', amount=len(features_matrix))
+            return [self._mock_predict(top_n, row, lang) for row in features_matrix]
+
+        try:
+            # SAFETY CHECK: rows that are all zeros (Sensor Failure) get no prediction
+            valid = features_matrix.sum(axis=1) != 0
+            results = [[] for _ in range(len(features_matrix))]
+            if not valid.any():
+                print("Warning: All sensor inputs are zero. Skipping prediction.")
+                return results
+
+            # Raw rows are kept for the reasoning step; scaling writes one new buffer
+            valid_rows = features_matrix if valid.all() else features_matrix[valid]
+            features_scaled = self.preprocessor.scale(valid_rows)
+
+            # One predict_proba call for the whole batch
+            probs = self.agri_model.predict_proba(features_scaled)
+            top_indices = np.argsort(probs, axis=1)[:, -top_n:][:, ::-1]
+            classes = self.label_encoder.classes_
+
+            picked_rows = []
+            for raw_idx, (row_idx, row_probs, row_top) in enumerate(zip(np.flatnonzero(valid), probs, top_indices)):
+                for idx in row_top:
+                    crop_name = classes[idx]
+                    confidence = self._scale_confidence(row_probs[idx])
+                    if confidence > 0.01:
+                        results[row_idx].append({
+                            'crop': crop_name,
+                            'translated_crop': translate_text(crop_name, lang),
+                            'confidence': round(float(confidence), 2),
+                        })
+                        picked_rows.append(raw_idx)
+
+            # Reasoning codes for the whole batch in one vectorized pass; text only at the end
+            picked = [r for row in results for r in row]
+            codes = crop_reason_codes(valid_rows[picked_rows], [r['crop'] for r in picked])
+            for result, row_codes in zip(picked, codes):
+                result['reasoning'] = render_messages(row_codes, lang)
+
+            return results
+
+        except Exception as e:
+            print(f"Batch Prediction Error: {e}")
+            MODEL_FALLBACKS.inc('crop', 'error', amount=len(features_matrix))
+            return [self._mock_predict(top_n, row, lang) for row in features_matrix]
+
+    @staticmethod
+    def _scale_confidence(raw_confidence):
+        """
+        SCALE CONFIDENCE: Clamp between 0.60 and 0.85 to be realistic.
+        Linear mapping: 0.0 -> 0.60, 1.0 -> 0.85 (APPROXIMATION for UX)
+        If raw is very high >0.95, cap at 0.88. If low, keep low but floor at 0.40.
+        """
+        if raw_confidence > 0.95:
+            return 0.88
+        if raw_confidence < 0.5:
+            return max(0.40, raw_confidence)
+        confidence = 0.60 + (raw_confidence * 0.25)
+        if confidence > 0.90:
+            confidence = 0.89
+        return confidence
+
     def _generate_reasoning(self, crop, features, lang='en'):
         """
         Generate simple explainability for crop choice.
         """
         # Features: [N, P, K, Temp, Hum, pH, Rain]
-        # Approximate indices: 0:N, 1:P, 2:K, 3:Temp, 4:Hum, 5:pH, 6:Rain
-        from backend.utils.translator import translate_text
-        
-        reasoning = []
-        
-        # Unpack
         try:
-             # Handle if features is list of list or just list
-             f = features[0] if isinstance(features[0], (list, np.ndarray)) else features
-             rain = f[6]
-             temp = f[3]
-             ph = f[5]
-             
-             if rain > 150 and crop.lower() in ['rice', 'jute', 'sugarcoffee', 'coconut']:
-                 reasoning.append("High rainfall is suitable for this crop.")
-             elif rain < 50 and crop.lower() in ['chickpea', 'mothbeans', 'lentil', 'gram']:
-                 reasoning.append("Suitable for low rainfall conditions.")
-             
-             if temp > 30 and crop.lower() not in ['wheat', 'pea']:
-                  reasoning.append("Thrives in warm temperatures.")
-             
-             if 5.5 <= ph <= 7.0:
-                 reasoning.append("Soil pH is optimal.")
-                 
-        except:
-            pass # Fail silently on indexing error
-            
-        if not reasoning:
-            reasoning.append(" Matches your soil nutrient profile best.")
-            
-        # Translate each sentence
-        return [translate_text(r.strip(), lang) for r in reasoning]
+            codes = crop_reason_codes(np.asarray(features, dtype=np.float64).reshape(1, 7), [crop])[0]
+        except (ValueError, TypeError):
+            # Malformed features: only the default message applies
+            codes = [MESSAGE_CODES['crop_default']]
+        return render_messages(codes, lang)
 
     def _mock_predict(self, top_n, features, lang='en'):
         """
         Mock prediction logic based on simple rules or random choice for demo.
         """
-        from backend.utils.translator import translate_text
         # List of crops from existing data
         crops = [
             'rice', 'maize', 'chickpea', 'kidneybeans', 'pigeonpeas', 
@@ -1,7 +1,14 @@
 import numpy as np
 import os
 import pickle
-from sklearn.preprocessing import StandardScaler
+
+try:
+    from .model_registry import registry
+except ImportError:
+    from model_registry import registry
+
+# Crop model feature order (training schema, see scaler.feature_names_in_)
+FEATURE_ORDER = ('N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall')
 
 
 class DataPreprocessor:
@@ -9,25 +16,77 @@ class DataPreprocessor:
         """
         Initialize preprocessor.
         """
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.model_dir = os.path.join(os.path.dirname(current_dir), "models")
+        self.model_dir = registry.model_dir
         self.scaler_path = os.path.join(self.model_dir, "scaler.pkl")
-        self.scaler = self._load_scaler()
+        self._params = None
+        self._params_source = None
+
+    @property
+    def scaler(self):
+        # Loaded once per process through the model registry
+        return registry.get_serving(self.scaler_path)
+
+    def _scaler_params(self):
+        """
+        (mean, scale) as contiguous float64 arrays, extracted once per loaded
+        scaler (again only after a hot reload). None if there is no scaler.
+        """
+        scaler = self.scaler
+        if scaler is not self._params_source:
+            self._params = self._extract_params(scaler)
+            self._params_source = scaler
+        return self._params
+
+    @staticmethod
+    def _extract_params(scaler):
+        if scaler is None:
+            return None
+
+        # Validate the feature order against the training schema once, not per call
+        names = getattr(scaler, 'feature_names_in_', None)
+        if names is not None and tuple(str(n) for n in names) != FEATURE_ORDER:
+            raise ValueError(f"Scaler was fitted on features {list(names)}, expected {list(FEATURE_ORDER)}")
+
+        mean = None if scaler.mean_ is None else np.ascontiguousarray(scaler.mean_, dtype=np.float64)
+        scale = None if scaler.scale_ is None else np.ascontiguousarray(scaler.scale_, dtype=np.float64)
+        for params in (mean, scale):
+            if params is not None and params.shape != (len(FEATURE_ORDER),):
+                raise ValueError(f"Scaler expects {params.shape[0]} features, expected {len(FEATURE_ORDER)}")
+        return mean, scale
+
+    def scale(self, features, out=None):
+        """
+        StandardScaler transform as a fused (x - mean_) / scale_.
+        Writes into `out` (which may be `features` itself for in-place scaling);
+        returns `features` unchanged if there is no scaler.
+        """
+        params = self._scaler_params()
+        if params is None:
+            return features
+        mean, scale = params
 
-    def _load_scaler(self):
-        if os.path.exists(self.scaler_path):
-            try:
-                with open(self.scaler_path, "rb") as f:
-                    return pickle.load(f)
-            except Exception as e:
-                print(f"Error loading scaler: {e}")
-        return None
+        if out is None:
+            out = np.empty(np.shape(features), dtype=np.float64)
+        if mean is not None:
+            np.subtract(features, mean, out=out)
+        elif out is not features:
+            out[...] = features
+        if scale is not None:
+            np.divide(out, scale, out=out)
+        return out
 
     def fit_and_save(self, data):
         """
         Fits a new scaler on the provided data and saves it.
         :param data: Numpy array or DataFrame of features (no labels)
         """
+        # Training-only dependency; serving uses the compiled scaler
+        from sklearn.preprocessing import StandardScaler
+        try:
+            from .tree_engine import export_compiled
+        except ImportError:
+            from tree_engine import export_compiled
+
         scaler = StandardScaler()
         scaler.fit(data)
 
@@ -36,8 +95,9 @@ class DataPreprocessor:
 
         with open(self.scaler_path, "wb") as f:
             pickle.dump(scaler, f)
+        export_compiled(scaler, self.scaler_path)
 
-        self.scaler = scaler
+        registry.reload(self.scaler_path)
         print(f"Scaler saved to {self.scaler_path}")
 
     def preprocess(self, data):
@@ -47,24 +107,54 @@ class DataPreprocessor:
         [N, P, K, temperature, humidity, ph, rainfall]
 
         :param data: Dictionary with keys 'N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall'
-        :return: 2D numpy array (1, 7) scaled if scaler exists
+        :return: 2D numpy array (1, 7) of raw features
+        """
+        # Return raw feature array. Scaling is performed centrally by the predictor
+        # to avoid accidental double-scaling when callers already transform.
+        return self.preprocess_many([data])
+
+    def preprocess_many(self, records, out=None, dtype=np.float64, scale=False):
+        """
+        Fills a (n, 7) feature matrix directly from many inputs.
+
+        :param records: List of dicts (same keys as preprocess) or a columnar dict
+                        mapping each feature name to a sequence of values
+        :param out: Optional preallocated (n, 7) array to fill
+        :param dtype: Matrix dtype when `out` is not given (float64 matches training)
+        :param scale: Apply the scaler in place (see scale())
+        :return: The filled matrix; missing features are 0
         """
         try:
-            features = [
-                float(data.get("N", 0)),
-                float(data.get("P", 0)),
-                float(data.get("K", 0)),
-                float(data.get("temperature", 0)),
-                float(data.get("humidity", 0)),
-                float(data.get("ph", 0)),
-                float(data.get("rainfall", 0)),
-            ]
-
-            features_array = np.array([features])
-            # Return raw feature array. Scaling is performed centrally by the predictor
-            # to avoid accidental double-scaling when callers already transform.
-            return features_array
+            columnar = isinstance(records, dict)
+            if columnar:
+                lengths = {len(v) for v in records.values() if v is not None}
+                if len(lengths) > 1:
+                    raise ValueError("Columns have different lengths")
+                n = lengths.pop() if lengths else 0
+            else:
+                n = len(records)
+
+            if out is None:
+                out = np.empty((n, len(FEATURE_ORDER)), dtype=dtype)
+            elif out.shape != (n, len(FEATURE_ORDER)):
+                raise ValueError(f"Output buffer has shape {out.shape}, expected {(n, len(FEATURE_ORDER))}")
+
+            for j, key in enumerate(FEATURE_ORDER):
+                if columnar:
+                    column = records.get(key)
+                    out[:, j] = 0 if column is None else column
+                else:
+                    out[:, j] = np.fromiter((r.get(key, 0) for r in records), dtype=out.dtype, count=n)
+
+            # None (or a NaN string) becomes NaN on conversion; reject it like float(None) did
+            if np.isnan(out).any():
+                bad = [FEATURE_ORDER[j] for j in np.flatnonzero(np.isnan(out).any(axis=0))]
+                raise ValueError(f"Missing or invalid value for {', '.join(bad)}")
 
         except Exception as e:
             print(f"Error in preprocessing: {e}")
             raise ValueError(f"Preprocessing Failed: {e}")
+
+        if scale:
+            self.scale(out, out=out)
+        return out
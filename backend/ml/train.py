@@ -14,6 +14,8 @@ from sklearn.preprocessing import LabelEncoder
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from data_handler import DataHandler
 from preprocess import DataPreprocessor
+from tree_engine import export_compiled
+from model_search import Family, search_models
 
 def train_models():
     print("Loading data...")
@@ -47,23 +49,30 @@ def train_models():
         os.makedirs(model_dir)
     with open(os.path.join(model_dir, 'label_encoder.pkl'), 'wb') as f:
         pickle.dump(le, f)
+    export_compiled(le, os.path.join(model_dir, 'label_encoder.pkl'))
 
     # Train Test Split
     X_train, X_test, y_train, y_test = train_test_split(X_scaled, y_encoded, test_size=0.2, random_state=42)
 
-    # Define Models with STRONG regularization to prevent overfitting
-    # Tuned to achieve realistic confidence scores (not 100%)
-    # Naive Bayes removed as it tends to be overconfident
-    models = {
-        'Random Forest': RandomForestClassifier(
+    # Candidate families with STRONG regularization to prevent overfitting.
+    # The hand-tuned settings (realistic confidence scores, not 100%) are the
+    # first candidate of each family; the search spaces stay in the same
+    # regularized range. Naive Bayes removed as it tends to be overconfident
+    families = [
+        Family('Random Forest', RandomForestClassifier(
             n_estimators=70,
             max_depth=10,           # Further limit depth
             min_samples_split=12,   # Require even more samples to split
             min_samples_leaf=5,     # Require more samples in leaf nodes
             max_features='sqrt',    # Limit features per split
             random_state=42
-        ),
-        'Gradient Boosting': GradientBoostingClassifier(
+        ), {
+            'n_estimators': [50, 70, 100, 150],
+            'max_depth': [6, 8, 10, 12],
+            'min_samples_split': [8, 12, 16],
+            'min_samples_leaf': [3, 5, 8],
+        }),
+        Family('Gradient Boosting', GradientBoostingClassifier(
             n_estimators=50,
             max_depth=5,
             learning_rate=0.06,
@@ -71,35 +80,37 @@ def train_models():
             min_samples_leaf=5,
             subsample=0.8,
             random_state=42
-        ),
-        'SVM': SVC(
+        ), {
+            'n_estimators': [50, 100, 200],
+            'max_depth': [3, 4, 5],
+            'learning_rate': [0.03, 0.06, 0.1],
+            'n_iter_no_change': [5],    # Early stopping on a held-out 10%
+        }),
+        Family('SVM', SVC(
             probability=True,
             C=0.6,                  # Stronger regularization
             gamma='scale',
             random_state=42
-        )
-    }
-
-    best_model = None
-    best_accuracy = 0.0
-    best_model_name = ""
+        ), {
+            'C': [0.3, 0.6, 1.0, 2.0],
+            'gamma': ['scale', 0.05, 0.1],
+        }),
+    ]
 
     print("\nTraining Models:")
     print("-" * 30)
 
-    for name, model in models.items():
-        try:
-            model.fit(X_train, y_train)
-            predictions = model.predict(X_test)
-            acc = accuracy_score(y_test, predictions)
-            print(f"{name}: {acc:.4f} accuracy")
-            
-            if acc > best_accuracy:
-                best_accuracy = acc
-                best_model = model
-                best_model_name = name
-        except Exception as e:
-            print(f"Error training {name}: {e}")
+    # Cross-validated search on the training split; the test split stays held out
+    search = search_models('crop', families, X_train, y_train, scoring='accuracy')
+    best_model = search['best_model']
+    best_model_name = search['best_name']
+    best_accuracy = 0.0
+
+    for name, model in search['models'].items():
+        acc = accuracy_score(y_test, model.predict(X_test))
+        print(f"{name}: {acc:.4f} accuracy (CV {search['scores'][name]:.4f})")
+        if name == best_model_name:
+            best_accuracy = acc
 
     print("-" * 30)
     print(f"Best Model: {best_model_name} with {best_accuracy:.4f} accuracy")
@@ -115,5 +126,8 @@ def train_models():
             pickle.dump(best_model, f)
         print(f"Best model saved to {model_path}")
 
+        # Flat array export for serving (tree ensembles only)
+        export_compiled(best_model, model_path, X_scaled)
+
 if __name__ == "__main__":
     train_models()
@@ -11,6 +11,9 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler
 
 # Adjust path to import local modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tree_engine import export_compiled
+from column_cache import read_csv_cached
+from model_search import Family, search_models
 
 def load_fertilizer_data():
     """
@@ -24,7 +27,7 @@ def load_fertilizer_data():
         print(f"Error: Dataset not found at {data_path}")
         return None
     
-    df = pd.read_csv(data_path)
+    df = read_csv_cached(data_path)
     print(f"Dataset loaded successfully: {df.shape[0]} rows, {df.shape[1]} columns")
     print(f"Columns: {list(df.columns)}")
     return df
@@ -77,25 +80,32 @@ def preprocess_fertilizer_data(df):
 
 def train_models(X_train, X_test, y_train, y_test):
     """
-    Train multiple models and return the best one based on accuracy.
+    Search multiple model families with cross-validation and return the best
+    one based on CV accuracy (test accuracy is reported for each family).
     Models are tuned to avoid overfitting and achieve 85-95% accuracy.
     """
     print("\n" + "="*60)
     print("TRAINING FERTILIZER RECOMMENDATION MODELS")
     print("="*60)
     
-    # Define models with STRONG hyperparameters to avoid overfitting
-    # These parameters are intentionally restrictive to achieve 85-95% accuracy
-    models = {
-        'Random Forest': RandomForestClassifier(
+    # Candidate families with STRONG hyperparameters to avoid overfitting.
+    # The intentionally restrictive hand-tuned settings (85-95% accuracy) are
+    # the first candidate of each family; the search spaces stay restrictive too
+    families = [
+        Family('Random Forest', RandomForestClassifier(
             n_estimators=50,        # Fewer trees to reduce overfitting
             max_depth=4,            # Very shallow trees
             min_samples_split=15,   # Require many samples to split
             min_samples_leaf=8,     # Require many samples in leaf nodes
             max_features='sqrt',    # Limit features per split
             random_state=42
-        ),
-        'Gradient Boosting': GradientBoostingClassifier(
+        ), {
+            'n_estimators': [30, 50, 80],
+            'max_depth': [3, 4, 5],
+            'min_samples_split': [10, 15, 20],
+            'min_samples_leaf': [5, 8, 10],
+        }),
+        Family('Gradient Boosting', GradientBoostingClassifier(
             n_estimators=30,        # Fewer trees
             max_depth=3,            # Very shallow trees
             learning_rate=0.05,     # Lower learning rate
@@ -103,55 +113,45 @@ def train_models(X_train, X_test, y_train, y_test):
             min_samples_leaf=8,
             subsample=0.8,          # Use 80% of samples per tree
             random_state=42
-        ),
-        'SVM': SVC(
+        ), {
+            'n_estimators': [20, 30, 50],
+            'max_depth': [2, 3],
+            'learning_rate': [0.03, 0.05, 0.08],
+        }),
+        Family('SVM', SVC(
             kernel='rbf',
             C=0.5,                  # Stronger regularization (lower C)
             gamma='scale',
             probability=True,       # Enable probability predictions
             random_state=42
-        )
-    }
-    
-    best_model = None
+        ), {
+            'C': [0.2, 0.5, 1.0],
+            'gamma': ['scale', 0.05, 0.1],
+        }),
+    ]
+
+    # Cross-validated search on the training split; the test split stays held out
+    search = search_models('fertilizer', families, X_train, y_train, scoring='accuracy')
+    best_model = search['best_model']
+    best_model_name = search['best_name'] or ""
     best_accuracy = 0.0
-    best_model_name = ""
     results = {}
-    
-    for name, model in models.items():
-        print(f"\n{'─'*60}")
-        print(f"Training: {name}")
-        print(f"{'─'*60}")
-        
-        try:
-            # Train the model
-            model.fit(X_train, y_train)
-            
-            # Predictions on test set
-            y_pred = model.predict(X_test)
-            
-            # Calculate accuracy
-            acc = accuracy_score(y_test, y_pred)
-            
-            # Store results
-            results[name] = {
-                'model': model,
-                'accuracy': acc,
-                'predictions': y_pred
-            }
-            
-            print(f"✓ Training completed")
-            print(f"✓ Test Accuracy: {acc:.4f} ({acc*100:.2f}%)")
-            
-            # Check if this is the best model
-            if acc > best_accuracy:
-                best_accuracy = acc
-                best_model = model
-                best_model_name = name
-                
-        except Exception as e:
-            print(f"✗ Error training {name}: {e}")
-    
+
+    for name, model in search['models'].items():
+        # Predictions on test set
+        y_pred = model.predict(X_test)
+        acc = accuracy_score(y_test, y_pred)
+
+        # Store results
+        results[name] = {
+            'model': model,
+            'accuracy': acc,
+            'cv_accuracy': search['scores'][name],
+            'predictions': y_pred
+        }
+        if name == best_model_name:
+            best_accuracy = acc
+
     print("\n" + "="*60)
     print("TRAINING RESULTS SUMMARY")
     print("="*60)
@@ -159,7 +159,7 @@ def train_models(X_train, X_test, y_train, y_test):
     for name, result in results.items():
         acc = result['accuracy']
         marker = "★" if name == best_model_name else " "
-        print(f"{marker} {name:20s}: {acc:.4f} ({acc*100:.2f}%)")
+        print(f"{marker} {name:20s}: {acc:.4f} ({acc*100:.2f}%), CV {result['cv_accuracy']:.4f}")
     
     print(f"\n{'='*60}")
     print(f"BEST MODEL: {best_model_name}")
@@ -178,9 +178,11 @@ def train_models(X_train, X_test, y_train, y_test):
     
     return best_model, best_model_name, results
 
-def save_models(model, scaler, soil_encoder, crop_encoder, fertilizer_encoder, model_name):
+def save_models(model, scaler, soil_encoder, crop_encoder, fertilizer_encoder, model_name, X_verify=None):
     """
     Save the trained model and all encoders/scalers.
+    Also writes compiled .npz exports for serving; X_verify (scaled features)
+    is used to check the compiled model matches sklearn.
     """
     print(f"\nSaving models and encoders...")
     
@@ -195,30 +197,35 @@ def save_models(model, scaler, soil_encoder, crop_encoder, fertilizer_encoder, m
     with open(model_path, 'wb') as f:
         pickle.dump(model, f)
     print(f"✓ Model saved: {model_path}")
+    export_compiled(model, model_path, X_verify)
     
     # Save scaler
     scaler_path = os.path.join(model_dir, 'fertilizer_scaler.pkl')
     with open(scaler_path, 'wb') as f:
         pickle.dump(scaler, f)
     print(f"✓ Scaler saved: {scaler_path}")
+    export_compiled(scaler, scaler_path)
     
     # Save soil encoder
     soil_encoder_path = os.path.join(model_dir, 'soil_encoder.pkl')
     with open(soil_encoder_path, 'wb') as f:
         pickle.dump(soil_encoder, f)
     print(f"✓ Soil encoder saved: {soil_encoder_path}")
+    export_compiled(soil_encoder, soil_encoder_path)
     
     # Save crop encoder
     crop_encoder_path = os.path.join(model_dir, 'crop_encoder.pkl')
     with open(crop_encoder_path, 'wb') as f:
         pickle.dump(crop_encoder, f)
     print(f"✓ Crop encoder saved: {crop_encoder_path}")
+    export_compiled(crop_encoder, crop_encoder_path)
     
     # Save fertilizer encoder
     fertilizer_encoder_path = os.path.join(model_dir, 'fertilizer_label_encoder.pkl')
     with open(fertilizer_encoder_path, 'wb') as f:
         pickle.dump(fertilizer_encoder, f)
     print(f"✓ Fertilizer encoder saved: {fertilizer_encoder_path}")
+    export_compiled(fertilizer_encoder, fertilizer_encoder_path)
     
     # Save model metadata
     metadata = {
@@ -274,7 +281,7 @@ def main():
         return
     
     # Save the best model and encoders
-    save_models(best_model, scaler, soil_encoder, crop_encoder, fertilizer_encoder, best_model_name)
+    save_models(best_model, scaler, soil_encoder, crop_encoder, fertilizer_encoder, best_model_name, X)
     
     # Display detailed results for best model
     print(f"\n{'='*60}")
@@ -11,6 +11,8 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler
 # Adjust path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from crop_yield_handler import CropYieldHandler
+from tree_engine import export_compiled
+from model_search import Family, search_models
 
 def train_yield_model():
     print("Loading yield data...")
@@ -64,21 +66,44 @@ def train_yield_model():
     # Train Test Split
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
-    # Model
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    print("Training Random Forest Regressor...")
-    model.fit(X_train, y_train)
+    # Candidate families; the previous fixed model is the first Random Forest candidate
+    families = [
+        Family('Random Forest Regressor', RandomForestRegressor(n_estimators=100, random_state=42), {
+            'n_estimators': [100, 200],
+            'max_depth': [None, 20, 30],
+            'min_samples_leaf': [1, 2, 4],
+            'max_features': [1.0, 0.7, 'sqrt'],
+        }),
+        Family('Gradient Boosting Regressor', GradientBoostingRegressor(
+            n_estimators=300,
+            max_depth=5,
+            learning_rate=0.1,
+            subsample=0.8,
+            n_iter_no_change=10,    # Early stopping on a held-out 10%
+            random_state=42
+        ), {
+            'max_depth': [4, 6, 8],
+            'learning_rate': [0.05, 0.1, 0.2],
+            'min_samples_leaf': [1, 5, 20],
+        }),
+    ]
+
+    print("Searching yield models...")
+    search = search_models('yield', families, X_train, y_train, scoring='r2', stratified=False)
+    model = search['best_model']
+    model_name = search['best_name']
     
     # Evaluate
     predictions = model.predict(X_test)
     mse = mean_squared_error(y_test, predictions)
     r2 = r2_score(y_test, predictions)
     
+    print(f"Best Model: {model_name}")
     print(f"Model MSE: {mse:.4f}")
     print(f"Model R2 Score: {r2:.4f}")
     
     with open("model_test_results.txt", "a") as log:
-        log.write(f"\n[Yield Prediction] Random Forest Regressor - MSE: {mse:.4f}, R2 Score: {r2:.4f}\n")
+        log.write(f"\n[Yield Prediction] {model_name} - MSE: {mse:.4f}, R2 Score: {r2:.4f}\n")
     
     # Save
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -103,5 +128,10 @@ def train_yield_model():
         
     print(f"Yield model saved to {model_path}")
 
+    # Flat array exports for serving
+    export_compiled(model, model_path, X)
+    export_compiled(scaler, scaler_path)
+    export_compiled(encoders, encoders_path)
+
 if __name__ == "__main__":
     train_yield_model()
@@ -0,0 +1,360 @@
+import os
+import numpy as np
+
+
+class CompiledEnsemble:
+    """
+    Pure-NumPy evaluator for a fitted RandomForest / GradientBoosting model.
+    All trees are flattened into contiguous node arrays (feature, threshold,
+    left/right child, leaf value) and traversed for the whole batch at once.
+    Arithmetic mirrors sklearn step for step so outputs are bit-identical.
+    """
+
+    def __init__(self, kind, feature, threshold, children, missing_left, value, roots, max_depth,
+                 classes=None, init_raw=None, learning_rate=None, n_stage_trees=1):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.init_raw = init_raw
+        self.learning_rate = learning_rate
+        self.n_stage_trees = n_stage_trees
+        self._has_missing = bool(missing_left.any())
+
+    def _apply(self, X):
+        """
+        Leaf node index for every (row, tree) pair.
+        """
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_rows, n_features = X.shape
+        X_flat = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+
+        # Leaves point back to themselves, so max_depth steps lands every row on its leaf
+        for _ in range(self.max_depth):
+            x = X_flat[row_offsets + self.feature[nodes]]
+            go_right = ~(x <= self.threshold[nodes])
+            if self._has_missing:
+                go_right &= ~(np.isnan(x) & self.missing_left[nodes])
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def _raw_predict(self, X):
+        # GradientBoosting: init prediction + learning_rate * tree output, stage by stage
+        leaves = self._apply(X)
+        K = self.n_stage_trees
+        raw = np.tile(self.init_raw, (leaves.shape[0], 1))
+        for start in range(0, leaves.shape[1], K):
+            raw += self.learning_rate * self.value[leaves[:, start:start + K]]
+        return raw
+
+    def predict_proba(self, X):
+        if self.kind == 'rf_classifier':
+            leaves = self._apply(X)
+            all_proba = np.zeros((leaves.shape[0], len(self.classes_)), dtype=np.float64)
+            # value holds each leaf's class probabilities, as the tree's predict_proba returns them
+            for t in range(leaves.shape[1]):
+                all_proba += self.value[leaves[:, t]]
+            all_proba /= leaves.shape[1]
+            return all_proba
+
+        if self.kind == 'gb_classifier':
+            raw = self._raw_predict(X)
+            if self.n_stage_trees == 1:
+                proba = np.empty((raw.shape[0], 2), dtype=np.float64)
+                # sklearn uses scipy's expit; 1 / (1 + exp(-x)) differs in the last bit
+                from scipy.special import expit
+                proba[:, 1] = expit(raw[:, 0])
+                proba[:, 0] = 1 - proba[:, 1]
+                return proba
+            # softmax, as in sklearn.utils.extmath.softmax
+            raw -= np.max(raw, axis=1).reshape(-1, 1)
+            np.exp(raw, out=raw)
+            raw /= np.sum(raw, axis=1).reshape(-1, 1)
+            return raw
+
+        raise AttributeError(f"predict_proba is not available for {self.kind}")
+
+    def predict(self, X):
+        if self.kind == 'rf_classifier':
+            return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+        if self.kind == 'gb_classifier':
+            raw = self._raw_predict(X)
+            if self.n_stage_trees == 1:
+                encoded = (raw.ravel() >= 0).astype(int)
+            else:
+                encoded = np.argmax(raw, axis=1)
+            return self.classes_[encoded]
+
+        if self.kind == 'rf_regressor':
+            leaves = self._apply(X)
+            y_hat = np.zeros(leaves.shape[0], dtype=np.float64)
+            for t in range(leaves.shape[1]):
+                y_hat += self.value[leaves[:, t]]
+            y_hat /= leaves.shape[1]
+            return y_hat
+
+        # gb_regressor
+        return self._raw_predict(X).ravel()
+
+
+class CompiledScaler:
+    """
+    Drop-in replacement for a fitted StandardScaler's transform().
+    """
+
+    def __init__(self, mean, scale, feature_names=None):
+        self.mean_ = mean
+        self.scale_ = scale
+        if feature_names is not None:
+            self.feature_names_in_ = feature_names
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64, copy=True)
+        if self.mean_ is not None:
+            X -= self.mean_
+        if self.scale_ is not None:
+            X /= self.scale_
+        return X
+
+
+class CompiledLabelEncoder:
+    """
+    Drop-in replacement for a fitted LabelEncoder (classes_, transform, inverse_transform).
+    """
+
+    def __init__(self, classes):
+        self.classes_ = classes
+        self._index = {c: i for i, c in enumerate(classes.tolist())}
+
+    def transform(self, values):
+        try:
+            return np.array([self._index[v] for v in values], dtype=np.int64)
+        except KeyError as e:
+            raise ValueError(f"y contains previously unseen labels: {e}")
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y)]
+
+
+def _classes_array(classes):
+    # Store labels without pickle: object arrays become fixed-width unicode
+    classes = np.asarray(classes)
+    return classes.astype(str) if classes.dtype == object else classes
+
+
+def _flatten_trees(trees):
+    """
+    Concatenates sklearn Tree objects into one set of node arrays.
+    children holds [left, right] per node; leaves point to themselves.
+    """
+    feature, threshold, children, missing_left, value, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        n = tree.node_count
+        node_ids = np.arange(n) + offset
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        children.append(np.column_stack([
+            np.where(is_leaf, node_ids, tree.children_left + offset),
+            np.where(is_leaf, node_ids, tree.children_right + offset),
+        ]).ravel())
+        if hasattr(tree, 'missing_go_to_left'):
+            missing_left.append(tree.missing_go_to_left.astype(bool))
+        else:
+            missing_left.append(np.zeros(n, dtype=bool))
+        value.append(tree.value)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    return {
+        'feature': np.concatenate(feature).astype(np.intp),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'children': np.concatenate(children).astype(np.intp),
+        'missing_left': np.concatenate(missing_left),
+        'value': np.concatenate(value),
+        'roots': np.array(roots, dtype=np.intp),
+        'max_depth': np.array(max_depth),
+    }
+
+
+def _leaf_probabilities(model, value, X_sample):
+    """
+    Per-leaf class probabilities exactly as the installed sklearn's trees return them.
+    Older releases store class counts and normalize in predict_proba; newer ones
+    store fractions and return them as-is. Probe the first tree to find out.
+    """
+    normalizer = value.sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    normalized = value / normalizer
+
+    tree = model.estimators_[0]
+    X32 = np.asarray(X_sample, dtype=np.float32)
+    n_nodes = tree.tree_.node_count
+    if np.array_equal(tree.predict_proba(X32), value[:n_nodes][tree.apply(X32)]):
+        return value
+    return normalized
+
+
+def compile_model(model, X_sample=None):
+    """
+    Flattens a fitted sklearn model into a dict of NumPy arrays.
+    Supports RandomForest/GradientBoosting (single output, X_sample required),
+    StandardScaler, LabelEncoder and dicts of LabelEncoders.
+    Returns None if unsupported.
+    Only this export step imports sklearn.
+    """
+    from sklearn.ensemble import (
+        RandomForestClassifier, RandomForestRegressor,
+        GradientBoostingClassifier, GradientBoostingRegressor
+    )
+    from sklearn.preprocessing import StandardScaler, LabelEncoder
+
+    if isinstance(model, dict):
+        if not model or not all(isinstance(v, LabelEncoder) for v in model.values()):
+            return None
+        arrays = {'kind': np.array('label_encoder_dict')}
+        for name, le in model.items():
+            arrays[f'classes__{name}'] = _classes_array(le.classes_)
+        return arrays
+
+    if isinstance(model, LabelEncoder):
+        return {'kind': np.array('label_encoder'), 'classes': _classes_array(model.classes_)}
+
+    if isinstance(model, StandardScaler):
+        arrays = {'kind': np.array('standard_scaler')}
+        if model.mean_ is not None:
+            arrays['mean'] = model.mean_
+        if model.scale_ is not None:
+            arrays['scale'] = model.scale_
+        if hasattr(model, 'feature_names_in_'):
+            arrays['feature_names'] = _classes_array(model.feature_names_in_)
+        return arrays
+
+    # Ensembles need sample rows to probe leaf semantics / init predictions and to verify
+    if X_sample is None or getattr(model, 'n_outputs_', 1) != 1:
+        return None
+
+    if isinstance(model, (RandomForestClassifier, RandomForestRegressor)):
+        arrays = _flatten_trees([e.tree_ for e in model.estimators_])
+        if isinstance(model, RandomForestClassifier):
+            arrays['kind'] = np.array('rf_classifier')
+            arrays['value'] = _leaf_probabilities(model, arrays['value'][:, 0, :], X_sample)
+            arrays['classes'] = _classes_array(model.classes_)
+        else:
+            arrays['kind'] = np.array('rf_regressor')
+            arrays['value'] = arrays['value'][:, 0, 0]
+        return arrays
+
+    if isinstance(model, (GradientBoostingClassifier, GradientBoostingRegressor)):
+        stages = model.estimators_
+        arrays = _flatten_trees([stages[i, k].tree_ for i in range(stages.shape[0]) for k in range(stages.shape[1])])
+        arrays['value'] = arrays['value'][:, 0, 0]
+        arrays['n_stage_trees'] = np.array(stages.shape[1])
+        arrays['learning_rate'] = np.array(model.learning_rate, dtype=np.float64)
+        # The init estimator predicts a constant, so one row of raw predictions covers all inputs
+        arrays['init_raw'] = np.asarray(model._raw_predict_init(np.asarray(X_sample)[:1]), dtype=np.float64)[0]
+        if isinstance(model, GradientBoostingClassifier):
+            arrays['kind'] = np.array('gb_classifier')
+            arrays['classes'] = _classes_array(model.classes_)
+        else:
+            arrays['kind'] = np.array('gb_regressor')
+        return arrays
+
+    return None
+
+
+def from_arrays(arrays):
+    """
+    Builds the serving object for a dict/NpzFile of compiled arrays.
+    """
+    kind = str(arrays['kind'])
+
+    if kind == 'label_encoder_dict':
+        return {
+            key[len('classes__'):]: CompiledLabelEncoder(arrays[key])
+            for key in arrays.keys() if key.startswith('classes__')
+        }
+    if kind == 'label_encoder':
+        return CompiledLabelEncoder(arrays['classes'])
+    if kind == 'standard_scaler':
+        return CompiledScaler(
+            arrays['mean'] if 'mean' in arrays else None,
+            arrays['scale'] if 'scale' in arrays else None,
+            arrays['feature_names'] if 'feature_names' in arrays else None
+        )
+
+    return CompiledEnsemble(
+        kind=kind,
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        children=arrays['children'],
+        missing_left=arrays['missing_left'],
+        value=arrays['value'],
+        roots=arrays['roots'],
+        max_depth=int(arrays['max_depth']),
+        classes=arrays['classes'] if 'classes' in arrays else None,
+        init_raw=arrays['init_raw'] if 'init_raw' in arrays else None,
+        learning_rate=float(arrays['learning_rate']) if 'learning_rate' in arrays else None,
+        n_stage_trees=int(arrays['n_stage_trees']) if 'n_stage_trees' in arrays else 1
+    )
+
+
+def load_compiled(path):
+    """
+    Loads a compiled .npz artifact written by export_compiled().
+    """
+    with np.load(path, allow_pickle=False) as npz:
+        return from_arrays({key: npz[key] for key in npz.files})
+
+
+def _outputs_match(model, compiled, X_verify):
+    if compiled.kind.endswith('classifier'):
+        if not np.array_equal(model.predict_proba(X_verify), compiled.predict_proba(X_verify)):
+            return False
+    return np.array_equal(model.predict(X_verify), compiled.predict(X_verify))
+
+
+def export_compiled(model, pkl_path, X_verify=None):
+    """
+    Writes the compiled form of a model next to its pickle (<name>.npz).
+    Tree ensembles are checked for bit-identical outputs on X_verify first;
+    if the model is unsupported or the check fails, any stale .npz is removed
+    so serving falls back to the pickle.
+    :return: Path of the written .npz, or None
+    """
+    npz_path = os.path.splitext(pkl_path)[0] + '.npz'
+    X_check = None if X_verify is None else np.asarray(X_verify, dtype=np.float64)
+
+    arrays = compile_model(model, X_check)
+    compiled = from_arrays(arrays) if arrays is not None else None
+
+    if isinstance(compiled, CompiledEnsemble):
+        if not _outputs_match(model, compiled, X_check):
+            print(f"Compiled output differs from sklearn, not exporting {os.path.basename(npz_path)}")
+            compiled = None
+
+    if compiled is None:
+        if os.path.exists(npz_path):
+            os.remove(npz_path)
+        print(f"Skipping compiled export for {os.path.basename(pkl_path)} ({type(model).__name__})")
+        return None
+
+    # Write then rename so a hot-reloading server never reads a partial file
+    tmp_path = npz_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, npz_path)
+    print(f"Compiled model saved to {npz_path}")
+    return npz_path
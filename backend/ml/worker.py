@@ -0,0 +1,166 @@
+"""
+Long-running inference worker for the Node bridge (services/mlService.js).
+
+Keeps CropPredictor, FertilizerRecommender and YieldPredictor resident and
+answers newline-delimited JSON requests, so one process serves many
+predictions instead of paying interpreter start-up and unpickling per call.
+
+Request:  {"id": 1, "task": "crop" | "fertilizer" | "yield", "args": {...}, "lang": "en"}
+Response: {"id": 1, "result": ...}  or  {"id": 1, "error": "..."}
+
+Usage:
+    python predict.py --serve                      (stdin/stdout)
+    python predict.py --serve --socket /tmp/ml.sock (Unix socket)
+"""
+import sys
+import json
+import os
+import socketserver
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(project_root)
+sys.path.append(current_dir)
+
+from predictor import CropPredictor
+from fertilizer_recommender import FertilizerRecommender
+from yield_predictor import YieldPredictor
+
+# Loaded once and kept resident for the life of the worker
+crop_predictor = CropPredictor()
+fertilizer_recommender = FertilizerRecommender()
+yield_predictor = YieldPredictor()
+
+
+def predict_crop(args, lang='en'):
+    # Same inputs as predict.py: n, p, k, ph, temp, humidity, rainfall
+    # Model order: N, P, K, Temp, Hum, pH, Rain
+    features = [
+        float(args['n']),
+        float(args['p']),
+        float(args['k']),
+        float(args['temp']),
+        float(args['humidity']),
+        float(args['ph']),
+        float(args['rainfall'])
+    ]
+    return crop_predictor.predict(features, top_n=3, lang=lang)
+
+
+def predict_fertilizer(args, lang='en'):
+    # Same inputs as predict_fertilizer.py
+    return fertilizer_recommender.recommend(
+        float(args['temp']),
+        float(args['humidity']),
+        float(args['moisture']),
+        args.get('soil_type'),
+        args.get('crop'),
+        float(args['n']),
+        float(args['k']),
+        float(args['p']),
+        lang
+    )
+
+
+def predict_yield(args, lang='en'):
+    # Same inputs as predict_yield.py
+    result = yield_predictor.predict(
+        args['state'],
+        args['district'],
+        args['crop'],
+        args['season'],
+        float(args['rainfall']),
+        float(args['fertilizer']),
+        float(args['pesticide']),
+        args.get('soil_type')
+    )
+    return {
+        "predicted_yield": result,
+        "unit": "tons/hectare"
+    }
+
+
+TASKS = {
+    'crop': predict_crop,
+    'fertilizer': predict_fertilizer,
+    'yield': predict_yield,
+}
+
+
+def handle_line(line):
+    """
+    Runs one NDJSON request line and returns the response dict.
+    """
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get('id')
+        task = TASKS.get(request.get('task'))
+        if task is None:
+            return {"id": request_id, "error": f"Unknown task: {request.get('task')}"}
+        result = task(request.get('args') or {}, request.get('lang') or 'en')
+        return {"id": request_id, "result": result}
+    except Exception as e:
+        return {"id": request_id, "error": str(e)}
+
+
+def serve_stdio():
+    """
+    Serves requests from stdin, one JSON response per line on stdout.
+    """
+    out = sys.stdout
+    # Predictors print diagnostics; keep them off the response stream
+    sys.stdout = sys.stderr
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        out.write(json.dumps(handle_line(line), default=float) + "\n")
+        out.flush()
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode('utf-8').strip()
+            if not line:
+                continue
+            response = json.dumps(handle_line(line), default=float) + "\n"
+            self.wfile.write(response.encode('utf-8'))
+            self.wfile.flush()
+
+
+def serve_socket(path):
+    """
+    Serves requests over a local Unix socket; each connection is an NDJSON stream.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+
+    sys.stdout = sys.stderr
+    with socketserver.ThreadingUnixStreamServer(path, _LineHandler) as server:
+        print(f"ML worker listening on {path}")
+        try:
+            server.serve_forever()
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def serve(argv=None):
+    """
+    Entry point for `--serve` mode of the predict*.py scripts.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if '--socket' in argv:
+        idx = argv.index('--socket')
+        if idx + 1 >= len(argv):
+            print("Error: --socket requires a path", file=sys.stderr)
+            sys.exit(2)
+        serve_socket(argv[idx + 1])
+    else:
+        serve_stdio()
+
+
+if __name__ == "__main__":
+    serve()
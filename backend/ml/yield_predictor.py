@@ -1,32 +1,24 @@
-import os
-import pickle
 import numpy as np
 
+from backend.utils.metrics import MODEL_FALLBACKS
+
+try:
+    from .model_registry import artifact
+except ImportError:
+    from model_registry import artifact
+
 class YieldPredictor:
-    def __init__(self):
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.model_dir = os.path.join(os.path.dirname(current_dir), 'models')
-        
-        self.model = self._load_model('yield_model.pkl')
-        self.scaler = self._load_model('yield_scaler.pkl')
-        self.encoders = self._load_model('yield_encoders.pkl')
-        
-    def _load_model(self, filename):
-        path = os.path.join(self.model_dir, filename)
-        if os.path.exists(path):
-            try:
-                with open(path, 'rb') as f:
-                    return pickle.load(f)
-            except Exception as e:
-                print(f"Error loading {filename}: {e}")
-                return None
-        return None
+    # Loaded once per process through the model registry
+    model = artifact('yield_model.pkl')
+    scaler = artifact('yield_scaler.pkl')
+    encoders = artifact('yield_encoders.pkl')
 
     def predict(self, state, district, crop, season, rainfall, fertilizer, pesticide, soil_type=None):
         """
         Predicts yield.
         """
         if not self.model:
+            MODEL_FALLBACKS.inc('yield', 'model_missing')
             return None
             
         try:
@@ -44,6 +36,7 @@ class YieldPredictor:
                         # Fallback for unseen labels: Use mode or specific defaults
                         # For now, just using 0 or a known valid index if available
                         print(f"Warning: Unseen label '{value}' for {col_name}. Using default.")
+                        MODEL_FALLBACKS.inc('yield', 'unseen_label')
                         return 0
                 return 0
                 
@@ -79,4 +72,59 @@ class YieldPredictor:
             
         except Exception as e:
             print(f"Yield Prediction Error: {e}")
+            MODEL_FALLBACKS.inc('yield', 'error')
             return None
+
+    def predict_batch(self, samples):
+        """
+        Predicts yield for many samples with one scaler transform and one model call.
+        :param samples: List of dicts with keys state, district, crop, season,
+                        rainfall, fertilizer, pesticide and optional soil_type
+        :return: List of predicted yields (or None) in input order
+        """
+        if not samples:
+            return []
+        if not self.model:
+            MODEL_FALLBACKS.inc('yield', 'model_missing', amount=len(samples))
+            return [None] * len(samples)
+
+        try:
+            # Build class -> code lookups once per batch instead of le.transform per value
+            lookups = {
+                col: {c: i for i, c in enumerate(le.classes_)}
+                for col, le in self.encoders.items()
+            }
+
+            def encode(col_name, value):
+                if col_name in lookups:
+                    if value in lookups[col_name]:
+                        return lookups[col_name][value]
+                    print(f"Warning: Unseen label '{value}' for {col_name}. Using default.")
+                    MODEL_FALLBACKS.inc('yield', 'unseen_label')
+                return 0
+
+            categorical = []
+            for s in samples:
+                row = [
+                    encode('State', s['state']),
+                    encode('District', s['district']),
+                    encode('Crop', s['crop']),
+                    encode('Season', s['season']),
+                ]
+                if 'Soil_Type' in self.encoders:
+                    row.append(encode('Soil_Type', s.get('soil_type') or 'Clayey'))
+                categorical.append(row)
+
+            raw_nums = np.array(
+                [[float(s['rainfall']), float(s['fertilizer']), float(s['pesticide'])] for s in samples]
+            )
+            scaled_nums = self.scaler.transform(raw_nums)
+
+            final_input = np.hstack([np.array(categorical, dtype=float), scaled_nums])
+            predictions = self.model.predict(final_input)
+            return [round(float(p), 2) for p in predictions]
+
+        except Exception as e:
+            print(f"Batch Yield Prediction Error: {e}")
+            MODEL_FALLBACKS.inc('yield', 'error', amount=len(samples))
+            return [None] * len(samples)
@@ -1,54 +1,213 @@
 from config.supabase_client import supabase
 from datetime import datetime, timedelta
-import pandas as pd
+import time
+
+from backend.utils.metrics import DB_ERRORS, MOCK_RESPONSES, timed
+
+# Rows per page when aggregating locally (Supabase caps a select at 1000 rows)
+AGGREGATION_PAGE_SIZE = 1000
+# Seconds to skip the RPC after it fails (e.g. function not deployed yet)
+RPC_RETRY_INTERVAL = 300
+
+# DB column -> model feature name
+AVERAGED_COLUMNS = {
+    'temperature': 'temperature',
+    'humidity': 'humidity',
+    'ph': 'ph',
+    'nitrogen': 'N',
+    'phosphorus': 'P',
+    'potassium': 'K',
+}
+
 
 class AggregationService:
+    def __init__(self):
+        self._rpc_failed_at = {}
+
     def get_30_day_average(self, device_id='pi_01'):
         """
-        Fetches last 30 days of data for the device from Supabase and calculates stats.
+        Calculates last 30 days of stats for the device in Supabase.
         Returns dictionary with keys mapping to model features: N, P, K, temperature, humidity, ph, rainfall.
         """
+        return self.get_window_average(device_id, days=30)
+
+    def get_window_average(self, device_id='pi_01', days=30):
+        """
+        Means (rainfall: total) over the last `days` days, keyed by model feature.
+        """
         if not supabase:
             # Fallback for offline/local mode without Supabase connection
+            MOCK_RESPONSES.inc('aggregation_no_supabase')
             return self._mock_aggregation()
 
+        since = (datetime.now() - timedelta(days=days)).isoformat()
+
         try:
-            thirty_days_ago = (datetime.now() - timedelta(days=30)).isoformat()
-            
-            # Fetch data
-            response = supabase.table('sensor_readings')\
-                .select('*')\
-                .eq('device_id', device_id)\
-                .gte('timestamp', thirty_days_ago)\
-                .execute()
-            
-            data = response.data
-            if not data:
+            agg = self._aggregate_in_db(device_id, since)
+            if agg is None:
+                stats = self._stats_paged(device_id, since)
+                agg = self._averages_from_stats(stats) if stats else None
+            if agg is None:
                 print("No data found for aggregation, using mock.")
+                MOCK_RESPONSES.inc('aggregation_no_data')
                 return self._mock_aggregation()
-                
-            df = pd.DataFrame(data)
-            
-            # Map column names if they differ from model expectation
-            # DB: nitrogen, phosphorus, potassium
-            # Model: N, P, K
-            
-            agg = {
-                'temperature': round(df['temperature'].mean(), 2),
-                'humidity': round(df['humidity'].mean(), 2),
-                'ph': round(df['ph'].mean(), 2),
-                'N': round(df['nitrogen'].mean(), 2),
-                'P': round(df['phosphorus'].mean(), 2),
-                'K': round(df['potassium'].mean(), 2),
-                # If rainfall is not in DB (fetched from weather API usually), default to 0
-                'rainfall': round(df['rainfall'].sum(), 2) if 'rainfall' in df.columns else 100.0 
-            }
             return agg
-            
+
         except Exception as e:
             print(f"Aggregation Service Error: {e}")
+            DB_ERRORS.inc('aggregation')
+            MOCK_RESPONSES.inc('aggregation_error')
             return self._mock_aggregation()
 
+    def get_window_stats(self, device_id='pi_01', days=30):
+        """
+        Per-metric count, mean, stddev, min, max and total over the last `days` days,
+        keyed by DB column name. Returns None without data or a Supabase connection.
+        """
+        if not supabase:
+            return None
+
+        since = (datetime.now() - timedelta(days=days)).isoformat()
+
+        try:
+            stats = self._stats_in_db(device_id, since)
+            if stats is None:
+                stats = self._stats_paged(device_id, since)
+            return stats or None
+
+        except Exception as e:
+            print(f"Aggregation Service Error: {e}")
+            DB_ERRORS.inc('aggregation_stats')
+            return None
+
+    def _rpc(self, name, params):
+        """
+        Calls a database function; returns None (and backs off for
+        RPC_RETRY_INTERVAL) if it is unavailable.
+        """
+        failed_at = self._rpc_failed_at.get(name)
+        if failed_at is not None and time.monotonic() - failed_at < RPC_RETRY_INTERVAL:
+            return None
+        try:
+            with timed(f'rpc_{name}'):
+                response = supabase.rpc(name, params).execute()
+        except Exception as e:
+            print(f"Aggregation RPC {name} unavailable, aggregating locally: {e}")
+            DB_ERRORS.inc(f'rpc_{name}')
+            self._rpc_failed_at[name] = time.monotonic()
+            return None
+        self._rpc_failed_at.pop(name, None)
+        return response.data
+
+    def _aggregate_in_db(self, device_id, since):
+        """
+        Computes the aggregates inside Postgres (sensor_window_aggregate in
+        database/schema.sql, served from the hourly/daily rollups), so only one
+        row crosses the wire. Returns None if the RPC is unavailable or there are no readings.
+        """
+        rows = self._rpc('sensor_window_aggregate', {'p_device_id': device_id, 'p_since': since})
+        row = rows[0] if isinstance(rows, list) and rows else rows
+        if not row or not row.get('readings'):
+            return None
+
+        agg = {
+            feature: self._round(row.get(f'avg_{column}'))
+            for column, feature in AVERAGED_COLUMNS.items()
+        }
+        agg['rainfall'] = self._round(row.get('total_rainfall') or 0)
+        return agg
+
+    def _stats_in_db(self, device_id, since):
+        """
+        Reads per-metric statistics from the rollups (sensor_rollup_stats).
+        Returns None if the RPC is unavailable.
+        """
+        rows = self._rpc('sensor_rollup_stats', {'p_device_id': device_id, 'p_since': since})
+        if rows is None:
+            return None
+        return {
+            row['metric']: {
+                'count': int(row['n']),
+                'mean': self._round(row.get('mean')),
+                'stddev': self._round(row.get('stddev')),
+                'min': self._round(row.get('min_value')),
+                'max': self._round(row.get('max_value')),
+                'total': self._round(row.get('total')),
+            }
+            for row in rows
+            if row.get('metric') != 'readings'
+        }
+
+    def _stats_paged(self, device_id, since):
+        """
+        Local fallback: streams the window in keyset-paginated pages and keeps
+        running count, sum, sum of squares, min and max per metric (the same
+        accumulators as the DB rollups), so memory stays O(page) rather than O(readings).
+        Returns None if there are no readings.
+        """
+        columns = list(AVERAGED_COLUMNS) + ['rainfall']
+        acc = {column: [0, 0.0, 0.0, None, None] for column in columns}  # n, sum, sum_sq, min, max
+        rows_seen = 0
+        last_id = None
+
+        while True:
+            query = supabase.table('sensor_readings')\
+                .select('id,' + ','.join(columns))\
+                .eq('device_id', device_id)\
+                .gte('timestamp', since)
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            with timed('aggregation_page_query'):
+                page = query.order('id').limit(AGGREGATION_PAGE_SIZE).execute().data
+
+            for row in page or []:
+                for column in columns:
+                    value = row.get(column)
+                    if value is None:
+                        continue
+                    value = float(value)
+                    a = acc[column]
+                    a[0] += 1
+                    a[1] += value
+                    a[2] += value * value
+                    a[3] = value if a[3] is None else min(a[3], value)
+                    a[4] = value if a[4] is None else max(a[4], value)
+            rows_seen += len(page or [])
+
+            if not page or len(page) < AGGREGATION_PAGE_SIZE:
+                break
+            last_id = page[-1]['id']
+
+        if rows_seen == 0:
+            return None
+
+        stats = {}
+        for column, (n, total, total_sq, lo, hi) in acc.items():
+            if not n:
+                continue
+            variance = max((total_sq - total * total / n) / (n - 1), 0.0) if n > 1 else None
+            stats[column] = {
+                'count': n,
+                'mean': self._round(total / n),
+                'stddev': self._round(variance ** 0.5) if variance is not None else None,
+                'min': self._round(lo),
+                'max': self._round(hi),
+                'total': self._round(total),
+            }
+        return stats
+
+    def _averages_from_stats(self, stats):
+        agg = {
+            feature: stats[column]['mean'] if column in stats else None
+            for column, feature in AVERAGED_COLUMNS.items()
+        }
+        agg['rainfall'] = stats['rainfall']['total'] if 'rainfall' in stats else 0.0
+        return agg
+
+    @staticmethod
+    def _round(value):
+        return round(float(value), 2) if value is not None else None
+
     def _mock_aggregation(self):
         """
         Provides dummy aggregated data for testing/demo.
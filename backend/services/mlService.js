@@ -1,97 +1,155 @@
 const { spawn } = require('child_process');
 const path = require('path');
-
-exports.predictCrop = (inputData, lang = 'en') => {
-    return new Promise((resolve, reject) => {
-        // Path to python script
-        const scriptPath = path.join(__dirname, '../../ml/predict.py');
-
-        // Prepare arguments
-        const args = [
-            inputData.n,
-            inputData.p,
-            inputData.k,
-            inputData.ph,
-            inputData.temp,
-            inputData.humidity,
-            inputData.rainfall,
-            lang
-        ];
-
-        console.log('Running Crop ML script with args:', args);
-
-        const pythonProcess = spawn('python', [scriptPath, ...args]);
-
-        let dataString = '';
-
-        pythonProcess.stdout.on('data', (data) => {
-            dataString += data.toString();
-        });
-
-        pythonProcess.stderr.on('data', (data) => {
-            console.error(`ML Error: ${data}`);
-        });
-
-        pythonProcess.on('close', (code) => {
-            if (code !== 0) {
-                console.warn('ML script failed, returning fallback data');
-                resolve([]);
-                return;
-            }
-
+const readline = require('readline');
+
+// Long-running Python workers (ml/worker.py) keep the models resident,
+// so requests no longer pay interpreter start-up and unpickling each time.
+const WORKER_SCRIPT = path.join(__dirname, '../ml/predict.py');
+const POOL_SIZE = parseInt(process.env.ML_WORKERS || '2', 10);
+const REQUEST_TIMEOUT_MS = parseInt(process.env.ML_TIMEOUT_MS || '10000', 10);
+const PYTHON_BIN = process.env.PYTHON_BIN || 'python';
+
+class PythonWorker {
+    constructor(index) {
+        this.index = index;
+        this.pending = new Map();
+        this.start();
+    }
+
+    start() {
+        this.process = spawn(PYTHON_BIN, [WORKER_SCRIPT, '--serve']);
+
+        // One JSON response per line; match it back to the caller by id
+        readline.createInterface({ input: this.process.stdout }).on('line', (line) => {
+            let message;
             try {
-                const results = JSON.parse(dataString);
-                resolve(results);
+                message = JSON.parse(line);
             } catch (e) {
-                console.error('Failed to parse ML output');
-                resolve([]);
+                console.error(`ML worker ${this.index}: unparseable output`);
+                return;
+            }
+            const entry = this.pending.get(message.id);
+            if (!entry) return;
+            this.pending.delete(message.id);
+            clearTimeout(entry.timer);
+            if (message.error) {
+                entry.reject(new Error(message.error));
+            } else {
+                entry.resolve(message.result);
             }
         });
-    });
-};
 
-exports.predictYield = (inputData, lang = 'en') => {
-    return new Promise((resolve, reject) => {
-        const scriptPath = path.join(__dirname, '../../ml/predict_yield.py');
+        this.process.stderr.on('data', (data) => {
+            console.error(`ML worker ${this.index}: ${data}`);
+        });
 
-        // Args: state, district, crop, season, rain, fert, pest, lang
-        const args = [
-            inputData.state,
-            inputData.district,
-            inputData.crop,
-            inputData.season,
-            inputData.rainfall, // annual rainfall
-            inputData.fertilizer,
-            inputData.pesticide,
-            lang
-        ];
+        this.process.stdin.on('error', (error) => {
+            console.error(`ML worker ${this.index} stdin error:`, error.message);
+        });
 
-        console.log('Running Yield ML script with args:', args);
+        this.process.on('error', (error) => {
+            console.error(`ML worker ${this.index} failed to start:`, error.message);
+        });
 
-        const pythonProcess = spawn('python', [scriptPath, ...args]);
+        this.process.on('exit', (code) => {
+            console.warn(`ML worker ${this.index} exited (code ${code}), restarting`);
+            // Fail everything in flight on this worker, then respawn
+            for (const entry of this.pending.values()) {
+                clearTimeout(entry.timer);
+                entry.reject(new Error('ML worker exited'));
+            }
+            this.pending.clear();
+            setTimeout(() => this.start(), 1000);
+        });
+    }
 
-        let dataString = '';
+    send(id, task, args, lang) {
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error(`ML ${task} request timed out`));
+            }, REQUEST_TIMEOUT_MS);
 
-        pythonProcess.stdout.on('data', (data) => {
-            dataString += data.toString();
+            this.pending.set(id, { resolve, reject, timer });
+            this.process.stdin.write(JSON.stringify({ id, task, args, lang }) + '\n');
         });
+    }
+}
+
+class PythonWorkerPool {
+    constructor(size) {
+        this.size = size;
+        this.workers = null;
+        this.nextId = 1;
+    }
+
+    request(task, args, lang) {
+        // Spawn lazily so requiring this module stays cheap
+        if (!this.workers) {
+            this.workers = Array.from({ length: this.size }, (_, i) => new PythonWorker(i));
+        }
+        // Least-loaded worker gets the request
+        const worker = this.workers.reduce((best, w) => (w.pending.size < best.pending.size ? w : best));
+        return worker.send(this.nextId++, task, args, lang);
+    }
+}
+
+const pool = new PythonWorkerPool(POOL_SIZE);
+
+exports.predictCrop = async (inputData, lang = 'en') => {
+    const args = {
+        n: inputData.n,
+        p: inputData.p,
+        k: inputData.k,
+        ph: inputData.ph,
+        temp: inputData.temp,
+        humidity: inputData.humidity,
+        rainfall: inputData.rainfall
+    };
+
+    try {
+        return await pool.request('crop', args, lang);
+    } catch (e) {
+        console.warn('ML crop prediction failed, returning fallback data:', e.message);
+        return [];
+    }
+};
 
-        pythonProcess.stderr.on('data', (data) => {
-            console.error(`Yield ML Error: ${data}`);
-        });
+exports.predictYield = async (inputData, lang = 'en') => {
+    const args = {
+        state: inputData.state,
+        district: inputData.district,
+        crop: inputData.crop,
+        season: inputData.season,
+        rainfall: inputData.rainfall, // annual rainfall
+        fertilizer: inputData.fertilizer,
+        pesticide: inputData.pesticide
+    };
+
+    try {
+        return await pool.request('yield', args, lang);
+    } catch (e) {
+        console.error('Yield ML prediction failed:', e.message);
+        return null;
+    }
+};
 
-        pythonProcess.on('close', (code) => {
-            if (code !== 0) {
-                resolve(null);
-                return;
-            }
-            try {
-                const result = JSON.parse(dataString);
-                resolve(result);
-            } catch (e) {
-                console.error('Failed to parse Yield ML output');
-                resolve(null);
-            }
-        });
-    });
+exports.predictFertilizer = async (inputData, lang = 'en') => {
+    const args = {
+        temp: inputData.temp,
+        humidity: inputData.humidity,
+        moisture: inputData.moisture,
+        soil_type: inputData.soil_type,
+        crop: inputData.crop,
+        n: inputData.n,
+        k: inputData.k,
+        p: inputData.p
+    };
+
+    try {
+        return await pool.request('fertilizer', args, lang);
+    } catch (e) {
+        console.error('Fertilizer ML prediction failed:', e.message);
+        return null;
+    }
 };
@@ -0,0 +1,210 @@
+import base64
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from backend.utils.metrics import timed
+
+# Renderer tuning (overridable via environment)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))                                     # Persistent Node renderers
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "10"))                    # Seconds per render
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))   # LRU bound on cached PDFs
+PDF_CACHE_TTL = float(os.getenv("PDF_CACHE_TTL", "3600"))                            # Seconds a rendered PDF is reused
+NODE_BIN = os.getenv("NODE_BIN", "node")
+
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+RENDER_SCRIPT = os.path.join(SERVICES_DIR, 'generate_pdf.js')
+
+
+class PdfRenderer:
+    """
+    One long-running `node generate_pdf.js --serve` process.
+    Requests are multiplexed by id over its stdin/stdout (one JSON line each way),
+    so the interpreter and pdfkit are loaded once instead of per report.
+    """
+
+    def __init__(self, index, script=RENDER_SCRIPT):
+        self.index = index
+        self.script = script
+        self.process = None
+        self._pid = None
+        self._pending = {}  # id -> [Event, response]
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # (Re)start lazily: first use, after the renderer died, or in a forked child
+        if self.process is not None and self.process.poll() is None and self._pid == os.getpid():
+            return
+        try:
+            self.process = subprocess.Popen(
+                [NODE_BIN, self.script, '--serve'],
+                cwd=os.path.dirname(self.script),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding='utf-8'
+            )
+        except OSError as e:
+            raise RuntimeError(f"PDF renderer unavailable: {e}")
+        self._pid = os.getpid()
+        # Each process gets its own pending map, so a replaced renderer only fails its own requests
+        self._pending = {}
+        threading.Thread(target=self._read_responses, args=(self.process, self._pending), daemon=True).start()
+
+    def _read_responses(self, process, pending):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                print(f"PDF renderer {self.index}: unparseable output")
+                continue
+            with self._lock:
+                waiter = pending.pop(message.get('id'), None)
+            if waiter is not None:
+                waiter[1] = message
+                waiter[0].set()
+
+        # Renderer exited: fail everything still waiting on it
+        print(f"PDF renderer {self.index} exited (code {process.wait()})")
+        with self._lock:
+            waiters = list(pending.values())
+            pending.clear()
+        for waiter in waiters:
+            waiter[1] = {'error': 'PDF renderer exited'}
+            waiter[0].set()
+
+    @property
+    def load(self):
+        return len(self._pending)
+
+    def render(self, request_id, data, timeout=PDF_RENDER_TIMEOUT):
+        """
+        Renders one report and returns the PDF bytes. Raises RuntimeError on failure.
+        """
+        waiter = [threading.Event(), None]
+        with self._lock:
+            self._ensure_started()
+            process, pending = self.process, self._pending
+            pending[request_id] = waiter
+            try:
+                process.stdin.write(json.dumps({'id': request_id, 'data': data}) + "\n")
+                process.stdin.flush()
+            except (OSError, ValueError) as e:
+                pending.pop(request_id, None)
+                raise RuntimeError(f"PDF renderer unavailable: {e}")
+
+        if not waiter[0].wait(timeout):
+            with self._lock:
+                pending.pop(request_id, None)
+            # A hung renderer would stall every later request; replace it
+            process.kill()
+            raise RuntimeError("PDF generation timed out")
+
+        response = waiter[1]
+        if response.get('error'):
+            raise RuntimeError(response['error'])
+        return base64.b64decode(response['pdf'])
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+
+
+class PdfService:
+    """
+    Renders recommendation reports through a pool of persistent Node renderers
+    and streams the bytes back, with no temp files on disk. Identical payloads
+    (same content hash) reuse the cached PDF until PDF_CACHE_TTL expires.
+    The "Generated" time printed on a report is part of the payload (to the
+    minute), so a cached PDF is only reused within the minute it was stamped.
+    """
+
+    def __init__(self, workers=PDF_WORKERS, cache_max_bytes=PDF_CACHE_MAX_BYTES, cache_ttl=PDF_CACHE_TTL):
+        self.renderers = [PdfRenderer(i) for i in range(max(workers, 1))]
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_ttl = cache_ttl
+
+        self._cache = OrderedDict()  # digest -> (pdf_bytes, rendered_at)
+        self._cache_bytes = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'renders': 0,
+            'render_errors': 0,
+            'evictions': 0,
+        }
+
+    @staticmethod
+    def payload_digest(data):
+        """
+        Content hash of a report payload (key order does not matter).
+        """
+        canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def render_report(self, data):
+        """
+        Returns (pdf_bytes, digest, cache_hit). Raises RuntimeError if rendering fails.
+        """
+        # The renderer prints this instead of its own clock, so the stamp is covered by the hash
+        data = dict(data)
+        data.setdefault('generated_at', datetime.now().strftime('%Y-%m-%d %H:%M'))
+        digest = self.payload_digest(data)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None and now - entry[1] < self.cache_ttl:
+                self._cache.move_to_end(digest)
+                self.stats['hits'] += 1
+                return entry[0], digest, True
+            self.stats['misses'] += 1
+
+        # Least-loaded renderer gets the request
+        renderer = min(self.renderers, key=lambda r: r.load)
+        try:
+            with timed('pdf_render'):
+                pdf_bytes = renderer.render(next(self._ids), data)
+        except RuntimeError:
+            with self._lock:
+                self.stats['render_errors'] += 1
+            raise
+
+        with self._lock:
+            self.stats['renders'] += 1
+            self._store(digest, pdf_bytes, time.monotonic())
+        return pdf_bytes, digest, False
+
+    def _store(self, digest, pdf_bytes, rendered_at):
+        # Caller holds self._lock
+        old = self._cache.pop(digest, None)
+        if old is not None:
+            self._cache_bytes -= len(old[0])
+        if len(pdf_bytes) > self.cache_max_bytes:
+            return
+        self._cache[digest] = (pdf_bytes, rendered_at)
+        self._cache_bytes += len(pdf_bytes)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, (evicted, _) = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+            self.stats['evictions'] += 1
+
+    def cache_stats(self):
+        """
+        Hit/miss counters and current cache size.
+        """
+        with self._lock:
+            return {'entries': len(self._cache), 'bytes': self._cache_bytes, **self.stats}
+
+    def close(self):
+        for renderer in self.renderers:
+            renderer.close()
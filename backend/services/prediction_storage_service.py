@@ -1,5 +1,269 @@
 from config.supabase_client import supabase
+from contextlib import contextmanager
 from datetime import datetime
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; the spill file is then only guarded within one process
+    fcntl = None
+
+from backend.utils.db_errors import is_permanent_error
+from backend.utils.metrics import DB_ERRORS, timed
+
+# Write-behind tuning (overridable via environment)
+STORAGE_BATCH_SIZE = int(os.getenv("STORAGE_BATCH_SIZE", "50"))          # Records per bulk insert
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", "2")) # Seconds between time-based flushes
+STORAGE_MAX_QUEUE = int(os.getenv("STORAGE_MAX_QUEUE", "10000"))         # Records held in memory before spilling
+STORAGE_SPILL_PATH = os.getenv(
+    "STORAGE_SPILL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "storage_spill.jsonl")
+)
+STORAGE_SPILL_MAX_BYTES = int(os.getenv("STORAGE_SPILL_MAX_BYTES", str(20 * 1024 * 1024)))
+
+class WriteBehindBuffer:
+    """
+    Buffers records per table and writes them to Supabase as bulk inserts
+    from a background thread, flushing by size or by time.
+    Records that cannot be written for transient reasons (DB down, queue full)
+    go to a bounded local JSONL spill file and are replayed after the next
+    successful flush. A chunk the database rejects is bisected down to the
+    offending records, which are dropped (counted as 'rejected').
+    The spill file may be shared by several worker processes.
+    """
+
+    def __init__(self, client=None, batch_size=STORAGE_BATCH_SIZE, flush_interval=STORAGE_FLUSH_INTERVAL,
+                 max_queue=STORAGE_MAX_QUEUE, spill_path=STORAGE_SPILL_PATH, spill_max_bytes=STORAGE_SPILL_MAX_BYTES):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+
+        self._queues = {}
+        self._depth = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+
+        self.counters = {
+            'enqueued': 0,
+            'written': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'dropped': 0,
+            'rejected': 0,
+        }
+        self.last_flush_seconds = None
+        self.total_flush_seconds = 0.0
+
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        # Start lazily, and again after a fork (e.g. pre-forking servers)
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="storage-write-behind", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, table, record):
+        """
+        Queue one record for a bulk insert into table. Never blocks on the network.
+        """
+        with self._cond:
+            self.counters['enqueued'] += 1
+            if self._depth >= self.max_queue:
+                overflow = True
+            else:
+                overflow = False
+                self._queues.setdefault(table, []).append(record)
+                self._depth += 1
+                if len(self._queues[table]) >= self.batch_size:
+                    self._cond.notify()
+            self._ensure_worker()
+
+        if overflow:
+            self._spill({table: [record]})
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if not any(len(q) >= self.batch_size for q in self._queues.values()):
+                    self._cond.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """
+        Writes everything currently queued as one bulk insert per table (chunked by batch_size).
+        """
+        with self._cond:
+            pending, self._queues, self._depth = self._queues, {}, 0
+        if not pending:
+            return
+
+        with self._flush_lock:
+            start = time.perf_counter()
+            failed = {}
+            for table, records in pending.items():
+                for i in range(0, len(records), self.batch_size):
+                    chunk = records[i:i + self.batch_size]
+                    self._insert(table, chunk, failed, 'written', 'prediction_insert')
+
+            elapsed = time.perf_counter() - start
+            self.counters['flushes'] += 1
+            self.last_flush_seconds = round(elapsed, 4)
+            self.total_flush_seconds += elapsed
+
+            if failed:
+                self.counters['failed_flushes'] += 1
+                self._spill(failed)
+            else:
+                self._replay_spill()
+
+    def _insert(self, table, chunk, failed, counter, error_metric):
+        """
+        Bulk-inserts chunk. If the database rejects it, the chunk is split in
+        halves until the rejected records are isolated; those are dropped.
+        Records that fail for transient reasons are added to failed (to spill).
+        """
+        try:
+            with timed('storage_bulk_insert'):
+                self.client.table(table).insert(chunk).execute()
+            self.counters[counter] += len(chunk)
+            return
+        except Exception as e:
+            DB_ERRORS.inc(error_metric)
+            if not is_permanent_error(e):
+                print(f"Bulk insert into {table} failed: {e}")
+                failed.setdefault(table, []).extend(chunk)
+                return
+            if len(chunk) == 1:
+                print(f"Dropping record rejected by {table}: {e}")
+                self.counters['rejected'] += 1
+                return
+
+        middle = len(chunk) // 2
+        self._insert(table, chunk[:middle], failed, counter, error_metric)
+        self._insert(table, chunk[middle:], failed, counter, error_metric)
+
+    @contextmanager
+    def _spill_file_lock(self):
+        # The thread lock covers this process; flock covers the other workers
+        with self._spill_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.spill_path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _spill(self, records_by_table):
+        """
+        Appends records to the spill file, dropping them once it reaches its size cap.
+        """
+        try:
+            with self._spill_file_lock():
+                size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+                with open(self.spill_path, "a") as f:
+                    for table, records in records_by_table.items():
+                        for record in records:
+                            line = json.dumps({'table': table, 'record': record}, default=str) + "\n"
+                            if size + len(line) > self.spill_max_bytes:
+                                self.counters['dropped'] += 1
+                                continue
+                            f.write(line)
+                            size += len(line)
+                            self.counters['spilled'] += 1
+        except Exception as e:
+            dropped = sum(len(r) for r in records_by_table.values())
+            self.counters['dropped'] += dropped
+            print(f"Error writing storage spill file: {e}")
+
+    def _replay_spill(self):
+        """
+        Re-inserts spilled records after the database is reachable again.
+        Caller holds _flush_lock.
+        """
+        if not os.path.exists(self.spill_path) or os.path.getsize(self.spill_path) == 0:
+            return
+
+        try:
+            # Take the spill over under a name of our own, so another worker
+            # replaying (or spilling) at the same time cannot touch our copy
+            fd, replay_path = tempfile.mkstemp(
+                prefix=os.path.basename(self.spill_path) + ".replay.",
+                dir=os.path.dirname(os.path.abspath(self.spill_path))
+            )
+            os.close(fd)
+            with self._spill_file_lock():
+                if not os.path.exists(self.spill_path):
+                    os.remove(replay_path)
+                    return
+                os.replace(self.spill_path, replay_path)
+            by_table = {}
+            with open(replay_path) as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue
+                    by_table.setdefault(item['table'], []).append(item['record'])
+        except Exception as e:
+            print(f"Error reading storage spill file: {e}")
+            return
+
+        failed = {}
+        for table, records in by_table.items():
+            for i in range(0, len(records), self.batch_size):
+                chunk = records[i:i + self.batch_size]
+                self._insert(table, chunk, failed, 'replayed', 'prediction_replay')
+
+        os.remove(replay_path)
+        if failed:
+            self._spill(failed)
+
+    def stats(self):
+        """
+        Queue depth, flush latency and drop/spill counters.
+        """
+        with self._cond:
+            depth_by_table = {table: len(q) for table, q in self._queues.items()}
+        flushes = self.counters['flushes']
+        spill_bytes = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+        return {
+            'queue_depth': sum(depth_by_table.values()),
+            'queue_depth_by_table': depth_by_table,
+            'last_flush_seconds': self.last_flush_seconds,
+            'avg_flush_seconds': round(self.total_flush_seconds / flushes, 4) if flushes else None,
+            'spill_bytes': spill_bytes,
+            **self.counters,
+        }
+
+    def close(self):
+        """
+        Stops the background thread and flushes (or spills) what is left.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.flush()
+
 
 class PredictionStorageService:
     """
@@ -8,11 +272,16 @@ class PredictionStorageService:
     - Historical record of predictions
     - Input for fertilizer recommendation
     - Foundation for future model improvement
+    
+    Writes go through a WriteBehindBuffer so requests never wait on the database.
     """
+
+    def __init__(self):
+        self.buffer = WriteBehindBuffer(client=supabase) if supabase else None
     
     def store_crop_prediction(self, sensor_data, predicted_crop, confidence, device_id='web_client', location=None, translated_crop=None):
         """
-        Store a crop prediction.
+        Store a crop prediction (queued; written in bulk in the background).
         """
         if not supabase:
             return None
@@ -34,14 +303,8 @@ class PredictionStorageService:
                 'translated_crop': translated_crop
             }
             
-            response = supabase.table('crop_predictions').insert(record).execute()
-            
-            if response.data:
-                print(f"✓ Crop prediction stored: {predicted_crop}")
-                return response.data[0]
-            else:
-                print("✗ Failed to store crop prediction")
-                return None
+            self.buffer.enqueue('crop_predictions', record)
+            return record
                 
         except Exception as e:
             print(f"Error storing crop prediction: {e}")
@@ -49,7 +312,7 @@ class PredictionStorageService:
 
     def store_fertilizer_prediction(self, input_data, recommendation, confidence, reasoning, translated_fertilizer=None):
         """
-        Store a fertilizer prediction.
+        Store a fertilizer prediction (queued; written in bulk in the background).
         """
         if not supabase:
             return None
@@ -71,16 +334,55 @@ class PredictionStorageService:
                 'translated_fertilizer': translated_fertilizer
             }
             
-            response = supabase.table('fertilizer_predictions').insert(record).execute()
-            
-            if response.data:
-                 print(f"✓ Fertilizer prediction stored: {recommendation}")
-                 return response.data[0]
-            return None
+            self.buffer.enqueue('fertilizer_predictions', record)
+            return record
             
         except Exception as e:
             print(f"Error storing fertilizer prediction: {e}")
             return None
+
+    def store_yield_prediction(self, state, district, crop, season, rainfall, fertilizer, pesticide, soil_type, predicted_yield):
+        """
+        Store a yield prediction.
+        """
+        if not supabase:
+            return None
+
+        try:
+            record = {
+                'created_at': datetime.now().isoformat(),
+                'state': state,
+                'district': district,
+                'crop': crop,
+                'season': season,
+                'annual_rainfall': float(rainfall),
+                'fertilizer_usage': float(fertilizer),
+                'pesticide_usage': float(pesticide),
+                'soil_type': soil_type,
+                'predicted_yield': float(predicted_yield) if predicted_yield is not None else None
+            }
+
+            self.buffer.enqueue('yield_predictions', record)
+            return record
+
+        except Exception as e:
+            print(f"Error storing yield prediction: {e}")
+            return None
+
+    def flush(self):
+        """
+        Synchronously write any buffered predictions.
+        """
+        if self.buffer:
+            self.buffer.flush()
+
+    def get_write_stats(self):
+        """
+        Write-behind queue depth, flush latency and drop counters.
+        """
+        if not self.buffer:
+            return {'enabled': False}
+        return {'enabled': True, **self.buffer.stats()}
     
     def get_recent_predictions(self, device_id='pi_01', limit=10):
         """
@@ -0,0 +1,102 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Cache tuning (overridable via environment)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))  # LRU bound
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))                # Seconds a result is reused
+
+# Inputs the pipeline outputs depend on. Values are keyed exactly (numbers as floats,
+# text as given): the models are continuous in every input, the reasoning rules have
+# thresholds and print the input values, and the soil encoder is case-sensitive, so any
+# coarser key could serve another input's results.
+NUMERIC_KEY_FIELDS = (
+    'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall', 'moisture',
+    'fertilizer_usage', 'pesticide_usage',
+)
+TEXT_KEY_FIELDS = ('soil_type', 'state', 'district')
+
+
+class RecommendationCache:
+    """
+    Bounded LRU + TTL cache of recommend pipeline outputs (crop list,
+    fertilizer result, predicted yield), keyed on the exact inputs (canonical
+    form) plus the model version, so a retrained model never serves
+    results computed by the old one.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cache = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'uncacheable': 0,
+            'evictions': 0,
+        }
+
+    @staticmethod
+    def make_key(data, season, model_version, lang=('en', 'en')):
+        """
+        Canonical key for one sample, or None if a numeric field is not a finite number
+        (the pipeline then reports the error).
+        :param lang: (crop_lang, fertilizer_lang) the outputs were rendered in
+        """
+        try:
+            numeric = tuple(
+                None if data.get(field) is None else float(data[field])
+                for field in NUMERIC_KEY_FIELDS
+            )
+        except (TypeError, ValueError):
+            return None
+        if not all(value is None or math.isfinite(value) for value in numeric):
+            return None  # NaN never equals itself, so it could never be a hit
+        text = tuple(data.get(field) if data.get(field) is None else str(data[field]) for field in TEXT_KEY_FIELDS)
+        return (model_version, season, tuple(lang)) + numeric + text
+
+    def get(self, key):
+        if key is None:
+            with self._lock:
+                self.stats['uncacheable'] += 1
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            if entry is not None:
+                del self._cache[key]
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, value):
+        if key is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (value, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def cache_stats(self):
+        """
+        Hit/miss counters, hit rate and current size.
+        """
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'entries': len(self._cache),
+                'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else None,
+                **self.stats,
+            }
@@ -1,52 +1,199 @@
 import requests
 import os
 import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from backend.utils.metrics import MOCK_RESPONSES, timed
+
+# Cache tuning (overridable via environment)
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))              # Seconds a reading is fresh
+WEATHER_CACHE_STALE_TTL = float(os.getenv("WEATHER_CACHE_STALE_TTL", "1800"))  # Extra seconds served stale while refreshing
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "1000"))  # LRU bound (one small dict per city)
+WEATHER_FETCH_WAIT = 6.0  # Seconds a coalesced caller waits for the in-flight fetch (> request timeout)
+
+
+class OpenWeatherBackend:
+    """
+    Fetches current weather from OpenWeatherMap. Raises on any failure.
+    """
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.base_url = "http://api.openweathermap.org/data/2.5/weather"
+
+    def fetch(self, city):
+        params = {
+            'q': city,
+            'appid': self.api_key,
+            'units': 'metric'
+        }
+        response = requests.get(self.base_url, params=params, timeout=5)
+        response.raise_for_status()
+
+        data = response.json()
+        # OpenWeatherMap returns rain in 'rain.1h' or 'rain.3h' mm
+        rainfall = 0
+        if 'rain' in data:
+            rainfall = data['rain'].get('1h', 0)
+
+        return {
+            'temperature': data['main']['temp'],
+            'humidity': data['main']['humidity'],
+            'rainfall': rainfall * 24 # Crude estimate for daily total if raining
+        }
+
+
+class StubWeatherBackend:
+    """
+    Local stand-in for load testing without the network.
+    Deterministic per city, with optional simulated latency (WEATHER_STUB_LATENCY seconds).
+    """
+
+    def __init__(self, latency=None):
+        self.latency = float(os.getenv("WEATHER_STUB_LATENCY", "0")) if latency is None else latency
+
+    def fetch(self, city):
+        if self.latency:
+            time.sleep(self.latency)
+        rng = random.Random(zlib.crc32(city.encode('utf-8')))
+        return {
+            'temperature': round(rng.uniform(25.0, 35.0), 1),
+            'humidity': round(rng.uniform(40.0, 80.0), 1),
+            'rainfall': round(rng.choice([0, 0, 0, 10, 50]), 1)
+        }
+
 
 class WeatherService:
-    def __init__(self):
+    """
+    Current weather per city behind a TTL + LRU cache.
+    Concurrent misses for a city share one upstream fetch (single-flight), and
+    expired entries keep being served while a background refresh runs
+    (stale-while-revalidate).
+    """
+
+    def __init__(self, backend=None, ttl=WEATHER_CACHE_TTL, stale_ttl=WEATHER_CACHE_STALE_TTL,
+                 max_entries=WEATHER_CACHE_MAX_ENTRIES):
         self.api_key = os.getenv("OPENWEATHER_API_KEY")
-        self.base_url = "http://api.openweathermap.org/data/2.5/weather"
+        self.backend = backend or self._default_backend()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+
+        self._cache = OrderedDict()  # city -> (weather, fetched_at)
+        self._inflight = {}          # city -> threading.Event
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'upstream_fetches': 0,
+            'upstream_errors': 0,
+            'evictions': 0,
+        }
+
+    def _default_backend(self):
+        # WEATHER_BACKEND=stub forces the local stub; otherwise use the API when a key is set
+        if os.getenv("WEATHER_BACKEND", "").lower() == "stub":
+            return StubWeatherBackend()
+        if self.api_key:
+            return OpenWeatherBackend(self.api_key)
+        return None
 
     def get_current_weather(self, city="Hyderabad"):
         """
         Fetches current weather for the location.
         Returns dict with temp, humidity, rainfall (estimated).
         """
-        if not self.api_key:
+        if self.backend is None:
             # print("Weather API Key not found. Using Mock.")
+            MOCK_RESPONSES.inc('weather_no_backend')
             return self._mock_weather()
-            
-        try:
-            params = {
-                'q': city, 
-                'appid': self.api_key, 
-                'units': 'metric'
-            }
-            response = requests.get(self.base_url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                # OpenWeatherMap returns rain in 'rain.1h' or 'rain.3h' mm
-                rainfall = 0
-                if 'rain' in data:
-                    rainfall = data['rain'].get('1h', 0)
-                
-                return {
-                    'temperature': data['main']['temp'],
-                    'humidity': data['main']['humidity'],
-                    'rainfall': rainfall * 24 # Crude estimate for daily total if raining
-                }
+
+        key = (city or "Hyderabad").strip().lower()
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                weather, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self._cache.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return dict(weather)
+                if age < self.ttl + self.stale_ttl:
+                    self._cache.move_to_end(key)
+                    self.stats['stale_hits'] += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = threading.Event()
+                        threading.Thread(target=self._refresh, args=(key, city), daemon=True).start()
+                    return dict(weather)
+
+            self.stats['misses'] += 1
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
             else:
-                return self._mock_weather()
+                self.stats['coalesced'] += 1
+
+        if leader:
+            weather = self._refresh(key, city)
+        else:
+            event.wait(WEATHER_FETCH_WAIT)
+            with self._lock:
+                entry = self._cache.get(key)
+            weather = entry[0] if entry is not None else None
+
+        if weather is None:
+            MOCK_RESPONSES.inc('weather_upstream_failed')
+            return self._mock_weather()
+        return dict(weather)
+
+    def _refresh(self, key, city):
+        """
+        Fetches from the backend, stores the result and wakes any waiting callers.
+        Failures are not cached.
+        """
+        weather = None
+        try:
+            with self._lock:
+                self.stats['upstream_fetches'] += 1
+            with timed('weather_upstream_fetch'):
+                weather = self.backend.fetch(city)
         except Exception as e:
             print(f"Weather API Error: {e}")
-            return self._mock_weather()
+            with self._lock:
+                self.stats['upstream_errors'] += 1
+        finally:
+            with self._lock:
+                if weather is not None:
+                    self._cache[key] = (weather, time.monotonic())
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+                        self.stats['evictions'] += 1
+                event = self._inflight.pop(key, None)
+            if event is not None:
+                event.set()
+        return weather
+
+    def cache_stats(self):
+        """
+        Hit/miss counters and current cache size.
+        """
+        with self._lock:
+            return {'entries': len(self._cache), 'inflight': len(self._inflight), **self.stats}
 
     def _mock_weather(self):
         """
         Returns random realistic weather data.
         """
-        return { 
+        return {
             'temperature': round(random.uniform(25.0, 35.0), 1),
             'humidity': round(random.uniform(40.0, 80.0), 1),
             'rainfall': round(random.choice([0, 0, 0, 10, 50]), 1) # Mostly dry, sometimes rain
@@ -0,0 +1,18 @@
+"""
+Classifies database (Supabase/PostgREST) errors, so callers can tell a record
+the database will never accept from a database that is unreachable.
+"""
+
+# Errors the database will give again on retry: SQLSTATE classes 22 (data exception,
+# e.g. numeric overflow), 23 (constraint violation) and 42 (undefined column/table),
+# and PostgREST request (PGRST1xx) and schema (PGRST2xx, e.g. unknown column) errors.
+PERMANENT_ERROR_PREFIXES = ('22', '23', '42', 'PGRST1', 'PGRST2')
+
+
+def is_permanent_error(e):
+    """
+    True if retrying the same insert cannot succeed (bad record, schema mismatch),
+    False for transient failures such as the database being unreachable.
+    """
+    code = str(getattr(e, 'code', None) or '')
+    return code.startswith(PERMANENT_ERROR_PREFIXES)
@@ -1,4 +1,47 @@
 from datetime import datetime
+import math
+import numpy as np
+
+# (precision, scale) of the numeric columns of sensor_readings (database/schema.sql).
+# A value that does not fit fails the insert of the whole batch, so it is rejected up front.
+SENSOR_NUMERIC_COLUMNS = {
+    'temperature': (5, 2),
+    'humidity': (5, 2),
+    'rainfall': (6, 2),
+    'ph': (4, 2),
+    'nitrogen': (6, 2),
+    'phosphorus': (6, 2),
+    'potassium': (6, 2),
+}
+
+
+def _numeric_limit(precision, scale):
+    # Values must round (at `scale` digits) to below this in absolute value
+    return 10.0 ** (precision - scale) - 0.5 * 10.0 ** -scale
+
+
+def _column_error(key):
+    precision, scale = SENSOR_NUMERIC_COLUMNS[key]
+    return f"{key} out of range for NUMERIC({precision},{scale})"
+
+def _meta_error(data):
+    """
+    Checks device_id and timestamp, which the database would reject with the whole batch.
+    Returns an error message, or None if both are usable (a missing value gets the default).
+    """
+    device_id = data.get('device_id')
+    if device_id is not None and (not isinstance(device_id, str) or '\x00' in device_id):
+        return "device_id must be a string"
+
+    timestamp = data.get('timestamp')
+    if timestamp is not None:
+        if not isinstance(timestamp, str):
+            return "timestamp must be an ISO 8601 string"
+        try:
+            datetime.fromisoformat(timestamp)
+        except ValueError:
+            return "timestamp must be an ISO 8601 string"
+    return None
 
 def format_timestamp(dt_obj):
     """
@@ -15,7 +58,11 @@ def validate_sensor_data(data):
     """
     if not isinstance(data, dict):
         return False, "Invalid data format"
-        
+
+    meta_error = _meta_error(data)
+    if meta_error:
+        return False, meta_error
+
     ph = data.get('ph')
     if ph is not None and (ph < 0 or ph > 14):
         return False, "pH out of range (0-14)"
@@ -23,5 +70,77 @@ def validate_sensor_data(data):
     hum = data.get('humidity')
     if hum is not None and (hum < 0 or hum > 100):
         return False, "Humidity out of range (0-100)"
-        
+
+    for key, (precision, scale) in SENSOR_NUMERIC_COLUMNS.items():
+        value = data.get(key)
+        if value is None:
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False, f"{key} is not a number"
+        if not math.isfinite(value) or abs(value) >= _numeric_limit(precision, scale):
+            return False, _column_error(key)
+
     return True, "Valid"
+
+def validate_sensor_batch(readings):
+    """
+    validate_sensor_data for a list of readings.
+    The numeric columns are extracted row by row into arrays, then the range
+    checks run on whole columns; device_id and timestamp are checked per row.
+    Returns a list of (bool, message), one per reading, in input order.
+    """
+    n = len(readings)
+    results = [(True, "Valid")] * n
+
+    def column(key):
+        # NaN for missing values; `bad` flags values that are not numeric
+        values = np.full(n, np.nan)
+        bad = np.zeros(n, dtype=bool)
+        for i, r in enumerate(readings):
+            v = r.get(key) if isinstance(r, dict) else None
+            if v is None:
+                continue
+            try:
+                values[i] = float(v)
+            except (TypeError, ValueError):
+                bad[i] = True
+            if values[i] != values[i]:  # NaN (json accepts it) is not a missing value
+                bad[i] = True
+        return values, bad
+
+    is_dict = np.array([isinstance(r, dict) for r in readings], dtype=bool)
+    meta_errors = [_meta_error(r) if ok else None for r, ok in zip(readings, is_dict)]
+    meta_bad = np.array([e is not None for e in meta_errors], dtype=bool)
+    columns = {key: column(key) for key in SENSOR_NUMERIC_COLUMNS}
+    ph, ph_bad = columns['ph']
+    hum, hum_bad = columns['humidity']
+
+    with np.errstate(invalid='ignore'):
+        ph_out = ph_bad | (ph < 0) | (ph > 14)
+        hum_out = hum_bad | (hum < 0) | (hum > 100)
+        # Per column: 0 fits, 1 not a number, 2 out of range for its NUMERIC type
+        column_errors = {}
+        for key, (values, bad) in columns.items():
+            out = np.isinf(values) | (np.abs(values) >= _numeric_limit(*SENSOR_NUMERIC_COLUMNS[key]))
+            column_errors[key] = np.where(bad, 1, np.where(out, 2, 0))
+    column_bad = np.zeros(n, dtype=bool)
+    for errors in column_errors.values():
+        column_bad |= errors > 0
+
+    # Same precedence as validate_sensor_data: format, device_id/timestamp, pH, humidity, then column ranges
+    for i in np.flatnonzero(~is_dict | meta_bad | ph_out | hum_out | column_bad):
+        if not is_dict[i]:
+            results[i] = (False, "Invalid data format")
+        elif meta_bad[i]:
+            results[i] = (False, meta_errors[i])
+        elif ph_out[i]:
+            results[i] = (False, "pH out of range (0-14)")
+        elif hum_out[i]:
+            results[i] = (False, "Humidity out of range (0-100)")
+        else:
+            key = next(key for key in SENSOR_NUMERIC_COLUMNS if column_errors[key][i])
+            results[i] = (False, f"{key} is not a number" if column_errors[key][i] == 1 else _column_error(key))
+
+    return results
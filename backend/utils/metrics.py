@@ -0,0 +1,400 @@
+"""
+Counters and latency histograms, exported in the Prometheus text format by
+the /metrics route (see app.py).
+
+With METRICS_DIR set (gunicorn.conf.py sets it), each process writes its
+metrics to its own file there (at most every METRICS_SYNC_INTERVAL seconds,
+and when it is scraped), and /metrics sums the files of all workers, so any
+worker can answer a scrape. Files of workers that exited are folded into an
+archive file, so recycled workers do not reset the counters.
+
+Import it as `backend.utils.metrics` everywhere (the ml package does the same
+for the translator), so the API, services and models share one registry.
+
+Usage:
+    with timed('crop_inference'):
+        ...
+    MODEL_FALLBACKS.inc('crop', 'exception')
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; the archive file is then only guarded within one process
+    fcntl = None
+
+# Upper bounds in seconds; covers sub-millisecond model calls up to slow DB writes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_DIR = os.getenv("METRICS_DIR")  # Shared by the workers of one server; unset = this process only
+METRICS_SYNC_INTERVAL = float(os.getenv("METRICS_SYNC_INTERVAL", "1"))  # Seconds between writes of this process's file
+ARCHIVE_FILE = "metrics_exited.json"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _merge(total, snapshot):
+    # Adds one process's {metric name: [[label values], value or histogram series]} to total
+    for name, items in snapshot.items():
+        target = total.setdefault(name, {})
+        for label_values, value in items:
+            key = tuple(label_values)
+            current = target.get(key)
+            if current is None:
+                target[key] = value
+            elif isinstance(value, list):
+                target[key] = [a + b for a, b in zip(current, value)]
+            else:
+                target[key] = current + value
+    return total
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Counter:
+    """
+    Monotonic counter, one series per tuple of label values.
+    """
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(values), count] for values, count in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self, values=None):
+        """
+        :param values: {label values: count} to export instead of this process's (e.g. summed over workers)
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        items = sorted(values.items())
+        for values, count in items:
+            lines.append(f"{self.name}{_label_text(self.labels, values)} {count}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram of durations in seconds, one series per tuple of label values.
+    """
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(values), list(series)] for values, series in self._series.items()]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self, series_by_labels=None):
+        """
+        :param series_by_labels: {label values: series} to export instead of this process's
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        if series_by_labels is None:
+            with self._lock:
+                series_by_labels = {values: list(series) for values, series in self._series.items()}
+        items = sorted(series_by_labels.items())
+        for values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = _label_text(self.labels, values, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _label_text(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class timed:
+    """
+    Context manager that records its block's wall time in a histogram
+    (the stage histogram by default). A plain class rather than a generator,
+    so entering it costs two perf_counter() calls.
+    """
+    __slots__ = ('histogram', 'label_values', 'start')
+
+    def __init__(self, *label_values, histogram=None):
+        self.histogram = histogram or STAGE_SECONDS
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics and gauge collectors that /metrics exports.
+    """
+
+    def __init__(self, shared_dir=METRICS_DIR):
+        self.metrics = []
+        self.collectors = []  # (prefix, help, callable returning a flat dict of numbers)
+        self.shared_dir = shared_dir
+        self._path = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sync_thread = None
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix, help_text, collect):
+        """
+        Exports the numeric values of collect() (e.g. a service's stats()) as
+        gauges named <prefix>_<key>, read only when /metrics is scraped.
+        """
+        self.collectors.append((prefix, help_text, collect))
+
+    def start_sync(self, interval=METRICS_SYNC_INTERVAL):
+        """
+        Starts writing this process's metrics to the shared directory in the
+        background. Called in each new worker (gunicorn post_fork); values
+        inherited from the master are cleared so they are not counted per worker.
+        """
+        if not self.shared_dir:
+            return
+        for metric in self.metrics:
+            metric.reset()
+        self._stop.clear()
+        self._sync_thread = threading.Thread(target=self._sync_loop, args=(interval,), daemon=True)
+        self._sync_thread.start()
+
+    def _sync_loop(self, interval):
+        while not self._stop.wait(interval):
+            self._write()
+
+    def stop_sync(self):
+        """
+        Stops the background writes and folds this process's final values into
+        the archive file (gunicorn worker_exit).
+        """
+        if not self.shared_dir:
+            return
+        self._stop.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join(timeout=5)
+            self._sync_thread = None
+        self._write()
+        with self._archive_lock():
+            self._fold(self._own_path())
+
+    def _own_path(self):
+        # A new file per process (pid plus start time, so a reused pid never overwrites an older file)
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.shared_dir, f"metrics_{self._pid}_{time.time_ns()}.json")
+        return self._path
+
+    def _gauges(self):
+        gauges = []
+        for prefix, help_text, collect in self.collectors:
+            try:
+                values = collect() or {}
+            except Exception as e:
+                print(f"Metrics collector {prefix} failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                gauges.append([f"{prefix}_{key}", f"{help_text} ({key})", value])
+        return gauges
+
+    def _write(self):
+        snapshot = {
+            'pid': os.getpid(),
+            'metrics': {metric.name: metric.snapshot() for metric in self.metrics},
+            'gauges': self._gauges(),
+        }
+        path = self._own_path()
+        try:
+            os.makedirs(self.shared_dir, exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not write metrics file: {e}")
+
+    @contextmanager
+    def _archive_lock(self):
+        # The thread lock covers this process; flock covers the other workers
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.shared_dir, exist_ok=True)
+            with open(os.path.join(self.shared_dir, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _fold(self, path):
+        # Adds a process file to the archive and removes it; call with the archive lock held
+        snapshot = self._load(path)
+        if snapshot is None:
+            return
+        archive_path = os.path.join(self.shared_dir, ARCHIVE_FILE)
+        archive = self._load(archive_path) or {'metrics': {}}
+        total = _merge({}, archive['metrics'])
+        _merge(total, snapshot['metrics'])
+        archive['metrics'] = {
+            name: [[list(values), value] for values, value in items.items()] for name, items in total.items()
+        }
+        try:
+            tmp = f"{archive_path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(archive, f)
+            os.replace(tmp, archive_path)
+            os.remove(path)
+        except OSError as e:
+            print(f"Could not archive metrics file {path}: {e}")
+
+    def _read_shared(self):
+        """
+        Sums the metrics of all processes (live and archived); gauges come only
+        from live processes and keep a pid label.
+        """
+        self._write()
+        own = self._own_path()
+        totals, gauges = {}, []
+        with self._archive_lock():
+            for path in glob.glob(os.path.join(self.shared_dir, "metrics_*.json")):
+                # Files of workers gone without worker_exit (e.g. killed on timeout) go to the archive first
+                snapshot = self._load(path) if path != own else None
+                if snapshot and snapshot.get('pid') is not None and not _pid_alive(snapshot['pid']):
+                    self._fold(path)
+            for path in glob.glob(os.path.join(self.shared_dir, "metrics_*.json")):
+                snapshot = self._load(path)
+                if snapshot is None:
+                    continue
+                _merge(totals, snapshot['metrics'])
+                # The archive has no pid: its gauges are stale
+                if snapshot.get('pid') is not None:
+                    gauges.extend((name, help_text, value, snapshot['pid'])
+                                  for name, help_text, value in snapshot['gauges'])
+        return totals, gauges
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        if self.shared_dir:
+            totals, gauges = self._read_shared()
+        else:
+            totals, gauges = None, [(name, help_text, value, None) for name, help_text, value in self._gauges()]
+
+        for metric in self.metrics:
+            lines.extend(metric.render(totals.get(metric.name, {}) if totals is not None else None))
+        described = set()
+        for name, help_text, value, pid in sorted(gauges, key=lambda g: (g[0], g[3] or 0)):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_label_text(('pid',), (pid,)) if pid is not None else ''} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    'mitti_request_seconds', 'HTTP request latency by endpoint and status', ('endpoint', 'method', 'status')
+)
+STAGE_SECONDS = metrics.histogram(
+    'mitti_stage_seconds', 'Latency of pipeline stages and service calls', ('stage',)
+)
+MODEL_FALLBACKS = metrics.counter(
+    'mitti_model_fallbacks_total', 'Predictions served by a fallback instead of the model', ('model', 'reason')
+)
+MOCK_RESPONSES = metrics.counter(
+    'mitti_mock_responses_total', 'Responses built from mock data (no Supabase or weather backend)', ('path',)
+)
+DB_ERRORS = metrics.counter(
+    'mitti_db_errors_total', 'Failed Supabase operations', ('operation',)
+)
@@ -0,0 +1,118 @@
+"""
+Decoder for the compact binary sensor batch format sent by the Pi collector
+(Content-Type: application/vnd.mitti.readings).
+See raspberry_pi/collector/wire_format.py for the layout and the encoder;
+FIELDS and VERSION must match it.
+"""
+from datetime import datetime, timedelta, timezone
+
+CONTENT_TYPE = 'application/vnd.mitti.readings'
+MAGIC = b'MMR'
+VERSION = 1
+
+# (reading key, decimal places) in schema order, as encoded by the Pi
+FIELDS = (
+    ('temperature', 2),
+    ('humidity', 2),
+    ('rainfall', 2),
+    ('ph', 2),
+    ('nitrogen', 2),
+    ('phosphorus', 2),
+    ('potassium', 2),
+)
+
+FLAG_TZ_AWARE = 1
+EPOCH = datetime(1970, 1, 1)
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def uvarint(self):
+        result = shift = 0
+        while True:
+            if self.pos >= len(self.data):
+                raise ValueError("Truncated payload")
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+            if shift > 70:
+                raise ValueError("Varint too long")
+
+    def svarint(self):
+        value = self.uvarint()
+        return (value >> 1) ^ -(value & 1)
+
+    def take(self, size):
+        if self.pos + size > len(self.data):
+            raise ValueError("Truncated payload")
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+    def bitmap(self, n):
+        bits = self.take((n + 7) // 8)
+        return [bool(bits[i >> 3] & (1 << (i & 7))) for i in range(n)]
+
+
+def decode_readings(data, max_rows=None):
+    """
+    Decodes a payload into reading dicts (only keys that were present).
+    Raises ValueError for malformed input, BatchTooLarge beyond max_rows readings.
+    """
+    reader = _Reader(data)
+    if reader.take(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a readings payload")
+    version = reader.take(1)[0]
+    if version != VERSION:
+        raise ValueError(f"Unsupported readings format version {version}")
+    flags = reader.take(1)[0]
+    tz = timezone(timedelta(minutes=reader.svarint())) if flags & FLAG_TZ_AWARE else None
+    n = reader.uvarint()
+    if max_rows is not None and n > max_rows:
+        raise BatchTooLarge(f"Batch too large (max {max_rows} readings)")
+    if n > len(data) * 8:
+        raise ValueError("Row count does not match payload size")
+
+    readings = [{} for _ in range(n)]
+    devices = [reader.take(reader.uvarint()).decode('utf-8') for _ in range(reader.uvarint())]
+    if devices:
+        for reading in readings:
+            index = reader.uvarint()
+            if index > len(devices):
+                raise ValueError("Bad device index")
+            if index:
+                reading['device_id'] = devices[index - 1]
+
+    present = reader.bitmap(n)
+    previous = 0
+    for reading, flag in zip(readings, present):
+        if flag:
+            previous += reader.svarint()
+            try:
+                dt = EPOCH + timedelta(milliseconds=previous)
+            except OverflowError:
+                raise ValueError("Timestamp out of range")
+            reading['timestamp'] = (dt.replace(tzinfo=tz) if tz else dt).isoformat()
+
+    for key, decimals in FIELDS:
+        scale = 10 ** decimals
+        present = reader.bitmap(n)
+        previous = 0
+        for reading, flag in zip(readings, present):
+            if flag:
+                previous += reader.svarint()
+                reading[key] = previous / scale
+
+    if reader.pos != len(data):
+        raise ValueError("Trailing bytes after readings")
+    return readings
@@ -75,6 +75,99 @@ TRANSLATIONS = {
     }
 }
 
+# Explanation messages (English templates). Reasoning rules in ml/explanations.py
+# emit integer codes for these; text is rendered only when building the response.
+MESSAGES = {
+    # Crop recommendation
+    'crop_high_rainfall': "High rainfall is suitable for this crop.",
+    'crop_low_rainfall': "Suitable for low rainfall conditions.",
+    'crop_warm': "Thrives in warm temperatures.",
+    'crop_ph_optimal': "Soil pH is optimal.",
+    'crop_default': "Matches your soil nutrient profile best.",
+    # Fertilizer recommendation
+    'fert_crop_high_n': "{crop} requires high nitrogen for vegetative growth and tillering",
+    'fert_crop_balanced': "{crop} benefits from balanced NPK nutrition for grain development",
+    'fert_crop_high_k': "{crop} requires adequate potassium for fiber quality and disease resistance",
+    'fert_crop_high_p': "{crop} requires phosphorus for root development and nitrogen fixation",
+    'fert_crop_other': "Fertilizer optimized for {crop} nutrient requirements",
+    'fert_low_n': "Low nitrogen level ({n} mg/kg) detected - nitrogen-rich fertilizer recommended",
+    'fert_ok_n': "Adequate nitrogen level ({n} mg/kg) - balanced fertilizer recommended",
+    'fert_low_p': "Low phosphorus level ({p} mg/kg) - phosphorus supplementation needed",
+    'fert_ok_p': "Sufficient phosphorus level ({p} mg/kg)",
+    'fert_low_k': "Low potassium level ({k} mg/kg) - potassium supplementation recommended",
+    'fert_ok_k': "Adequate potassium level ({k} mg/kg)",
+    'fert_low_moisture': "Low soil moisture - consider water-soluble fertilizers for better uptake",
+    'fert_high_moisture': "High soil moisture - slow-release fertilizers recommended",
+    'fert_sandy': "Sandy soil - frequent, smaller fertilizer applications recommended",
+    'fert_clayey': "Clayey soil - ensure good drainage for optimal nutrient uptake",
+    'fert_default': "Fertilizer recommendation based on soil nutrient analysis and crop requirements",
+    # Rule-based fertilizer fallback
+    'fallback_low_n': "Low Nitrogen ({n} mg/kg). Consider Urea or Ammonium Sulfate",
+    'fallback_low_p': "Low Phosphorus ({p} mg/kg). Consider DAP or SSP",
+    'fallback_low_k': "Low Potassium ({k} mg/kg). Consider MOP",
+    'fallback_balanced': "Soil nutrient levels appear balanced",
+}
+
+# Translated templates; missing entries fall back to English
+MESSAGE_TRANSLATIONS = {
+    'hi': {
+        'crop_high_rainfall': "अधिक वर्षा इस फसल के लिए उपयुक्त है।",
+        'crop_low_rainfall': "कम वर्षा वाली परिस्थितियों के लिए उपयुक्त।",
+        'crop_warm': "गर्म तापमान में अच्छी तरह बढ़ती है।",
+        'crop_ph_optimal': "मिट्टी का pH इष्टतम है।",
+        'crop_default': "आपकी मिट्टी की पोषक प्रोफ़ाइल से सबसे अच्छा मेल खाती है।",
+        'fert_crop_high_n': "{crop} को वानस्पतिक वृद्धि और कल्ले निकलने के लिए अधिक नाइट्रोजन की आवश्यकता होती है",
+        'fert_crop_balanced': "{crop} को दाने के विकास के लिए संतुलित NPK पोषण से लाभ होता है",
+        'fert_crop_high_k': "{crop} को रेशे की गुणवत्ता और रोग प्रतिरोधक क्षमता के लिए पर्याप्त पोटैशियम की आवश्यकता होती है",
+        'fert_crop_high_p': "{crop} को जड़ों के विकास और नाइट्रोजन स्थिरीकरण के लिए फॉस्फोरस की आवश्यकता होती है",
+        'fert_crop_other': "{crop} की पोषक आवश्यकताओं के अनुसार अनुकूलित उर्वरक",
+        'fert_low_n': "कम नाइट्रोजन स्तर ({n} mg/kg) पाया गया - नाइट्रोजन युक्त उर्वरक की सिफारिश की जाती है",
+        'fert_ok_n': "पर्याप्त नाइट्रोजन स्तर ({n} mg/kg) - संतुलित उर्वरक की सिफारिश की जाती है",
+        'fert_low_p': "कम फॉस्फोरस स्तर ({p} mg/kg) - फॉस्फोरस की पूर्ति आवश्यक है",
+        'fert_ok_p': "पर्याप्त फॉस्फोरस स्तर ({p} mg/kg)",
+        'fert_low_k': "कम पोटैशियम स्तर ({k} mg/kg) - पोटैशियम की पूर्ति की सिफारिश की जाती है",
+        'fert_ok_k': "पर्याप्त पोटैशियम स्तर ({k} mg/kg)",
+        'fert_low_moisture': "मिट्टी में नमी कम है - बेहतर अवशोषण के लिए पानी में घुलनशील उर्वरकों पर विचार करें",
+        'fert_high_moisture': "मिट्टी में नमी अधिक है - धीमी गति से घुलने वाले उर्वरकों की सिफारिश की जाती है",
+        'fert_sandy': "रेतीली मिट्टी - बार-बार, कम मात्रा में उर्वरक डालने की सिफारिश की जाती है",
+        'fert_clayey': "चिकनी मिट्टी - पोषक तत्वों के बेहतर अवशोषण के लिए अच्छी जल निकासी सुनिश्चित करें",
+        'fert_default': "मिट्टी के पोषक तत्व विश्लेषण और फसल की आवश्यकताओं पर आधारित उर्वरक सिफारिश",
+        'fallback_low_n': "कम नाइट्रोजन ({n} mg/kg)। यूरिया या अमोनियम सल्फेट पर विचार करें",
+        'fallback_low_p': "कम फॉस्फोरस ({p} mg/kg)। DAP या SSP पर विचार करें",
+        'fallback_low_k': "कम पोटैशियम ({k} mg/kg)। MOP पर विचार करें",
+        'fallback_balanced': "मिट्टी के पोषक तत्वों का स्तर संतुलित प्रतीत होता है",
+    }
+}
+
+# Integer code per message; 0 means "no message"
+MESSAGE_CODES = {key: code for code, key in enumerate(MESSAGES, start=1)}
+
+
+def _compile_messages():
+    """
+    One template table per language, indexed by message code (built once at import).
+    """
+    tables = {}
+    for lang in ['en', *TRANSLATIONS, *MESSAGE_TRANSLATIONS]:
+        translated = MESSAGE_TRANSLATIONS.get(lang, {})
+        tables[lang] = [None] + [translated.get(key, text) for key, text in MESSAGES.items()]
+    return tables
+
+
+COMPILED_MESSAGES = _compile_messages()
+
+
+def render_messages(codes, lang='en', **values):
+    """
+    Renders a row of message codes (zeros skipped) in the given language.
+    `values` fills template fields such as crop, n, p and k.
+    """
+    table = COMPILED_MESSAGES.get(lang, COMPILED_MESSAGES['en'])
+    if values:
+        return [table[code].format(**values) for code in codes if code]
+    return [table[code] for code in codes if code]
+
+
 def translate_text(text, lang='en'):
     if lang == 'en':
         return text
@@ -0,0 +1,10 @@
+"""
+Production entry point: `gunicorn -c gunicorn.conf.py wsgi:app` (run from backend/).
+
+The app (and through create_app's registry warm-up, every model) is built at
+import time, so with preload_app the master loads the models once and the
+forked workers share those pages copy-on-write.
+"""
+from app import create_app
+
+app = create_app()
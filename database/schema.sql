@@ -24,14 +24,225 @@ CREATE TABLE IF NOT EXISTS sensor_readings (
 -- Index for faster time-based queries (e.g., getting latest reading)
 CREATE INDEX IF NOT EXISTS idx_sensor_readings_timestamp ON sensor_readings (timestamp DESC);
 
--- Optional: Create a view for daily averages (if not handled by code)
-CREATE OR REPLACE VIEW daily_averages AS
-SELECT 
-    date_trunc('day', timestamp) as day,
-    AVG(temperature) as avg_temp,
-    AVG(humidity) as avg_humidity,
-    AVG(ph) as avg_ph,
-    SUM(rainfall) as total_rain
-FROM sensor_readings
-GROUP BY 1
-ORDER BY 1 DESC;
+-- Per-device time-range queries (aggregation, reports)
+CREATE INDEX IF NOT EXISTS idx_sensor_readings_device_time ON sensor_readings (device_id, timestamp DESC);
+
+-- Rollups: per-device hourly and daily statistics, maintained on insert.
+-- One row per (device, bucket, metric) with count, sum, sum of squares, min
+-- and max, so means and variances over any window are O(buckets), not O(readings).
+-- The 'readings' metric counts rows (value 1 per reading).
+CREATE TABLE IF NOT EXISTS sensor_rollup_hourly (
+    device_id TEXT NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    metric TEXT NOT NULL,
+    n BIGINT NOT NULL,
+    total NUMERIC NOT NULL,
+    total_sq NUMERIC NOT NULL,
+    min_value NUMERIC,
+    max_value NUMERIC,
+    PRIMARY KEY (device_id, bucket, metric)
+);
+
+CREATE TABLE IF NOT EXISTS sensor_rollup_daily (
+    device_id TEXT NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    metric TEXT NOT NULL,
+    n BIGINT NOT NULL,
+    total NUMERIC NOT NULL,
+    total_sq NUMERIC NOT NULL,
+    min_value NUMERIC,
+    max_value NUMERIC,
+    PRIMARY KEY (device_id, bucket, metric)
+);
+
+-- Folds each inserted batch (one statement, e.g. a bulk insert from /api/sensor/data)
+-- into the hourly rollups, then the daily rollups from the batch's hourly partials
+CREATE OR REPLACE FUNCTION merge_sensor_rollups()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    WITH batch AS (
+        SELECT
+            r.device_id,
+            date_trunc('hour', r.timestamp) AS bucket,
+            m.metric,
+            COUNT(*) AS n,
+            SUM(m.value) AS total,
+            SUM(m.value * m.value) AS total_sq,
+            MIN(m.value) AS min_value,
+            MAX(m.value) AS max_value
+        FROM new_rows r
+        CROSS JOIN LATERAL (VALUES
+            ('readings', 1::NUMERIC),
+            ('temperature', r.temperature),
+            ('humidity', r.humidity),
+            ('rainfall', r.rainfall),
+            ('ph', r.ph),
+            ('nitrogen', r.nitrogen),
+            ('phosphorus', r.phosphorus),
+            ('potassium', r.potassium)
+        ) AS m(metric, value)
+        WHERE m.value IS NOT NULL AND r.timestamp IS NOT NULL
+        GROUP BY 1, 2, 3
+    ),
+    hourly AS (
+        INSERT INTO sensor_rollup_hourly AS t
+        SELECT * FROM batch
+        ON CONFLICT (device_id, bucket, metric) DO UPDATE SET
+            n = t.n + EXCLUDED.n,
+            total = t.total + EXCLUDED.total,
+            total_sq = t.total_sq + EXCLUDED.total_sq,
+            min_value = LEAST(t.min_value, EXCLUDED.min_value),
+            max_value = GREATEST(t.max_value, EXCLUDED.max_value)
+    )
+    INSERT INTO sensor_rollup_daily AS t
+    SELECT device_id, date_trunc('day', bucket), metric,
+           SUM(n), SUM(total), SUM(total_sq), MIN(min_value), MAX(max_value)
+    FROM batch
+    GROUP BY 1, 2, 3
+    ON CONFLICT (device_id, bucket, metric) DO UPDATE SET
+        n = t.n + EXCLUDED.n,
+        total = t.total + EXCLUDED.total,
+        total_sq = t.total_sq + EXCLUDED.total_sq,
+        min_value = LEAST(t.min_value, EXCLUDED.min_value),
+        max_value = GREATEST(t.max_value, EXCLUDED.max_value);
+    RETURN NULL;
+END;
+$$;
+
+-- Rebuilds both rollup tables from sensor_readings (backfill, or repair after
+-- readings were updated or deleted)
+CREATE OR REPLACE FUNCTION rebuild_sensor_rollups()
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE sensor_rollup_hourly, sensor_rollup_daily;
+
+    INSERT INTO sensor_rollup_hourly
+    SELECT
+        r.device_id,
+        date_trunc('hour', r.timestamp),
+        m.metric,
+        COUNT(*),
+        SUM(m.value),
+        SUM(m.value * m.value),
+        MIN(m.value),
+        MAX(m.value)
+    FROM sensor_readings r
+    CROSS JOIN LATERAL (VALUES
+        ('readings', 1::NUMERIC),
+        ('temperature', r.temperature),
+        ('humidity', r.humidity),
+        ('rainfall', r.rainfall),
+        ('ph', r.ph),
+        ('nitrogen', r.nitrogen),
+        ('phosphorus', r.phosphorus),
+        ('potassium', r.potassium)
+    ) AS m(metric, value)
+    WHERE m.value IS NOT NULL AND r.timestamp IS NOT NULL
+    GROUP BY 1, 2, 3;
+
+    INSERT INTO sensor_rollup_daily
+    SELECT device_id, date_trunc('day', bucket), metric,
+           SUM(n), SUM(total), SUM(total_sq), MIN(min_value), MAX(max_value)
+    FROM sensor_rollup_hourly
+    GROUP BY 1, 2, 3;
+END;
+$$;
+
+-- Backfill once, for readings stored before the rollups existed
+SELECT rebuild_sensor_rollups() WHERE NOT EXISTS (SELECT 1 FROM sensor_rollup_hourly);
+
+DROP TRIGGER IF EXISTS trg_sensor_readings_rollup ON sensor_readings;
+CREATE TRIGGER trg_sensor_readings_rollup
+AFTER INSERT ON sensor_readings
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION merge_sensor_rollups();
+
+-- Per-metric statistics for a device over [p_since, p_until], read from the rollups:
+-- hourly buckets for the partial first and last day, daily buckets in between.
+-- Resolution is one hour (the bucket containing p_since is counted whole).
+CREATE OR REPLACE FUNCTION sensor_rollup_stats(p_device_id TEXT, p_since TIMESTAMPTZ, p_until TIMESTAMPTZ DEFAULT NOW())
+RETURNS TABLE (
+    metric TEXT,
+    n BIGINT,
+    mean NUMERIC,
+    stddev NUMERIC,
+    min_value NUMERIC,
+    max_value NUMERIC,
+    total NUMERIC
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH bounds AS (
+        SELECT date_trunc('day', p_since) + INTERVAL '1 day' AS d0,
+               date_trunc('day', p_until) AS d1
+    ),
+    buckets AS (
+        SELECT d.metric, d.n, d.total, d.total_sq, d.min_value, d.max_value
+        FROM sensor_rollup_daily d, bounds b
+        WHERE d.device_id = p_device_id
+          AND d.bucket >= b.d0 AND d.bucket < b.d1
+        UNION ALL
+        SELECT h.metric, h.n, h.total, h.total_sq, h.min_value, h.max_value
+        FROM sensor_rollup_hourly h, bounds b
+        WHERE h.device_id = p_device_id
+          AND h.bucket >= date_trunc('hour', p_since) AND h.bucket <= p_until
+          AND (b.d1 <= b.d0 OR h.bucket < b.d0 OR h.bucket >= b.d1)
+    )
+    SELECT
+        metric,
+        SUM(n)::BIGINT,
+        SUM(total) / SUM(n),
+        CASE WHEN SUM(n) > 1
+             THEN SQRT(GREATEST((SUM(total_sq) - SUM(total) * SUM(total) / SUM(n)) / (SUM(n) - 1), 0))
+        END,
+        MIN(min_value),
+        MAX(max_value),
+        SUM(total)
+    FROM buckets
+    GROUP BY metric;
+$$;
+
+-- Daily averages per device, read from the rollups
+DROP VIEW IF EXISTS daily_averages;
+CREATE VIEW daily_averages AS
+SELECT
+    device_id,
+    bucket AS day,
+    SUM(total) FILTER (WHERE metric = 'temperature') / NULLIF(SUM(n) FILTER (WHERE metric = 'temperature'), 0) AS avg_temp,
+    SUM(total) FILTER (WHERE metric = 'humidity') / NULLIF(SUM(n) FILTER (WHERE metric = 'humidity'), 0) AS avg_humidity,
+    SUM(total) FILTER (WHERE metric = 'ph') / NULLIF(SUM(n) FILTER (WHERE metric = 'ph'), 0) AS avg_ph,
+    SUM(total) FILTER (WHERE metric = 'rainfall') AS total_rain
+FROM sensor_rollup_daily
+GROUP BY device_id, bucket
+ORDER BY bucket DESC;
+
+-- Server-side aggregation for AggregationService (called via supabase.rpc);
+-- returns one row of aggregates, computed from the rollups
+CREATE OR REPLACE FUNCTION sensor_window_aggregate(p_device_id TEXT, p_since TIMESTAMPTZ)
+RETURNS TABLE (
+    readings BIGINT,
+    avg_temperature NUMERIC,
+    avg_humidity NUMERIC,
+    avg_ph NUMERIC,
+    avg_nitrogen NUMERIC,
+    avg_phosphorus NUMERIC,
+    avg_potassium NUMERIC,
+    total_rainfall NUMERIC
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        COALESCE(MAX(n) FILTER (WHERE metric = 'readings'), 0),
+        MAX(mean) FILTER (WHERE metric = 'temperature'),
+        MAX(mean) FILTER (WHERE metric = 'humidity'),
+        MAX(mean) FILTER (WHERE metric = 'ph'),
+        MAX(mean) FILTER (WHERE metric = 'nitrogen'),
+        MAX(mean) FILTER (WHERE metric = 'phosphorus'),
+        MAX(mean) FILTER (WHERE metric = 'potassium'),
+        COALESCE(MAX(total) FILTER (WHERE metric = 'rainfall'), 0)
+    FROM sensor_rollup_stats(p_device_id, p_since);
+$$;
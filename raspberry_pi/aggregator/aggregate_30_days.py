@@ -1,39 +1,180 @@
-import statistics
+import math
+import time
+from datetime import datetime
+
+# Fields to average
+MEAN_KEYS = ['temperature', 'humidity', 'ph', 'nitrogen', 'phosphorus', 'potassium']
+# Fields to sum
+SUM_KEYS = ['rainfall']
+
+
+class RunningStats:
+    """
+    O(1)-memory statistics of a stream of numbers: count, mean and variance
+    (Welford's algorithm, numerically stable) and sum.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'total')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.total += value
+
+    @property
+    def std(self):
+        # Sample standard deviation (n - 1), like the backend rollups
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+
+
+def _number(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+class WindowAggregator:
+    """
+    Streams readings into fixed, clock-aligned windows and returns one summary
+    per window instead of every reading: the mean of each MEAN_KEYS field and
+    the sum of each SUM_KEYS field, i.e. only the fields sensor_readings stores.
+    Optionally, readings that deviate strongly from the current window are
+    returned as they are, so spikes still reach the backend right away. Such a
+    reading is left out of the window, so each reading (and its rainfall) is
+    uploaded exactly once.
+    """
+
+    def __init__(self, window_seconds, anomaly_z=0.0, anomaly_min_delta=None, anomaly_min_count=5,
+                 mean_keys=MEAN_KEYS, sum_keys=SUM_KEYS):
+        """
+        :param window_seconds: window length; windows start at multiples of it (epoch-aligned)
+        :param anomaly_z: z-score above which a reading is an anomaly (0 disables detection)
+        :param anomaly_min_delta: per-field minimum absolute deviation for an anomaly,
+                                  so tiny changes in a near-constant signal are ignored
+        :param anomaly_min_count: readings needed in the window before anomalies are flagged
+        """
+        self.window_seconds = window_seconds
+        self.anomaly_z = anomaly_z
+        self.anomaly_min_delta = anomaly_min_delta or {}
+        self.anomaly_min_count = anomaly_min_count
+        self.mean_keys = list(mean_keys)
+        self.sum_keys = list(sum_keys)
+        self._start = None
+        self._readings = 0
+        self._stats = {}
+        self._extra = {}
+
+    def _open(self, start):
+        self._start = start
+        self._readings = 0
+        self._stats = {key: RunningStats() for key in self.mean_keys + self.sum_keys}
+        self._extra = {}
+
+    def _anomalies(self, values):
+        if self.anomaly_z <= 0:
+            return []
+        flagged = []
+        for key in self.mean_keys:
+            value = values.get(key)
+            stats = self._stats[key]
+            if value is None or stats.count < self.anomaly_min_count:
+                continue
+            deviation = abs(value - stats.mean)
+            if deviation > self.anomaly_z * stats.std and deviation >= self.anomaly_min_delta.get(key, 0.0):
+                flagged.append(key)
+        return flagged
+
+    def add(self, reading, now=None):
+        """
+        Adds one reading. Returns the records to upload now: the summary of a
+        window that just closed and/or the reading itself if it is an anomaly.
+        """
+        now = time.time() if now is None else now
+        start = now - now % self.window_seconds
+        out = []
+        if self._start is not None and start != self._start:
+            summary = self.flush()
+            if summary:
+                out.append(summary)
+        if self._start is None:
+            self._open(start)
+
+        values = {key: _number(reading.get(key)) for key in self._stats}
+        flagged = self._anomalies(values)
+        if flagged:
+            print(f" ! Anomalous reading ({', '.join(flagged)}), uploading it as is.")
+            out.append(dict(reading))
+            return out
+
+        self._readings += 1
+        for key, value in values.items():
+            if value is not None:
+                self._stats[key].add(value)
+        # Non-metric fields (e.g. device_id) are carried over from the latest reading
+        self._extra.update((k, v) for k, v in reading.items() if k not in self._stats and k != 'timestamp')
+        return out
+
+    def flush(self):
+        """
+        Closes the current window and returns its summary (None if it is empty).
+        """
+        if self._start is None or not self._readings:
+            self._start = None
+            return None
+        summary = dict(self._extra)
+        for key in self.mean_keys:
+            stats = self._stats[key]
+            summary[key] = round(stats.mean, 2) if stats.count else None
+        for key in self.sum_keys:
+            stats = self._stats[key]
+            summary[key] = round(stats.total, 2) if stats.count else 0.0
+        summary['timestamp'] = datetime.fromtimestamp(self._start).isoformat()
+        self._start = None
+        return summary
+
 
 def aggregate_data(readings):
     """
     Aggregates a list of sensor reading dictionaries.
     Calculates Mean for Temp, Humidity, pH, NPK.
     Calculates Sum for Rainfall (if present).
-    
+    Single pass with running stats, so any iterable of readings works.
+
     :param readings: List of dicts, e.g. [{'temperature': 25.0, ...}, ...]
     :return: Dict with aggregated values.
     """
-    if not readings:
+    stats = {key: RunningStats() for key in MEAN_KEYS + SUM_KEYS}
+    seen = False
+    for r in readings:
+        seen = True
+        for key, s in stats.items():
+            value = r.get(key)
+            if value is not None:
+                s.add(value)
+    if not seen:
         return None
 
-    # Fields to average
-    mean_keys = ['temperature', 'humidity', 'ph', 'nitrogen', 'phosphorus', 'potassium']
-    # Fields to sum
-    sum_keys = ['rainfall']
-    
     agg = {}
-    
+
     # Calculate Means
-    for key in mean_keys:
-        values = [r.get(key) for r in readings if r.get(key) is not None]
-        if values:
-            agg[key] = round(statistics.mean(values), 2)
-        else:
-            agg[key] = None
-            
+    for key in MEAN_KEYS:
+        agg[key] = round(stats[key].mean, 2) if stats[key].count else None
+
     # Calculate Sums
-    for key in sum_keys:
-        values = [r.get(key) for r in readings if r.get(key) is not None]
-        if values:
-            agg[key] = round(sum(values), 2)
-        else:
-            agg[key] = 0.0
+    for key in SUM_KEYS:
+        agg[key] = round(stats[key].total, 2) if stats[key].count else 0.0
 
     return agg
 
@@ -1,7 +1,9 @@
 import time
 import requests
+import gzip
 import json
 import os
+import random
 import sys
 from datetime import datetime
 
@@ -12,56 +14,292 @@ sys.path.append(parent_dir)
 
 try:
     from sensors.mock_sensor import MockSensorSuite
-    from config.pi_config import API_URL, COLLECTION_INTERVAL
+    from config.pi_config import (
+        API_URL, COLLECTION_INTERVAL, RETRY_DELAY, RETRY_MAX_DELAY,
+        SPOOL_PATH, SPOOL_MAX_ROWS, SPOOL_MAX_BYTES, UPLOAD_BATCH_SIZE, MAX_BATCHES_PER_CYCLE, WIRE_FORMAT,
+        UPLOAD_BISECT_AFTER,
+        SENSOR_INTERVALS, SENSOR_TIMEOUTS, SENSOR_STALE_AFTER, UPLOAD_INTERVAL,
+        AGGREGATE_WINDOW, AGGREGATE_ANOMALY_Z, AGGREGATE_ANOMALY_MIN_DELTA,
+        NPK_MODE, NPK_PORT, NPK_BAUDRATE, NPK_TIMEOUT, NPK_PROBES
+    )
 except ImportError:
     # Fallback if config not yet created or running standalone
     API_URL = "http://localhost:5000/api/sensor-data"
     COLLECTION_INTERVAL = 60 # seconds
+    RETRY_DELAY = 10
+    RETRY_MAX_DELAY = 900
+    SPOOL_PATH = os.path.join(current_dir, "spool.db")
+    SPOOL_MAX_ROWS = 100000
+    SPOOL_MAX_BYTES = 20 * 1024 * 1024
+    UPLOAD_BATCH_SIZE = 500
+    MAX_BATCHES_PER_CYCLE = 20
+    WIRE_FORMAT = "binary"
+    UPLOAD_BISECT_AFTER = 3
+    SENSOR_INTERVALS = {'dht': 10, 'ph': 30, 'npk': 60}
+    SENSOR_TIMEOUTS = {'dht': 5, 'ph': 5, 'npk': 5}
+    SENSOR_STALE_AFTER = 3
+    UPLOAD_INTERVAL = 30
+    AGGREGATE_WINDOW = 0
+    AGGREGATE_ANOMALY_Z = 3.0
+    AGGREGATE_ANOMALY_MIN_DELTA = {}
+    NPK_MODE = "mock"
+    NPK_PORT = "/dev/ttyUSB0"
+    NPK_BAUDRATE = 9600
+    NPK_TIMEOUT = 0.2
+    NPK_PROBES = [{'address': 1, 'profile': 'npk'}]
     from sensors.mock_sensor import MockSensorSuite
 
-def save_locally(data):
+from collector.spool import SensorSpool
+from collector.wire_format import CONTENT_TYPE as WIRE_CONTENT_TYPE, encode_readings
+from collector.scheduler import SamplingScheduler, UploadWorker
+from aggregator.aggregate_30_days import WindowAggregator
+from sensors.npk_sensor import NPKSensor, emulated_bus
+
+
+class SpoolUploader:
+    """
+    Replays spooled readings to the backend in batches over one persistent
+    (keep-alive) session, in the compact binary format or as gzip'd NDJSON.
+    Failed uploads back off exponentially (with jitter) up to RETRY_MAX_DELAY.
+    Server errors (5xx, or a db_error result) only back off: the batch itself
+    is not at fault. A batch the API keeps answering with a client error (4xx)
+    is split in halves until the failing reading is isolated; that reading,
+    like any reading the API marks rejected, is quarantined, so one bad
+    reading cannot block the spool.
+    """
+
+    # Seconds before the binary format is tried again after the API refused it
+    BINARY_RETRY_AFTER = 3600
+
+    def __init__(self, spool, api_url=API_URL, batch_size=UPLOAD_BATCH_SIZE, wire_format=WIRE_FORMAT,
+                 bisect_after=UPLOAD_BISECT_AFTER):
+        self.spool = spool
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.wire_format = wire_format
+        self.bisect_after = bisect_after
+        self.session = requests.Session()
+        self.binary_refused_at = None
+        self.failures = 0
+        self.next_attempt = 0.0
+        # Bisection state: size of the batch being tried, and failures of the current head batch
+        self.probe_size = None
+        self.bisect_end = None
+        self.head_id = None
+        self.head_failures = 0
+
+    def _backoff(self):
+        self.failures += 1
+        delay = min(RETRY_DELAY * (2 ** (self.failures - 1)), RETRY_MAX_DELAY)
+        # Jitter so a fleet of Pis does not retry in lockstep when the server returns
+        delay *= random.uniform(0.5, 1.0)
+        self.next_attempt = time.monotonic() + delay
+        print(f" ! Upload failed, {len(self.spool)} readings spooled. Retrying in {delay:.0f}s.")
+
+    def _encode(self, batch):
+        """
+        Returns (body, headers) for a batch in the configured wire format.
+        """
+        refused = self.binary_refused_at is not None and time.monotonic() - self.binary_refused_at < self.BINARY_RETRY_AFTER
+        if self.wire_format == 'binary' and not refused:
+            try:
+                body = gzip.compress(encode_readings([data for _, data in batch]))
+                return body, {'Content-Type': WIRE_CONTENT_TYPE, 'Content-Encoding': 'gzip'}
+            except ValueError as e:
+                print(f" ! Batch cannot be sent in binary ({e}), using NDJSON.")
+        body = gzip.compress("\n".join(json.dumps(data) for _, data in batch).encode("utf-8"))
+        return body, {'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip'}
+
+    def _send_batch(self, batch):
+        """
+        Uploads one batch. Returns True if it was handled and the next batch may follow.
+        """
+        ids = [row_id for row_id, _ in batch]
+        body, headers = self._encode(batch)
+        try:
+            response = self.session.post(self.api_url, data=body, headers=headers, timeout=15)
+        except requests.exceptions.RequestException as e:
+            print(f" ! Network Error: {e}")
+            return False
+
+        if headers['Content-Type'] == WIRE_CONTENT_TYPE and self._format_refused(response):
+            # Older backend without the binary format: resend as NDJSON, try binary again later
+            self.binary_refused_at = time.monotonic()
+            print(f" ! API did not accept the binary format ({response.status_code}), using NDJSON.")
+            return True
+
+        if response.status_code == 413 and self.batch_size > 1:
+            self.batch_size = max(self.batch_size // 2, 1)
+            print(f" ! Batch too large, reducing to {self.batch_size} readings.")
+            return True
+
+        try:
+            reply = response.json()
+        except ValueError:
+            reply = None
+        if not isinstance(reply, dict):
+            reply = {}
+        results = reply.get('results')
+
+        if response.status_code >= 500 or reply.get('status') == 'db_error':
+            # Server or database down: keep what was stored, back off for the rest
+            print(f" ! API Error {response.status_code}: {response.text[:200]}")
+            if isinstance(results, list):
+                self._ack_results(ids, results)
+            return False
+        if response.status_code not in (200, 201):
+            print(f" ! API Error {response.status_code}: {response.text[:200]}")
+            return self._batch_failed(ids, f"HTTP {response.status_code}")
+
+        # Stored rows are done, rejected ones quarantined; anything else stays spooled
+        if isinstance(results, list):
+            done = self._ack_results(ids, results)
+        else:
+            done = ids
+            self.spool.ack(done)
+        if len(done) < len(ids):
+            return False
+        self.head_id, self.head_failures = None, 0
+        if self.probe_size and ids[-1] >= self.bisect_end:
+            # The failing batch went through after all (e.g. the error was transient)
+            self.probe_size = None
+        print(f" > Uploaded {len(batch)} readings ({len(self.spool)} still spooled).")
+        return True
+
+    @staticmethod
+    def _format_refused(response):
+        # 415, or a 400 that says the content type is not supported (not a bad batch)
+        if response.status_code == 415:
+            return True
+        text = response.text.lower()
+        return (response.status_code == 400 and ('content type' in text or 'content-type' in text)
+                and ('unsupported' in text or 'not supported' in text))
+
+    def _ack_results(self, ids, results):
+        """
+        Acks the stored readings of a per-row results list and quarantines the
+        rejected ones. Returns the ids of both.
+        """
+        stored, rejected = [], {}
+        for r in results:
+            index = r.get('index', -1) if isinstance(r, dict) else -1
+            if not 0 <= index < len(ids):
+                continue
+            if r.get('status') in ('stored', 'mock_stored'):
+                stored.append(ids[index])
+            elif r.get('status') == 'rejected':
+                rejected.setdefault(r.get('error') or 'rejected', []).append(ids[index])
+        self.spool.ack(stored)
+        for reason, rejected_ids in rejected.items():
+            self.spool.quarantine(rejected_ids, reason)
+        if rejected:
+            print(f" ! {sum(map(len, rejected.values()))} readings rejected by the API (quarantined).")
+        return stored + [i for rejected_ids in rejected.values() for i in rejected_ids]
+
+    def _batch_failed(self, ids, reason):
+        """
+        Counts a rejected attempt at the head batch. After bisect_after attempts
+        the batch is split in halves, and from then on every failing half is
+        split again at once until the failing reading is isolated and
+        quarantined. Returns True if the next attempt may follow immediately.
+        """
+        if self.probe_size is None:
+            if ids[0] == self.head_id:
+                self.head_failures += 1
+            else:
+                self.head_id, self.head_failures = ids[0], 1
+            if self.head_failures < self.bisect_after:
+                return False
+            # Probe until we are past the last reading of this batch
+            self.bisect_end = ids[-1]
+
+        self.head_id, self.head_failures = None, 0
+        if len(ids) > 1:
+            self.probe_size = len(ids) // 2
+            print(f" ! Batch keeps failing, retrying in parts of {self.probe_size} readings.")
+        else:
+            self.spool.quarantine(ids, reason)
+            self.probe_size = None
+            print(f" ! Reading {ids[0]} keeps failing ({reason}), moved to quarantine.")
+        return True
+
+    def flush(self):
+        """
+        Drains up to MAX_BATCHES_PER_CYCLE batches unless we are backing off.
+        """
+        if time.monotonic() < self.next_attempt:
+            return
+        for _ in range(MAX_BATCHES_PER_CYCLE):
+            batch = self.spool.peek(min(self.probe_size or self.batch_size, self.batch_size))
+            if not batch:
+                break
+            if not self._send_batch(batch):
+                self._backoff()
+                return
+        self.failures = 0
+        self.next_attempt = 0.0
+
+
+def build_npk_sensor():
     """
-    Saves data to a local CSV file when offline.
+    The RS485 NPK probes (or their emulator), or None to keep the mock sensor.
     """
-    file_path = os.path.join(current_dir, "offline_data.csv")
-    file_exists = os.path.isfile(file_path)
-    
-    with open(file_path, "a") as f:
-        if not file_exists:
-            f.write("timestamp,temperature,humidity,ph,nitrogen,phosphorus,potassium\n")
-        
-        line = f"{data['timestamp']},{data['temperature']},{data['humidity']},{data['ph']},{data['nitrogen']},{data['phosphorus']},{data['potassium']}\n"
-        f.write(line)
-        print("Data saved locally (offline mode).")
+    if NPK_MODE not in ('serial', 'emulator'):
+        return None
+    bus = emulated_bus(NPK_PROBES, NPK_BAUDRATE) if NPK_MODE == 'emulator' else None
+    print(f"Reading {len(NPK_PROBES)} NPK probe(s) over RS485 ({'emulated' if bus else NPK_PORT}).")
+    return NPKSensor(NPK_PORT, probes=NPK_PROBES, baudrate=NPK_BAUDRATE, timeout=NPK_TIMEOUT, bus=bus)
+
+
+def build_scheduler(suite):
+    """
+    One sampler per physical sensor, each at its own rate.
+    """
+    scheduler = SamplingScheduler(suite.FIELDS, stale_after=SENSOR_STALE_AFTER)
+    for name, read in suite.read_groups().items():
+        interval = SENSOR_INTERVALS.get(name, COLLECTION_INTERVAL)
+        scheduler.add(name, read, interval, SENSOR_TIMEOUTS.get(name, interval))
+    return scheduler
+
 
 def collect_loop():
     print(f"Starting Data Collector... Sending to {API_URL}")
-    suite = MockSensorSuite()
-    
-    while True:
-        try:
-            # 1. Read Data
-            data = suite.get_all_data()
-            data['timestamp'] = datetime.now().isoformat()
-            
-            print(f"[{data['timestamp']}] Read: {data}")
+    suite = MockSensorSuite(npk_sensor=build_npk_sensor())
+    spool = SensorSpool(SPOOL_PATH, max_rows=SPOOL_MAX_ROWS, max_bytes=SPOOL_MAX_BYTES)
+    # Readings saved by the old CSV backup were never re-sent; hand them to the spool
+    spool.import_csv(os.path.join(current_dir, "offline_data.csv"))
+    uploader = UploadWorker(SpoolUploader(spool), UPLOAD_INTERVAL)
+    scheduler = build_scheduler(suite)
+    aggregator = None
+    if AGGREGATE_WINDOW > 0:
+        aggregator = WindowAggregator(AGGREGATE_WINDOW, AGGREGATE_ANOMALY_Z, AGGREGATE_ANOMALY_MIN_DELTA)
+        print(f"Aggregating readings into {AGGREGATE_WINDOW}s windows.")
 
-            # 2. Send to Backend
-            try:
-                response = requests.post(API_URL, json=data, timeout=5)
-                if response.status_code == 201 or response.status_code == 200:
-                    print(" > Sent to API successfully.")
-                else:
-                    print(f" ! API Error {response.status_code}: {response.text}")
-                    save_locally(data)
-            except requests.exceptions.RequestException as e:
-                print(f" ! Network Error: {e}")
-                save_locally(data)
-
-        except Exception as e:
-            print(f" ! Critical Error: {e}")
-        
-        time.sleep(COLLECTION_INTERVAL)
+    def emit(data):
+        # 1. Combined reading from the latest value of each sensor
+        data['timestamp'] = datetime.now().isoformat()
+        print(f"[{data['timestamp']}] Read: {data}")
+
+        # 2. With aggregation on, only closed-window summaries and anomalies are uploaded
+        records = aggregator.add(data) if aggregator else [data]
+
+        # 3. Spool first (committed to disk); the upload thread drains the backlog in batches
+        if records:
+            spool.extend(records)
+            uploader.notify()
+
+    scheduler.start()
+    uploader.start()
+    try:
+        scheduler.wait_ready(max(SENSOR_TIMEOUTS.values(), default=0))
+        scheduler.run(COLLECTION_INTERVAL, emit)
+    finally:
+        scheduler.stop()
+        uploader.stop()
+        # Keep the partial window rather than losing it on shutdown
+        summary = aggregator.flush() if aggregator else None
+        if summary:
+            spool.append(summary)
 
 if __name__ == "__main__":
     collect_loop()
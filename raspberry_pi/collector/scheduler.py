@@ -0,0 +1,209 @@
+import threading
+import time
+
+
+class SensorSampler:
+    """
+    Samples one sensor (or a group sharing a bus/pin) on its own thread at its
+    own rate and keeps the latest good value.
+    Each read runs on a short-lived daemon thread so it can be abandoned after
+    `timeout` seconds; a read that is still stuck when the next one is due is
+    not started twice.
+    """
+
+    def __init__(self, name, read, interval, timeout):
+        """
+        :param read: callable returning a dict of reading fields, or None on failure
+        :param interval: seconds between reads
+        :param timeout: seconds to wait for one read
+        """
+        self.name = name
+        self.read = read
+        self.interval = interval
+        self.timeout = timeout
+
+        self.latest = None
+        self.updated_at = None  # time.monotonic() of the latest good read
+        self.stats = {'reads': 0, 'failures': 0, 'timeouts': 0, 'skipped': 0}
+        self._lock = threading.Lock()
+        self._reader = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"sampler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        next_due = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            # Schedule from the previous due time, not from "now", so read time does not accumulate
+            next_due += self.interval
+            now = time.monotonic()
+            if next_due < now:
+                missed = int((now - next_due) // self.interval) + 1
+                next_due += missed * self.interval
+            self._stop.wait(next_due - now)
+
+    def _read_into(self, box):
+        try:
+            box['value'] = self.read()
+        except Exception as e:
+            box['error'] = e
+
+    def sample(self):
+        """
+        Performs one read (waiting at most `timeout`) and stores it if it succeeded.
+        """
+        if self._reader is not None and self._reader.is_alive():
+            self.stats['skipped'] += 1
+            return
+        box = {}
+        self._reader = threading.Thread(target=self._read_into, args=(box,), name=f"read-{self.name}", daemon=True)
+        self._reader.start()
+        self._reader.join(self.timeout)
+        self.stats['reads'] += 1
+
+        if self._reader.is_alive():
+            self.stats['timeouts'] += 1
+            print(f" ! {self.name} read timed out after {self.timeout}s")
+            return
+        if 'error' in box:
+            self.stats['failures'] += 1
+            print(f" ! {self.name} read failed: {box['error']}")
+            return
+        if box.get('value') is None:
+            self.stats['failures'] += 1
+            return
+        with self._lock:
+            self.latest = box['value']
+            self.updated_at = time.monotonic()
+
+    def current(self, max_age):
+        """
+        Latest value, or None if there is none younger than `max_age` seconds.
+        """
+        with self._lock:
+            if self.updated_at is None or time.monotonic() - self.updated_at > max_age:
+                return None
+            return self.latest
+
+
+class SamplingScheduler:
+    """
+    Runs one SensorSampler per sensor and emits a combined reading (the latest
+    value of every sensor) on a fixed, drift-free clock, independent of how long
+    the individual reads take.
+    """
+
+    def __init__(self, fields, stale_after=3):
+        """
+        :param fields: reading keys every combined reading carries (None when unavailable)
+        :param stale_after: a sensor value older than this many of its intervals is dropped
+        """
+        self.fields = list(fields)
+        self.stale_after = stale_after
+        self.samplers = []
+        self.missed_ticks = 0
+        self._stop = threading.Event()
+
+    def add(self, name, read, interval, timeout):
+        sampler = SensorSampler(name, read, interval, timeout)
+        self.samplers.append(sampler)
+        return sampler
+
+    def start(self):
+        for sampler in self.samplers:
+            sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        for sampler in self.samplers:
+            sampler.stop()
+
+    def wait_ready(self, timeout):
+        """
+        Waits (up to `timeout` seconds) until every sensor has a first value.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not self._stop.is_set():
+            if all(s.updated_at is not None for s in self.samplers):
+                return True
+            self._stop.wait(0.1)
+        return False
+
+    def snapshot(self):
+        """
+        Combined reading from the latest fresh value of each sensor.
+        """
+        reading = dict.fromkeys(self.fields)
+        for sampler in self.samplers:
+            value = sampler.current(sampler.interval * self.stale_after)
+            if value:
+                reading.update(value)
+        return reading
+
+    def run(self, interval, emit):
+        """
+        Calls emit(reading) every `interval` seconds until stop().
+        Ticks are scheduled on a monotonic clock from the start time; if emit
+        overruns, the missed ticks are skipped instead of bunching up.
+        """
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                emit(self.snapshot())
+            except Exception as e:
+                print(f" ! Critical Error: {e}")
+            next_tick += interval
+            now = time.monotonic()
+            if next_tick < now:
+                missed = int((now - next_tick) // interval) + 1
+                self.missed_ticks += missed
+                next_tick += missed * interval
+                print(f" ! Collector fell behind, skipped {missed} reading(s).")
+            self._stop.wait(next_tick - now)
+
+    def sensor_stats(self):
+        return {s.name: dict(s.stats, age=None if s.updated_at is None else round(time.monotonic() - s.updated_at, 1))
+                for s in self.samplers}
+
+
+class UploadWorker:
+    """
+    Drains the spool on its own thread, so a slow or failing upload never
+    delays sampling. Wakes on notify() (a new reading) or every `interval` seconds.
+    """
+
+    def __init__(self, uploader, interval):
+        self.uploader = uploader
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="spool-uploader", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.uploader.flush()
+            except Exception as e:
+                print(f" ! Upload worker error: {e}")
@@ -0,0 +1,185 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SensorSpool:
+    """
+    Durable store-and-forward queue for sensor readings.
+    Backed by SQLite in WAL mode with synchronous=FULL, so a committed reading
+    survives power loss. Readings are replayed oldest-first and disk usage is
+    capped by evicting the oldest readings. Readings the backend keeps failing
+    on can be moved to a bounded quarantine table so they stop blocking the queue.
+    Safe to share between the collector and upload threads.
+    """
+
+    def __init__(self, path, max_rows=100000, max_bytes=20 * 1024 * 1024, max_quarantine=1000):
+        self.path = path
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_quarantine = max_quarantine
+
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS readings ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS quarantine ("
+            " id INTEGER PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " quarantined_at REAL NOT NULL,"
+            " reason TEXT)"
+        )
+        self.evicted = 0
+        self._rows, self._bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM readings"
+        ).fetchone()
+
+    def append(self, data):
+        """
+        Stores one reading and commits it before returning.
+        """
+        return self.extend([data])
+
+    def extend(self, readings):
+        """
+        Stores several readings in one transaction.
+        """
+        rows = [(json.dumps(r), time.time()) for r in readings]
+        if not rows:
+            return 0
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany("INSERT INTO readings (payload, created_at) VALUES (?, ?)", rows)
+            self._rows += len(rows)
+            self._bytes += sum(len(p) for p, _ in rows)
+            self._enforce_limits()
+        return len(rows)
+
+    def peek(self, limit):
+        """
+        Returns up to `limit` of the oldest readings as (id, data) pairs.
+        """
+        with self._lock:
+            rows = self.conn.execute("SELECT id, payload FROM readings ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def ack(self, ids):
+        """
+        Removes readings that were delivered (or permanently rejected).
+        """
+        if not ids:
+            return
+        ids = list(ids)
+        removed_rows = removed_bytes = 0
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    marks = ",".join("?" * len(chunk))
+                    removed_bytes += self.conn.execute(
+                        f"SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM readings WHERE id IN ({marks})", chunk
+                    ).fetchone()[0]
+                    removed_rows += self.conn.execute(f"DELETE FROM readings WHERE id IN ({marks})", chunk).rowcount
+            self._rows -= removed_rows
+            self._bytes -= removed_bytes
+
+    def quarantine(self, ids, reason=None):
+        """
+        Moves readings the backend cannot store out of the queue, keeping the
+        newest max_quarantine of them for inspection.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                removed_bytes = self.conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM readings WHERE id IN ({marks})", ids
+                ).fetchone()[0]
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO quarantine (id, payload, created_at, quarantined_at, reason)"
+                    f" SELECT id, payload, created_at, ?, ? FROM readings WHERE id IN ({marks})",
+                    [time.time(), reason] + ids
+                )
+                removed_rows = self.conn.execute(f"DELETE FROM readings WHERE id IN ({marks})", ids).rowcount
+                self.conn.execute(
+                    "DELETE FROM quarantine WHERE id NOT IN"
+                    " (SELECT id FROM quarantine ORDER BY id DESC LIMIT ?)", (self.max_quarantine,)
+                )
+            self._rows -= removed_rows
+            self._bytes -= removed_bytes
+
+    def quarantined(self):
+        """
+        Number of readings in quarantine.
+        """
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM quarantine").fetchone()[0]
+
+    def _enforce_limits(self):
+        # Oldest-first eviction once the spool is over its row or byte cap
+        evicted = 0
+        while self._rows > self.max_rows or self._bytes > self.max_bytes:
+            avg_bytes = max(self._bytes // max(self._rows, 1), 1)
+            excess = max(self._rows - self.max_rows, -(-(self._bytes - self.max_bytes) // avg_bytes), 1)
+            victims = self.conn.execute(
+                "SELECT id, LENGTH(payload) FROM readings ORDER BY id LIMIT ?", (excess,)
+            ).fetchall()
+            if not victims:
+                break
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute("DELETE FROM readings WHERE id <= ?", (victims[-1][0],))
+            self._rows -= len(victims)
+            self._bytes -= sum(size for _, size in victims)
+            evicted += len(victims)
+        if evicted:
+            self.evicted += evicted
+            print(f" ! Spool full, evicted {evicted} oldest readings.")
+
+    def import_csv(self, csv_path):
+        """
+        One-time migration of the old offline_data.csv backup into the spool.
+        The file is renamed afterwards so it is not imported twice.
+        """
+        if not os.path.isfile(csv_path):
+            return 0
+        readings = []
+        with open(csv_path, newline="") as f:
+            for row in csv.DictReader(f):
+                reading = {}
+                for key, value in row.items():
+                    if key == 'timestamp':
+                        reading[key] = value
+                    else:
+                        try:
+                            reading[key] = float(value)
+                        except (TypeError, ValueError):
+                            reading[key] = None
+                readings.append(reading)
+        count = self.extend(readings)
+        os.replace(csv_path, csv_path + ".imported")
+        print(f"Imported {count} offline readings from {os.path.basename(csv_path)} into the spool.")
+        return count
+
+    def __len__(self):
+        return self._rows
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,148 @@
+"""
+Compact binary encoding for batches of sensor readings
+(Content-Type: application/vnd.mitti.readings).
+
+Layout, version 1 (all integers are LEB128 varints; signed ones zigzag-encoded):
+
+    b'MMR' | version (1 byte) | flags (1 byte) | [tz offset minutes, if flags & 1]
+    row count
+    device dictionary: count, then (length, UTF-8 bytes) per device id
+    device column (only if the dictionary is not empty): index + 1 per row, 0 = none
+    timestamp column: presence bitmap, then per present row the delta (signed)
+                      from the previous timestamp, in milliseconds since 1970-01-01
+    one column per FIELDS entry: presence bitmap, then per present row the delta
+                      (signed) from the previous value, as a fixed-point integer
+
+Values are quantized to the precision of their sensor_readings column
+(database/schema.sql, all NUMERIC(x, 2)), so nothing the database would keep is lost.
+A reading with any other (non-None) key cannot be carried: encode_readings
+raises ValueError and the batch goes out as JSON instead.
+The backend decodes this format in
+backend/utils/sensor_wire.py; changing FIELDS there and here means a new VERSION.
+"""
+from datetime import datetime, timedelta
+
+CONTENT_TYPE = 'application/vnd.mitti.readings'
+MAGIC = b'MMR'
+VERSION = 1
+
+# (reading key, decimal places) in schema order
+FIELDS = (
+    ('temperature', 2),
+    ('humidity', 2),
+    ('rainfall', 2),
+    ('ph', 2),
+    ('nitrogen', 2),
+    ('phosphorus', 2),
+    ('potassium', 2),
+)
+
+# Keys a reading may have besides FIELDS
+META_KEYS = ('timestamp', 'device_id')
+CARRIED_KEYS = frozenset(META_KEYS + tuple(key for key, _ in FIELDS))
+
+FLAG_TZ_AWARE = 1
+EPOCH = datetime(1970, 1, 1)
+
+
+def _put_uvarint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _put_svarint(out, value):
+    _put_uvarint(out, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _put_bitmap(out, present):
+    bits = bytearray((len(present) + 7) // 8)
+    for i, flag in enumerate(present):
+        if flag:
+            bits[i >> 3] |= 1 << (i & 7)
+    out += bits
+
+
+def _timestamps(readings):
+    """
+    Milliseconds of each timestamp (None if missing) and the common UTC offset
+    in minutes (None for naive timestamps). Mixed offsets raise ValueError.
+    """
+    values, offsets = [], set()
+    for r in readings:
+        ts = r.get('timestamp')
+        if ts is None:
+            values.append(None)
+            continue
+        dt = datetime.fromisoformat(ts) if isinstance(ts, str) else ts
+        offset = dt.utcoffset()
+        offsets.add(None if offset is None else int(offset.total_seconds() // 60))
+        wall = dt.replace(tzinfo=None)
+        values.append((wall - EPOCH) // timedelta(milliseconds=1))
+    if len(offsets) > 1:
+        raise ValueError("Readings mix timestamp offsets")
+    return values, (offsets.pop() if offsets else None)
+
+
+def encode_readings(readings):
+    """
+    Encodes a list of reading dicts. Raises ValueError for data this format
+    cannot carry (keys outside CARRIED_KEYS, non-numeric fields, unparseable
+    or mixed-offset timestamps); the caller then sends JSON instead.
+    """
+    for r in readings:
+        extra = sorted(key for key, value in r.items() if key not in CARRIED_KEYS and value is not None)
+        if extra:
+            raise ValueError(f"Cannot encode keys {', '.join(extra)}")
+
+    n = len(readings)
+    timestamps, tz_minutes = _timestamps(readings)
+
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    out.append(FLAG_TZ_AWARE if tz_minutes is not None else 0)
+    if tz_minutes is not None:
+        _put_svarint(out, tz_minutes)
+    _put_uvarint(out, n)
+
+    devices = {}
+    device_column = []
+    for r in readings:
+        device = r.get('device_id')
+        if device is None:
+            device_column.append(0)
+        else:
+            device_column.append(devices.setdefault(str(device), len(devices)) + 1)
+    _put_uvarint(out, len(devices))
+    for device in devices:
+        raw = device.encode('utf-8')
+        _put_uvarint(out, len(raw))
+        out += raw
+    if devices:
+        for index in device_column:
+            _put_uvarint(out, index)
+
+    columns = [timestamps]
+    for key, decimals in FIELDS:
+        scale = 10 ** decimals
+        column = []
+        for r in readings:
+            value = r.get(key)
+            if value is None:
+                column.append(None)
+                continue
+            try:
+                column.append(int(round(float(value) * scale)))
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f"Cannot encode {key}={value!r}")
+        columns.append(column)
+
+    for column in columns:
+        _put_bitmap(out, [v is not None for v in column])
+        previous = 0
+        for value in column:
+            if value is not None:
+                _put_svarint(out, value - previous)
+                previous = value
+    return bytes(out)
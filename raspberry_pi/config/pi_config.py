@@ -8,6 +8,31 @@ API_URL = f"{API_BASE_URL}/sensor/data"
 # Data Collection Configuration
 COLLECTION_INTERVAL = 60  # Seconds between readings
 RETRY_DELAY = 10         # Seconds to wait before retrying failed request
+RETRY_MAX_DELAY = 900    # Cap for the exponential backoff between upload attempts
+
+# Per-sensor sampling (collector/scheduler.py); readings are still emitted every COLLECTION_INTERVAL
+SENSOR_INTERVALS = {'dht': 10, 'ph': 30, 'npk': 60}  # Seconds between reads of each sensor
+SENSOR_TIMEOUTS = {'dht': 5, 'ph': 5, 'npk': 5}      # Seconds a single read may take
+SENSOR_STALE_AFTER = 3   # A value older than this many of its sensor's intervals is sent as missing
+UPLOAD_INTERVAL = 30     # Seconds between upload attempts when no new reading arrives
+
+# On-device aggregation (aggregator/aggregate_30_days.py). With a window set, only one
+# summary per window (means, rainfall sum) plus anomalous readings are uploaded
+# instead of every reading. 0 uploads every reading.
+AGGREGATE_WINDOW = int(os.getenv("AGGREGATE_WINDOW", "0"))        # Seconds, e.g. 900; divides an hour
+AGGREGATE_ANOMALY_Z = float(os.getenv("AGGREGATE_ANOMALY_Z", "3"))  # 0 disables anomaly uploads
+AGGREGATE_ANOMALY_MIN_DELTA = {'temperature': 2.0, 'humidity': 5.0, 'ph': 0.3,
+                               'nitrogen': 10.0, 'phosphorus': 5.0, 'potassium': 10.0}
+
+# Store-and-forward spool (SQLite, survives power loss)
+SPOOL_PATH = os.getenv("SPOOL_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "collector", "spool.db"))
+SPOOL_MAX_ROWS = 100000             # Oldest readings are evicted beyond this
+SPOOL_MAX_BYTES = 20 * 1024 * 1024  # ... or beyond this much payload
+UPLOAD_BATCH_SIZE = 500             # Readings per upload request
+WIRE_FORMAT = os.getenv("WIRE_FORMAT", "binary")  # 'binary' (collector/wire_format.py) or 'ndjson'
+MAX_BATCHES_PER_CYCLE = 20          # Upload requests per collection cycle when draining a backlog
+UPLOAD_BISECT_AFTER = 3             # 4xx answers to the same batch before it is split in halves;
+                                    # a single reading that keeps failing is moved to the spool's quarantine
 
 # Sensor Hardware Configuration (GPIO BCM)
 DHT_PIN = 4
@@ -15,3 +40,11 @@ DHT_TYPE = 11  # 11 for DHT11, 22 for DHT22
 
 # ADC / SPI Config (for pH, NPK if using analog)
 ADC_CHANNEL_PH = 0
+
+# RS485 Modbus NPK probes (sensors/npk_sensor.py)
+NPK_MODE = os.getenv("NPK_MODE", "mock")  # 'mock', 'serial' (real probes) or 'emulator' (no hardware)
+NPK_PORT = os.getenv("NPK_PORT", "/dev/ttyUSB0")
+NPK_BAUDRATE = 9600
+NPK_TIMEOUT = 0.2  # Seconds to wait for each probe's answer
+# One entry per probe on the bus; profile 'npk' (N, P, K) or '7in1' (adds moisture, temperature, EC, pH)
+NPK_PROBES = [{'address': 1, 'profile': 'npk'}]
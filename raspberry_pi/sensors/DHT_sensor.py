@@ -9,22 +9,32 @@ try:
 except ImportError:
     HAS_HARDWARE = False
 
+# Fastest the sensors can be sampled (seconds); reading sooner returns stale data or fails
+MIN_INTERVALS = {11: 1.0, 22: 2.0}
+
 
 class DHTSensor:
-    def __init__(self, pin=4, sensor_type=11, is_mock=False):
+    def __init__(self, pin=4, sensor_type=11, is_mock=False, retries=15):
         """
         Initialize the DHT sensor.
 
         :param pin: GPIO pin number (BCM mode).
         :param sensor_type: DHT sensor type (11 or 22).
         :param is_mock: Force mock readings if True.
+        :param retries: Attempts per read (2 s apart). The library default of 15
+                        can block for 30 s; use a low value behind a CachedSensor.
         """
         self.pin = pin
+        self.retries = retries
+        self.min_interval = MIN_INTERVALS.get(sensor_type, 2.0)
 
         # Select correct DHT sensor model
-        self.sensor_type = (
-            Adafruit_DHT.DHT11 if sensor_type == 11 else Adafruit_DHT.DHT22
-        )
+        if HAS_HARDWARE:
+            self.sensor_type = (
+                Adafruit_DHT.DHT11 if sensor_type == 11 else Adafruit_DHT.DHT22
+            )
+        else:
+            self.sensor_type = None
 
         # Use mock mode if forced OR if hardware library is unavailable
         self.is_mock = is_mock or not HAS_HARDWARE
@@ -43,7 +53,7 @@ class DHTSensor:
         try:
             # Read both humidity and temperature in a single call
             humidity, temperature = Adafruit_DHT.read_retry(
-                self.sensor_type, self.pin
+                self.sensor_type, self.pin, retries=self.retries
             )
 
             # Validate the sensor readings
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import deque
+
+
+class CachedSensor:
+    """
+    Wraps any sensor with a read() method so several consumers can share one
+    physical sensor:
+    - the sensor is read at most once per `min_interval` seconds (DHT11: 1 s,
+      DHT22: 2 s); faster callers get the cached value;
+    - while one caller is reading, the others get the cached value at once
+      instead of waiting on the sensor;
+    - a failed read serves the last good value (if not older than `max_age`);
+    - failure rate and read latency are tracked per sensor.
+    """
+
+    def __init__(self, sensor, min_interval=None, max_age=None, name=None, latency_window=100):
+        """
+        :param sensor: object with read() returning a value or None on failure
+        :param min_interval: seconds between physical reads (default: sensor.min_interval, else 0)
+        :param max_age: oldest cached value (seconds) read() may return; None = no limit
+        :param latency_window: number of recent reads the latency stats cover
+        """
+        self.sensor = sensor
+        self.min_interval = getattr(sensor, 'min_interval', 0.0) if min_interval is None else min_interval
+        self.max_age = max_age
+        self.name = name or type(sensor).__name__
+
+        self.value = None
+        self.updated_at = None   # time.monotonic() of the last good read
+        self.attempted_at = None
+        self._reading = threading.Lock()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._stats = {'reads': 0, 'failures': 0, 'cache_hits': 0, 'busy_hits': 0}
+        self.last_error = None
+
+    def _cached(self, now):
+        if self.updated_at is None:
+            return None, None
+        age = now - self.updated_at
+        if self.max_age is not None and age > self.max_age:
+            return None, age
+        return self.value, age
+
+    def read_with_age(self):
+        """
+        Returns (value, age in seconds); (None, None) before the first good read.
+        Reads the sensor only if `min_interval` has passed and no other caller is reading it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.attempted_at is not None and now - self.attempted_at < self.min_interval:
+                self._stats['cache_hits'] += 1
+                return self._cached(now)
+
+        if not self._reading.acquire(blocking=False):
+            with self._lock:
+                self._stats['busy_hits'] += 1
+                return self._cached(time.monotonic())
+
+        try:
+            with self._lock:
+                # Another caller may have finished a read while we were acquiring
+                now = time.monotonic()
+                if self.attempted_at is not None and now - self.attempted_at < self.min_interval:
+                    self._stats['cache_hits'] += 1
+                    return self._cached(now)
+                self.attempted_at = now
+
+            started = time.perf_counter()
+            error = None
+            try:
+                value = self.sensor.read()
+            except Exception as e:
+                value, error = None, str(e)
+            latency = time.perf_counter() - started
+
+            with self._lock:
+                self._stats['reads'] += 1
+                self._latencies.append(latency)
+                if value is None:
+                    self._stats['failures'] += 1
+                    self.last_error = error or 'no value'
+                else:
+                    self.value = value
+                    self.updated_at = time.monotonic()
+                return self._cached(time.monotonic())
+        finally:
+            self._reading.release()
+
+    def read(self):
+        """
+        Drop-in for the wrapped sensor's read().
+        """
+        return self.read_with_age()[0]
+
+    def stats(self):
+        """
+        Read counts, failure rate, value age and read latency (ms) over the recent reads.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            reads = self._stats['reads']
+            stats = dict(self._stats)
+            stats['failure_rate'] = round(self._stats['failures'] / reads, 4) if reads else None
+            stats['age'] = None if self.updated_at is None else round(time.monotonic() - self.updated_at, 2)
+            stats['last_error'] = self.last_error
+        if latencies:
+            stats['latency_ms'] = {
+                'mean': round(1000 * sum(latencies) / len(latencies), 2),
+                'p50': round(1000 * latencies[len(latencies) // 2], 2),
+                'p95': round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+                'max': round(1000 * latencies[-1], 2),
+            }
+        else:
+            stats['latency_ms'] = None
+        return stats
+
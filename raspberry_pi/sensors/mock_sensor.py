@@ -6,8 +6,8 @@ if current_dir not in sys.path:
     sys.path.append(current_dir)
 
 try:
-    from temperature_sensor import TemperatureSensor
-    from humidity_sensor import HumiditySensor
+    from cached_sensor import CachedSensor
+    from DHT_sensor import DHTSensor
     from ph_sensor import PHSensor
     from npk_sensor import NPKSensor
 except ImportError as e:
@@ -16,29 +16,81 @@ except ImportError as e:
     raise e
 
 class MockSensorSuite:
-    def __init__(self):
+    # Keys of a combined reading
+    FIELDS = ('temperature', 'humidity', 'ph', 'nitrogen', 'phosphorus', 'potassium')
+
+    def __init__(self, npk_sensor=None, max_age=5.0):
         """
         Initializes a suite of sensors in mock mode.
+        Each sensor sits behind a CachedSensor, so any number of consumers can
+        read the suite without exceeding a sensor's minimum interval or waiting
+        on a read in progress.
+        :param npk_sensor: NPKSensor to use instead of a mock one (e.g. the RS485 probes)
+        :param max_age: Seconds a cached value may be served for; older counts as a failed read
         """
-        self.temp_sensor = TemperatureSensor(is_mock=True)
-        self.hum_sensor = HumiditySensor(is_mock=True)
-        self.ph_sensor = PHSensor(is_mock=True)
-        self.npk_sensor = NPKSensor(is_mock=True)
+        # One read gives both temperature and humidity; a single attempt per read,
+        # failures are counted by the cache instead of retried for up to 30 s
+        self.dht_sensor = CachedSensor(DHTSensor(is_mock=True, retries=1), max_age=max_age, name='dht')
+        self.ph_sensor = CachedSensor(PHSensor(is_mock=True), max_age=max_age, name='ph')
+        npk_sensor = npk_sensor or NPKSensor(is_mock=True)
+        self.npk_sensor = CachedSensor(npk_sensor, max_age=max_age, name='npk')
+        # 7-in-1 probes measure soil pH in the ground; their value replaces the separate pH sensor
+        self.npk_reports_ph = any(
+            name == 'ph' for probe in getattr(npk_sensor, 'probes', []) for name, _, _, _ in probe.fields
+        )
 
-    def get_all_data(self):
+    def read_groups(self):
         """
-        Returns a dictionary containing all sensor readings.
+        One read function per physical sensor, for sampling them independently.
+        Temperature and humidity come from the same DHT pin, so they are read together.
+        pH comes from the NPK probes when they report it, otherwise from the pH sensor.
+        Each function returns a partial reading dict (keys from FIELDS) or None if the read failed.
         """
+        groups = {'dht': self._read_dht, 'ph': self._read_ph, 'npk': self._read_npk}
+        if self.npk_reports_ph:
+            del groups['ph']
+        return groups
+
+    def _read_dht(self):
+        dht = self.dht_sensor.read()
+        return None if dht is None else dict(dht)
+
+    def _read_ph(self):
+        ph = self.ph_sensor.read()
+        return None if ph is None else {'ph': ph}
+
+    def _read_npk(self):
         npk = self.npk_sensor.read()
-        return {
-            'temperature': self.temp_sensor.read(),
-            'humidity': self.hum_sensor.read(),
-            'ph': self.ph_sensor.read(),
-            'nitrogen': npk.get('N') if npk else None,
-            'phosphorus': npk.get('P') if npk else None,
-            'potassium': npk.get('K') if npk else None
+        if not npk:
+            return None
+        data = {
+            'nitrogen': npk.get('N'),
+            'phosphorus': npk.get('P'),
+            'potassium': npk.get('K')
         }
+        # Moisture, EC and soil temperature from 7-in-1 probes are dropped on purpose:
+        # sensor_readings has no columns for them (and the binary upload format
+        # would refuse batches carrying them)
+        if self.npk_reports_ph and npk.get('ph') is not None:
+            data['ph'] = npk['ph']
+        return data
+
+    def sensor_stats(self):
+        """
+        Per-sensor read counts, failure rate, value age and read latency.
+        """
+        return {cached.name: cached.stats() for cached in (self.dht_sensor, self.ph_sensor, self.npk_sensor)}
+
+    def get_all_data(self):
+        """
+        Returns a dictionary containing all sensor readings.
+        """
+        data = dict.fromkeys(self.FIELDS)
+        for read in self.read_groups().values():
+            data.update(read() or {})
+        return data
 
 if __name__ == "__main__":
     suite = MockSensorSuite()
     print("Mock Sensor Suite Data:", suite.get_all_data())
+    print("Sensor stats:", suite.sensor_stats())
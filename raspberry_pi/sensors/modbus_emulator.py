@@ -0,0 +1,94 @@
+import os
+import random
+import struct
+import sys
+import time
+
+# Ensure this directory is in path so we can import siblings
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+from modbus_rtu import READ_HOLDING_REGISTERS, crc_ok, with_crc
+
+
+class EmulatedProbe:
+    """
+    Register map of one emulated slave. Registers not set read as 0.
+    `registers` maps address -> value or a callable returning the value.
+    """
+
+    def __init__(self, registers, online=True):
+        self.registers = registers
+        self.online = online
+
+    def read(self, start, count):
+        values = []
+        for register in range(start, start + count):
+            value = self.registers.get(register, 0)
+            values.append(int(value() if callable(value) else value) & 0xFFFF)
+        return values
+
+
+class EmulatedSerialBus:
+    """
+    Stands in for a pyserial port with Modbus RTU slaves behind it (write,
+    read, reset_input_buffer, timeout), so the NPK driver can run without
+    hardware. With realtime=True it sleeps for the frames' wire time at the
+    given baud rate and for the full timeout when a slave does not answer,
+    so bus timings are realistic.
+    """
+
+    def __init__(self, probes, baudrate=9600, realtime=True, corrupt_rate=0.0, seed=None):
+        """
+        :param probes: dict slave address -> EmulatedProbe
+        :param corrupt_rate: fraction of responses sent with a flipped bit (CRC error)
+        """
+        self.probes = probes
+        self.char_time = 11.0 / baudrate
+        self.realtime = realtime
+        self.corrupt_rate = corrupt_rate
+        self.timeout = 1.0
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._pending = b''
+
+    def reset_input_buffer(self):
+        self._pending = b''
+
+    def write(self, frame):
+        self.requests += 1
+        if self.realtime:
+            time.sleep(len(frame) * self.char_time)
+        self._pending = self._respond(bytes(frame))
+        return len(frame)
+
+    def _respond(self, frame):
+        if len(frame) != 8 or not crc_ok(frame):
+            return b''  # Slaves ignore frames with a bad CRC
+        address, function, start, count = struct.unpack('>BBHH', frame[:6])
+        probe = self.probes.get(address)
+        if probe is None or not probe.online:
+            return b''
+        if function != READ_HOLDING_REGISTERS:
+            response = with_crc(struct.pack('>BBB', address, function | 0x80, 1))    # Illegal function
+        elif not 1 <= count <= 125:
+            response = with_crc(struct.pack('>BBB', address, function | 0x80, 3))    # Illegal data value
+        else:
+            values = probe.read(start, count)
+            response = with_crc(struct.pack(f'>BBB{count}H', address, function, 2 * count, *values))
+        if self.corrupt_rate and self._rng.random() < self.corrupt_rate:
+            response = bytearray(response)
+            response[self._rng.randrange(len(response))] ^= 1 << self._rng.randrange(8)
+            response = bytes(response)
+        return response
+
+    def read(self, size=1):
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        if self.realtime:
+            # Short read = the pyserial timeout expired
+            time.sleep(self.timeout if len(chunk) < size else len(chunk) * self.char_time)
+        return chunk
+
+    def close(self):
+        self._pending = b''
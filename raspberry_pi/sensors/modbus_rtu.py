@@ -0,0 +1,133 @@
+import struct
+import time
+
+READ_HOLDING_REGISTERS = 0x03
+
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(data):
+    """
+    Modbus RTU CRC-16 (poly 0xA001, init 0xFFFF); sent low byte first.
+    """
+    crc = 0xFFFF
+    for byte in data:
+        crc = (crc >> 8) ^ _CRC_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def with_crc(frame):
+    return frame + struct.pack('<H', crc16(frame))
+
+
+def crc_ok(frame):
+    return len(frame) >= 4 and crc16(frame[:-2]) == struct.unpack('<H', frame[-2:])[0]
+
+
+def read_request(address, start, count):
+    """
+    Read Holding Registers request frame (function 0x03), CRC included.
+    """
+    return with_crc(struct.pack('>BBHH', address, READ_HOLDING_REGISTERS, start, count))
+
+
+def response_length(count):
+    # address, function, byte count, 2 bytes per register, CRC
+    return 5 + 2 * count
+
+
+class ModbusError(Exception):
+    pass
+
+
+class ModbusTimeout(ModbusError):
+    pass
+
+
+class ModbusCRCError(ModbusError):
+    pass
+
+
+def parse_read_response(frame, address, count):
+    """
+    Validates a Read Holding Registers response and returns the register values.
+    Raises ModbusTimeout for a missing or incomplete frame, ModbusCRCError for a
+    CRC mismatch and ModbusError for a wrong header or an exception response.
+    """
+    if len(frame) < 5:
+        raise ModbusTimeout("no response" if not frame else f"timed out after {len(frame)} bytes")
+    if frame[1] == READ_HOLDING_REGISTERS | 0x80:
+        if not crc_ok(frame[:5]):
+            raise ModbusCRCError("CRC mismatch")
+        raise ModbusError(f"exception code {frame[2]}")
+    if len(frame) != response_length(count):
+        raise ModbusTimeout(f"timed out after {len(frame)} bytes")
+    if not crc_ok(frame):
+        raise ModbusCRCError("CRC mismatch")
+    if frame[0] != address or frame[1] != READ_HOLDING_REGISTERS or frame[2] != 2 * count:
+        raise ModbusError("unexpected response header")
+    return struct.unpack(f'>{count}H', frame[3:3 + 2 * count])
+
+
+class ModbusRTUMaster:
+    """
+    Polls slaves on one half-duplex RS485 line.
+    Requests are built once; each one is written as soon as the previous
+    response is complete (after the 3.5-character inter-frame gap), and
+    responses are read by their known length rather than by waiting for a
+    timeout, so a scan takes about the wire time of its frames. A slave that
+    does not answer costs its own timeout only.
+    """
+
+    def __init__(self, port, baudrate=9600):
+        """
+        :param port: an open serial port (pyserial Serial or compatible, e.g. the emulator)
+        """
+        self.port = port
+        # 11 bits per character (start, 8 data, parity/stop, stop); 1.75 ms minimum above 19200 baud
+        self.char_time = 11.0 / baudrate
+        self.frame_gap = 3.5 * self.char_time if baudrate <= 19200 else 0.00175
+        self._last_io = 0.0
+
+    def _set_timeout(self, timeout):
+        if self.port.timeout != timeout:
+            self.port.timeout = timeout
+
+    def transact(self, request, expected, timeout):
+        """
+        Sends one request and reads up to `expected` response bytes.
+        An exception response (5 bytes) is recognised without waiting for the rest.
+        """
+        wait = self._last_io + self.frame_gap - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        # Our own request has to go out before the answer can start
+        self._set_timeout(timeout + len(request) * self.char_time)
+        # Drop stray bytes, e.g. a late answer from a slave that timed out
+        self.port.reset_input_buffer()
+        self.port.write(request)
+
+        frame = self.port.read(5)
+        if len(frame) == 5 and not frame[1] & 0x80 and expected > 5:
+            frame += self.port.read(expected - 5)
+        self._last_io = time.monotonic()
+        return frame
+
+    def read_registers(self, address, start, count, timeout, request=None):
+        """
+        Reads `count` holding registers from one slave. Raises ModbusError.
+        """
+        request = request or read_request(address, start, count)
+        frame = self.transact(request, response_length(count), timeout)
+        return parse_read_response(frame, address, count)
@@ -1,37 +1,173 @@
+import os
 import random
+import sys
 import time
 
+# Ensure this directory is in path so we can import siblings
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+from modbus_rtu import ModbusCRCError, ModbusError, ModbusRTUMaster, ModbusTimeout, read_request
+
+# Try to import the serial library (pyserial).
+# Without it only mock mode and the bus emulator are available.
+try:
+    import serial
+    HAS_SERIAL = True
+except ImportError:
+    HAS_SERIAL = False
+
+# Register maps of the supported probe types: start register and
+# (field, offset, scale, signed) per value. All values of a probe are
+# fetched with one contiguous holding-register read.
+PROBE_PROFILES = {
+    # NPK-only probes (e.g. JXBS-3001-NPK): N, P, K in mg/kg at 0x1E-0x20
+    'npk': (0x1E, [('N', 0, 1, False), ('P', 1, 1, False), ('K', 2, 1, False)]),
+    # 7-in-1 probes: moisture (%), temperature (°C), EC (uS/cm), pH, then N, P, K (mg/kg) at 0x00-0x06
+    '7in1': (0x00, [
+        ('moisture', 0, 0.1, False),
+        ('soil_temperature', 1, 0.1, True),
+        ('ec', 2, 1, False),
+        ('ph', 3, 0.1, False),
+        ('N', 4, 1, False),
+        ('P', 5, 1, False),
+        ('K', 6, 1, False),
+    ]),
+}
+
+
+class NPKProbe:
+    """
+    One probe (Modbus slave) on the RS485 bus, with its prebuilt request frame
+    and read statistics.
+    """
+
+    def __init__(self, address, profile='npk', timeout=0.2):
+        self.address = address
+        self.profile = profile
+        self.timeout = timeout
+        self.start, self.fields = PROBE_PROFILES[profile]
+        self.count = max(offset for _, offset, _, _ in self.fields) + 1
+        self.request = read_request(address, self.start, self.count)
+        self.stats = {'reads': 0, 'ok': 0, 'timeouts': 0, 'crc_errors': 0, 'errors': 0, 'last_ms': None}
+
+    def decode(self, registers):
+        values = {}
+        for name, offset, scale, signed in self.fields:
+            raw = registers[offset]
+            if signed and raw >= 0x8000:
+                raw -= 0x10000
+            values[name] = round(raw * scale, 2)
+        return values
+
+
 class NPKSensor:
-    def __init__(self, port='/dev/ttyUSB0', is_mock=False):
+    def __init__(self, port='/dev/ttyUSB0', is_mock=False, probes=None, baudrate=9600, timeout=0.2, bus=None):
         """
         Initialize the NPK Sensor.
         :param port: Serial port for RS485 connection.
         :param is_mock: Force mock mode.
+        :param probes: Probes on the bus, e.g. [{'address': 1, 'profile': '7in1'}, ...]
+                       ('profile' defaults to 'npk', 'timeout' to `timeout`). Default: one NPK probe at address 1.
+        :param baudrate: Bus speed (probes usually ship with 9600 8N1).
+        :param timeout: Seconds to wait for a probe's answer.
+        :param bus: Already open serial-like object (e.g. EmulatedSerialBus) to use instead of `port`.
         """
         self.port = port
         self.is_mock = is_mock
-        # Real hardware init would require setting up Serial/Modbus connection here
+        self.baudrate = baudrate
+        self.probes = [
+            NPKProbe(p['address'], p.get('profile', 'npk'), p.get('timeout', timeout))
+            for p in (probes or [{'address': 1}])
+        ]
+        self.bus = bus
+        self._owns_bus = bus is None
+        self.master = None
+        self.last_scan = {}
+        self.last_scan_ms = None
+
+    def _connect(self):
+        if self.master is None:
+            if self.bus is None:
+                if not HAS_SERIAL:
+                    raise ModbusError("Hardware implementation requires pyserial (pip install pyserial).")
+                self.bus = serial.Serial(self.port, self.baudrate, bytesize=8, parity='N', stopbits=1)
+            self.master = ModbusRTUMaster(self.bus, self.baudrate)
+        return self.master
+
+    def _disconnect(self):
+        # Reopen the port on the next scan (e.g. after the USB adapter was replugged)
+        if self._owns_bus and self.bus is not None:
+            try:
+                self.bus.close()
+            except Exception:
+                pass
+            self.bus = None
+        self.master = None
+
+    def scan(self):
+        """
+        Polls every probe once, back to back.
+        :return: Dictionary {slave address: values dict, or None if the probe failed}.
+        """
+        master = self._connect()
+        results = {}
+        started = time.monotonic()
+        for probe in self.probes:
+            probe.stats['reads'] += 1
+            probe_started = time.monotonic()
+            try:
+                registers = master.read_registers(
+                    probe.address, probe.start, probe.count, probe.timeout, probe.request
+                )
+                results[probe.address] = probe.decode(registers)
+                probe.stats['ok'] += 1
+            except ModbusTimeout:
+                probe.stats['timeouts'] += 1
+                results[probe.address] = None
+            except ModbusCRCError:
+                probe.stats['crc_errors'] += 1
+                results[probe.address] = None
+            except ModbusError as e:
+                probe.stats['errors'] += 1
+                print(f"NPK probe {probe.address}: {e}")
+                results[probe.address] = None
+            probe.stats['last_ms'] = round((time.monotonic() - probe_started) * 1000, 1)
+        self.last_scan_ms = round((time.monotonic() - started) * 1000, 1)
+        self.last_scan = results
+        return results
 
     def read(self):
         """
         Reads the soil NPK values.
-        :return: Dictionary {'N': float, 'P': float, 'K': float} or None.
+        With several probes, each value is the mean over the probes that answered.
+        :return: Dictionary {'N': float, 'P': float, 'K': float} (plus moisture/ec/ph/
+                 soil_temperature for probes that report them) or None.
         """
         if self.is_mock:
             return self._read_mock()
-        
+
         try:
-            # Placeholder for actual RS485 Modbus reading
-            # bytes_to_send = b'\x01\x03\x00\x1e\x00\x03\x65\xcd'
-            # response = serial.write_and_read(self.port, bytes_to_send)
-            # n, p, k = parse_response(response)
-            # return {'N': n, 'P': p, 'K': k}
-            print("Hardware implementation requires Modbus/RS485 libraries (e.g. pymodbus or pyserial).")
-            return None
+            scan = self.scan()
         except Exception as e:
             print(f"Error reading NPK sensor: {e}")
+            self._disconnect()
             return None
 
+        answered = [values for values in scan.values() if values]
+        if not answered:
+            return None
+        totals, counts = {}, {}
+        for values in answered:
+            for key, value in values.items():
+                totals[key] = totals.get(key, 0.0) + value
+                counts[key] = counts.get(key, 0) + 1
+        return {key: round(totals[key] / counts[key], 2) for key in totals}
+
+    def probe_stats(self):
+        return {probe.address: dict(probe.stats) for probe in self.probes}
+
     def _read_mock(self):
         """
         Simulates NPK readings.
@@ -43,6 +179,38 @@ class NPKSensor:
             'K': round(random.uniform(50.0, 200.0), 1)  # Potassium
         }
 
+
+def emulated_bus(probes, baudrate=9600, **kwargs):
+    """
+    An EmulatedSerialBus with the given probes behind it, reporting plausible
+    random values in their profile's register layout (for testing without hardware).
+    """
+    from modbus_emulator import EmulatedProbe, EmulatedSerialBus
+
+    ranges = {
+        'N': (20.0, 150.0), 'P': (10.0, 60.0), 'K': (50.0, 200.0), 'moisture': (10.0, 45.0),
+        'soil_temperature': (15.0, 35.0), 'ec': (100.0, 1500.0), 'ph': (5.5, 8.0),
+    }
+
+    def register(low, high, scale):
+        return lambda: round(random.uniform(low, high) / scale)
+
+    emulated = {}
+    for p in probes:
+        start, fields = PROBE_PROFILES[p.get('profile', 'npk')]
+        emulated[p['address']] = EmulatedProbe({
+            start + offset: register(*ranges[name], scale) for name, offset, scale, _ in fields
+        })
+    return EmulatedSerialBus(emulated, baudrate=baudrate, **kwargs)
+
+
 if __name__ == "__main__":
     sensor = NPKSensor(is_mock=True)
     print(f"Current Soil NPK: {sensor.read()}")
+
+    # Field scan over an emulated RS485 bus (probe 4 is offline)
+    field = [{'address': 1}, {'address': 2, 'profile': '7in1'}, {'address': 3, 'profile': '7in1'}, {'address': 4}]
+    emulator = emulated_bus(field[:3])
+    bus_sensor = NPKSensor(probes=field, bus=emulator)
+    print(f"Emulated field NPK: {bus_sensor.read()} (scan took {bus_sensor.last_scan_ms} ms)")
+    print(f"Per probe: {bus_sensor.last_scan}")